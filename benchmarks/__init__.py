@@ -0,0 +1,33 @@
+"""
+Benchmarks for the DP3T reference implementations
+
+Run ``python -m benchmarks --help`` from the root of the repository for usage.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import importlib
+
+#: Modules in this package that register benchmarks
+SUITES = ["crypto", "imports", "lowcost", "unlinkable"]
+
+
+def load_suites(suites=None):
+    """Import benchmark suites so that their benchmarks are registered"""
+    for suite in suites or SUITES:
+        importlib.import_module("benchmarks." + suite)
@@ -0,0 +1,410 @@
+"""
+Command line interface to run and compare benchmarks
+
+Examples:
+
+    python -m benchmarks run -o before.json
+    python -m benchmarks run "unlinkable.*" --set observations_per_day=5000 -o after.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks backends
+    python -m benchmarks sweep unlinkable --set epoch_length=5,15,30 --csv
+    python -m benchmarks sizing --items 1000,100000 --fpr 0.001
+    python -m benchmarks trace trace.bin --receivers 100 --observations-per-day 100000
+    python -m benchmarks replay lowcost trace.bin
+    python -m benchmarks costmodel --infected 10,100 --observations-per-day 100,1000
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import argparse
+import sys
+
+from dp3t.crypto import BACKEND_ENVIRONMENT_VARIABLE, select_fastest_backend
+
+from dp3t.config import CUCKOO_FPR
+
+from benchmarks import costmodel, load_suites, replay, sizing, sweep
+from benchmarks.harness import (
+    BENCHMARKS,
+    compare_results,
+    format_params,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def parse_overrides(assignments):
+    """Parse NAME=V1,V2,... assignments into a parameter grid"""
+    overrides = {}
+    for assignment in assignments:
+        name, _, values = assignment.partition("=")
+        if not values:
+            raise ValueError("Expected NAME=V1,V2,..., got {}".format(assignment))
+        overrides[name] = [int(value) for value in values.split(",")]
+    return overrides
+
+
+def report_result(result):
+    print(
+        "{:<45} {:<50} {:>12.3f} ms".format(
+            result["name"], format_params(result["params"]), result["median"] * 1e3
+        ),
+        flush=True,
+    )
+
+
+def cmd_list(args):
+    for name in sorted(BENCHMARKS):
+        grid = BENCHMARKS[name].resolve_grid()
+        print(name, format_params(grid) if grid else "")
+
+
+def cmd_run(args):
+    results = run_benchmarks(
+        patterns=args.patterns,
+        overrides=parse_overrides(args.set),
+        quick=args.quick,
+        repeat=args.repeat,
+        report=report_result,
+    )
+    if args.output:
+        save_results(results, args.output)
+
+
+def cmd_compare(args):
+    comparison = compare_results(
+        load_results(args.baseline), load_results(args.current), args.threshold
+    )
+
+    for row in comparison:
+        print(
+            "{:<45} {:<50} {:>12.3f} ms {:>12.3f} ms {:>7.2f}x  {}".format(
+                row["name"],
+                format_params(row["params"]),
+                row["baseline"] * 1e3,
+                row["current"] * 1e3,
+                row["ratio"],
+                row["verdict"],
+            )
+        )
+
+    if args.fail_on_regression and any(r["verdict"] == "slower" for r in comparison):
+        return 1
+    return 0
+
+
+def cmd_backends(args):
+    fastest, timings = select_fastest_backend()
+    for (name, timing) in sorted(timings.items(), key=lambda item: item[1]):
+        print("{:<20} {:>12.3f} ms".format(name, timing * 1e3))
+    print("\nFastest backend: {}={}".format(BACKEND_ENVIRONMENT_VARIABLE, fastest))
+
+
+def cmd_sweep(args):
+    grid = sweep.parse_grid(args.set)
+    names = sorted(grid)
+
+    def report_case(case):
+        columns = ["{:>14}".format(case["params"][name]) for name in names]
+        columns.extend(
+            "{:>14.6g}".format(case["metrics"][metric]) for metric in sweep.METRICS
+        )
+        print(" ".join(columns), flush=True)
+
+    report = None
+    if not args.csv:
+        print(" ".join("{:>14}".format(name) for name in names + sweep.METRICS))
+        report = report_case
+
+    results = sweep.run_sweep(
+        args.protocol,
+        grid,
+        observations_per_day=args.observations_per_day,
+        infected=args.infected,
+        repeat=args.repeat,
+        report=report,
+    )
+    if args.csv:
+        sweep.write_csv(results, sys.stdout)
+    if args.output:
+        save_results(results, args.output)
+
+
+def cmd_sizing(args):
+    def report_case(case):
+        columns = ["{:>14}".format(case["strategy"]), "{:>14}".format(case["nr_items"])]
+        columns.extend(
+            "{:>14.6g}".format(case["metrics"][metric]) for metric in sizing.METRICS
+        )
+        print(" ".join(columns), flush=True)
+
+    print(
+        " ".join(
+            "{:>14}".format(name) for name in ["strategy", "nr_items"] + sizing.METRICS
+        )
+    )
+    results = sizing.run_sizing(
+        [int(n) for n in args.items.split(",")],
+        args.fpr,
+        nr_queries=args.queries,
+        repeat=args.repeat,
+        report=report_case,
+    )
+    if args.output:
+        save_results(results, args.output)
+
+
+def cmd_trace(args):
+    records = replay.synthetic_trace(
+        args.receivers, args.senders, args.observations_per_day, args.days
+    )
+    if args.csv:
+        with open(args.path, "w", newline="") as f:
+            nr_records = replay.write_csv_trace(f, records)
+    else:
+        with open(args.path, "wb") as f:
+            nr_records = replay.write_trace(f, records)
+    print("Wrote {} records to {}".format(nr_records, args.path))
+
+
+def cmd_replay(args):
+    results = replay.run_replay(args.path, args.protocol, args.trace_memory)
+    for metric in replay.METRICS:
+        print("{:<14} {:>14.6g}".format(metric, results["metrics"][metric]))
+    if args.output:
+        save_results(results, args.output)
+
+
+def cmd_costmodel(args):
+    def report_case(case):
+        columns = ["{:>14}".format(case["protocol"])]
+        columns.extend(
+            "{:>14}".format(case["params"][name]) for name in costmodel.VARIABLES
+        )
+        columns.extend(
+            "{:>14.6g}".format(case["metrics"][metric]) for metric in costmodel.METRICS
+        )
+        print(" ".join(columns), flush=True, file=sys.stderr)
+
+    print(
+        " ".join(
+            "{:>14}".format(name)
+            for name in ["protocol"] + costmodel.VARIABLES + costmodel.METRICS
+        ),
+        file=sys.stderr,
+    )
+    results = costmodel.run_costmodel(
+        [int(n) for n in args.infected.split(",")],
+        [int(n) for n in args.observations_per_day.split(",")],
+        contagious_days=args.contagious_days,
+        repeat=args.repeat,
+        report=report_case,
+    )
+    print(
+        costmodel.format_report(
+            results, args.project_infected, args.project_observations_per_day
+        )
+    )
+    if args.output:
+        save_results(results, args.output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.set_defaults(func=None)
+    subparsers = parser.add_subparsers()
+
+    list_parser = subparsers.add_parser("list", help="list available benchmarks")
+    list_parser.set_defaults(func=cmd_list)
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks")
+    run_parser.add_argument(
+        "patterns", nargs="*", help="shell-style patterns of benchmarks to run"
+    )
+    run_parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2",
+        help="override the values of a parameter",
+    )
+    run_parser.add_argument(
+        "--quick", action="store_true", help="only run the smallest case"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("-o", "--output", help="store results as JSON")
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="relative change considered significant (default: 0.05)",
+    )
+    compare_parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="exit with a non-zero status if any case got slower",
+    )
+    compare_parser.set_defaults(func=cmd_compare)
+
+    backends_parser = subparsers.add_parser(
+        "backends", help="time the crypto backends and pick the fastest"
+    )
+    backends_parser.set_defaults(func=cmd_backends)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="measure costs across protocol parameters"
+    )
+    sweep_parser.add_argument("protocol", choices=sorted(sweep.PROTOCOLS))
+    sweep_parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2",
+        help="values of a protocol parameter, e.g., epoch_length=5,15",
+    )
+    sweep_parser.add_argument(
+        "--observations-per-day",
+        type=int,
+        default=100,
+        help="observations of the phone on every day (default: 100)",
+    )
+    sweep_parser.add_argument(
+        "--infected",
+        type=int,
+        default=10,
+        help="infected users in the batch, each reporting a day (default: 10)",
+    )
+    sweep_parser.add_argument("--repeat", type=int, default=3)
+    sweep_parser.add_argument("--csv", action="store_true", help="print CSV")
+    sweep_parser.add_argument("-o", "--output", help="store results as JSON")
+    sweep_parser.set_defaults(func=cmd_sweep)
+
+    sizing_parser = subparsers.add_parser(
+        "sizing", help="compare the sizing strategies of unlinkable batch filters"
+    )
+    sizing_parser.add_argument(
+        "--items",
+        default="1000,10000,100000",
+        metavar="N1,N2",
+        help="numbers of items in the filter (default: 1000,10000,100000)",
+    )
+    sizing_parser.add_argument(
+        "--fpr",
+        type=float,
+        default=CUCKOO_FPR,
+        help="target false positive rate (default: the protocol's)",
+    )
+    sizing_parser.add_argument(
+        "--queries",
+        type=int,
+        default=10000,
+        help="non-members looked up to observe false positives (default: 10000)",
+    )
+    sizing_parser.add_argument("--repeat", type=int, default=3)
+    sizing_parser.add_argument("-o", "--output", help="store results as JSON")
+    sizing_parser.set_defaults(func=cmd_sizing)
+
+    trace_parser = subparsers.add_parser(
+        "trace", help="write a synthetic beacon trace for replay"
+    )
+    trace_parser.add_argument("path")
+    trace_parser.add_argument(
+        "--receivers", type=int, default=10, help="observing phones (default: 10)"
+    )
+    trace_parser.add_argument(
+        "--senders", type=int, default=100, help="broadcasting phones (default: 100)"
+    )
+    trace_parser.add_argument(
+        "--observations-per-day",
+        type=int,
+        default=10000,
+        help="observations of all receivers on every day (default: 10000)",
+    )
+    trace_parser.add_argument("--days", type=int, default=1)
+    trace_parser.add_argument(
+        "--csv", action="store_true", help="write CSV instead of the binary format"
+    )
+    trace_parser.set_defaults(func=cmd_trace)
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="measure ingest by replaying a beacon trace into tracers"
+    )
+    replay_parser.add_argument("protocol", choices=sorted(sweep.PROTOCOLS))
+    replay_parser.add_argument("path", help="binary or CSV trace file")
+    replay_parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="measure memory growth with tracemalloc, at a cost in speed",
+    )
+    replay_parser.add_argument("-o", "--output", help="store results as JSON")
+    replay_parser.set_defaults(func=cmd_replay)
+
+    costmodel_parser = subparsers.add_parser(
+        "costmodel", help="fit and compare the costs of both designs at scale"
+    )
+    costmodel_parser.add_argument(
+        "--infected",
+        default="10,50,100",
+        metavar="N1,N2",
+        help="numbers of infected users in a batch (default: 10,50,100)",
+    )
+    costmodel_parser.add_argument(
+        "--observations-per-day",
+        default="100,500,1000",
+        metavar="N1,N2",
+        help="observations of a phone on every day (default: 100,500,1000)",
+    )
+    costmodel_parser.add_argument(
+        "--contagious-days",
+        type=int,
+        default=5,
+        help="days that every infected user reports (default: 5)",
+    )
+    costmodel_parser.add_argument(
+        "--project-infected",
+        type=int,
+        default=10000,
+        help="infected users to project the costs to (default: 10000)",
+    )
+    costmodel_parser.add_argument(
+        "--project-observations-per-day",
+        type=int,
+        default=1000,
+        help="observations per day to project the costs to (default: 1000)",
+    )
+    costmodel_parser.add_argument("--repeat", type=int, default=3)
+    costmodel_parser.add_argument("-o", "--output", help="store results as JSON")
+    costmodel_parser.set_defaults(func=cmd_costmodel)
+
+    args = parser.parse_args(argv)
+    if args.func is None:
+        parser.print_help()
+        return 1
+
+    load_suites()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
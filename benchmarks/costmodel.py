@@ -0,0 +1,380 @@
+"""
+Cost model of the DP3T designs for capacity planning
+
+For every number of infected users and every density of contacts in a grid,
+a cost model run measures both designs with their default parameters:
+
+ * ``batch_bytes``: size of the batch of all infected users, i.e., of the
+   daily download of every phone
+ * ``bytes_per_infected``: the same, per infected user
+ * ``build_batch``: time for the server to build the batch
+ * ``match``: time for a phone to match its observations with the batch
+ * ``observation_bytes``: memory that a phone uses for the observations of a
+   full retention period, measured with :mod:`tracemalloc`
+ * ``bytes_per_observation``: the same, per observation
+
+Infected users report the given number of contagious days before the
+release. The density of contacts is the number of observations that a phone
+makes per day.
+
+:func:`fit_model` then fits every cost as a linear function of the number
+of infected users and the number of observations per day, by least squares,
+and :func:`format_report` compares the designs, measured and projected to a
+larger deployment.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import io
+import itertools
+import secrets
+import statistics
+import tracemalloc
+
+import dp3t.protocols.lowcost as lowcost
+from dp3t.config import DEFAULT_PARAMETERS
+
+from benchmarks.harness import machine_info, time_function
+from benchmarks.sweep import PROTOCOLS
+from benchmarks.workloads import release_time, tracer_with_observations
+
+#: Version of the cost model result format
+COSTMODEL_VERSION = 1
+
+#: Measured costs, in the order in which they are reported
+METRICS = [
+    "batch_bytes",
+    "bytes_per_infected",
+    "build_batch",
+    "match",
+    "observation_bytes",
+    "bytes_per_observation",
+]
+
+#: Costs that :func:`fit_model` fits
+MODEL_METRICS = ["batch_bytes", "build_batch", "match", "observation_bytes"]
+
+#: Variables of the cost model, in the order of its coefficients
+VARIABLES = ["infected", "observations_per_day"]
+
+
+### MEASUREMENT ###
+
+
+def infected_reports(protocol, infected, contagious_days, parameters):
+    """Random reports of infected users, released at the end of the retention period
+
+    Every infected user reports the given number of days before the release.
+    """
+    first_day = parameters.retention_period - contagious_days
+    if protocol is lowcost:
+        # A single key covers all days from its start time
+        return [
+            (release_time(first_day), secrets.token_bytes(32)) for _ in range(infected)
+        ]
+
+    first_epoch = release_time(first_day) // parameters.epoch_seconds
+    epochs = range(
+        first_epoch, first_epoch + contagious_days * parameters.num_epochs_per_day
+    )
+    return [
+        (epochs, [secrets.token_bytes(32) for _ in epochs]) for _ in range(infected)
+    ]
+
+
+def _median_time(run, repeat):
+    _, timings = time_function(run, repeat)
+    return statistics.median(timings)
+
+
+def _traced_tracer(protocol, observations_per_day, parameters):
+    """Return a tracer with a retention period of observations, and its memory"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracer = tracer_with_observations(
+            protocol, observations_per_day, parameters=parameters
+        )
+        return tracer, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure(
+    protocol,
+    infected,
+    observations_per_day,
+    contagious_days=5,
+    repeat=3,
+    parameters=DEFAULT_PARAMETERS,
+):
+    """Measure the costs of a design for a number of infected users and contacts
+
+    Args:
+        protocol (module): :mod:`dp3t.protocols.lowcost` or
+            :mod:`dp3t.protocols.unlinkable`
+        infected (int): Number of infected users in the batch
+        observations_per_day (int): Observations of the phone on every day
+        contagious_days (int, optional): Days that every infected user
+            reports. Default: 5
+        repeat (int, optional): Number of repetitions of timings. Default: 3
+        parameters (:obj:`dp3t.config.ProtocolParameters`, optional): The
+            parameters. Default: :data:`DEFAULT_PARAMETERS`
+
+    Returns:
+        dict: The value of each of the :data:`METRICS`
+    """
+    metrics = {}
+
+    reports = infected_reports(protocol, infected, contagious_days, parameters)
+    release = release_time(parameters.retention_period)
+
+    def build_batch():
+        return protocol.TracingDataBatch(
+            reports, release_time=release, parameters=parameters
+        )
+
+    metrics["build_batch"] = _median_time(build_batch, repeat)
+
+    # Phones match with the batch as downloaded
+    batch_file = io.BytesIO()
+    build_batch().write(batch_file)
+    metrics["batch_bytes"] = len(batch_file.getvalue())
+    metrics["bytes_per_infected"] = metrics["batch_bytes"] / max(infected, 1)
+    batch_file.seek(0)
+    batch = protocol.TracingDataBatch.read(batch_file, parameters)
+
+    # Memory of a tracer without observations, to subtract keys and EphIDs.
+    # The first tracer also fills caches, e.g., of the crypto backend.
+    _traced_tracer(protocol, 0, parameters)
+    _, empty_bytes = _traced_tracer(protocol, 0, parameters)
+    tracer, tracer_bytes = _traced_tracer(protocol, observations_per_day, parameters)
+    nr_observations = observations_per_day * parameters.retention_period
+    metrics["observation_bytes"] = max(tracer_bytes - empty_bytes, 0)
+    metrics["bytes_per_observation"] = metrics["observation_bytes"] / max(
+        nr_observations, 1
+    )
+
+    metrics["match"] = _median_time(lambda: tracer.matches_with_batch(batch), repeat)
+
+    return metrics
+
+
+### MODEL ###
+
+
+def _solve(matrix, vector):
+    """Solve a small system of linear equations by Gaussian elimination"""
+    n = len(vector)
+    rows = [list(row) + [value] for (row, value) in zip(matrix, vector)]
+
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if rows[pivot][col] == 0:
+            raise ValueError("The cost model is underdetermined")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(n):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for (a, b) in zip(rows[r], rows[col])]
+
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+def fit_linear(points):
+    """Fit y = fixed + sum(coefficient * x) by least squares
+
+    Variables that take a single value cannot be told apart from the fixed
+    cost, and get a coefficient of 0.
+
+    Args:
+        points ([(dict, float)]): The value of each of the :data:`VARIABLES`,
+            and the measured cost
+
+    Returns:
+        dict: The `fixed` cost, and a coefficient for every variable
+    """
+    variables = [name for name in VARIABLES if len({x[name] for (x, _) in points}) > 1]
+    features = [[1.0] + [float(x[name]) for name in variables] for (x, _) in points]
+    costs = [float(y) for (_, y) in points]
+
+    # Normal equations
+    k = len(variables) + 1
+    matrix = [
+        [sum(row[i] * row[j] for row in features) for j in range(k)] for i in range(k)
+    ]
+    vector = [sum(row[i] * y for (row, y) in zip(features, costs)) for i in range(k)]
+    solution = _solve(matrix, vector)
+
+    coefficients = dict.fromkeys(VARIABLES, 0.0)
+    coefficients.update(zip(variables, solution[1:]))
+    coefficients["fixed"] = solution[0]
+    return coefficients
+
+
+def fit_model(cases):
+    """Fit every cost of :data:`MODEL_METRICS` for every design
+
+    Args:
+        cases ([dict]): The cases of :func:`run_costmodel`
+
+    Returns:
+        dict: For every design and cost, the coefficients of :func:`fit_linear`
+    """
+    model = {}
+    for (protocol, protocol_cases) in itertools.groupby(
+        sorted(cases, key=lambda case: case["protocol"]),
+        key=lambda case: case["protocol"],
+    ):
+        protocol_cases = list(protocol_cases)
+        model[protocol] = {
+            metric: fit_linear(
+                [(case["params"], case["metrics"][metric]) for case in protocol_cases]
+            )
+            for metric in MODEL_METRICS
+        }
+    return model
+
+
+def predict(coefficients, **variables):
+    """Evaluate a fitted cost for the given values of the :data:`VARIABLES`
+
+    Costs are not negative, even where the noise of measurements makes the
+    fitted function negative.
+    """
+    cost = coefficients["fixed"]
+    for name in VARIABLES:
+        cost += coefficients[name] * variables[name]
+    return max(cost, 0.0)
+
+
+def run_costmodel(
+    infected, observations_per_day, contagious_days=5, repeat=3, report=None
+):
+    """Measure both designs across the grid, and fit the cost model
+
+    Args:
+        infected ([int]): The numbers of infected users to measure
+        observations_per_day ([int]): The densities of contacts to measure
+        contagious_days, repeat: See :func:`measure`
+        report (callable, optional): Called with each case as it comes in
+
+    Returns:
+        dict: The results, ready to be stored with
+            :func:`benchmarks.harness.save_results`
+    """
+    cases = []
+    for protocol_name in sorted(PROTOCOLS):
+        for (n, density) in itertools.product(infected, observations_per_day):
+            case = {
+                "protocol": protocol_name,
+                "params": {"infected": n, "observations_per_day": density},
+                "metrics": measure(
+                    PROTOCOLS[protocol_name], n, density, contagious_days, repeat
+                ),
+            }
+            cases.append(case)
+
+            if report is not None:
+                report(case)
+
+    return {
+        "version": COSTMODEL_VERSION,
+        "machine": machine_info(),
+        "workload": {"contagious_days": contagious_days},
+        "parameters": DEFAULT_PARAMETERS._asdict(),
+        "cases": cases,
+        "model": fit_model(cases),
+    }
+
+
+### REPORT ###
+
+
+def format_report(results, infected, observations_per_day):
+    """Compare the designs, as measured and as projected by the cost model
+
+    Args:
+        results (dict): As returned by :func:`run_costmodel`
+        infected (int): Number of infected users to project to
+        observations_per_day (int): Density of contacts to project to
+
+    Returns:
+        str: The report, as Markdown
+    """
+    model = results["model"]
+    protocols = sorted(model)
+
+    lines = ["# Cost model of the DP3T designs", ""]
+    lines.append(
+        "Infected users report {} days. Times are in seconds, sizes in "
+        "bytes.".format(results["workload"]["contagious_days"])
+    )
+
+    lines.extend(["", "## Measurements", ""])
+    columns = ["protocol"] + VARIABLES + METRICS
+    lines.append("| " + " | ".join(columns) + " |")
+    lines.append("|" + "---|" * len(columns))
+    for case in results["cases"]:
+        row = [case["protocol"]] + [str(case["params"][name]) for name in VARIABLES]
+        row.extend("{:.4g}".format(case["metrics"][metric]) for metric in METRICS)
+        lines.append("| " + " | ".join(row) + " |")
+
+    lines.extend(["", "## Cost model", ""])
+    lines.append(
+        "Every cost is modelled as fixed + per_infected * infected + "
+        "per_observation_per_day * observations_per_day."
+    )
+    lines.append("")
+    columns = ["cost", "protocol", "fixed", "per_infected", "per_observation_per_day"]
+    lines.append("| " + " | ".join(columns) + " |")
+    lines.append("|" + "---|" * len(columns))
+    for metric in MODEL_METRICS:
+        for protocol in protocols:
+            coefficients = model[protocol][metric]
+            row = [metric, protocol]
+            row.extend(
+                "{:.4g}".format(coefficients[name]) for name in ["fixed"] + VARIABLES
+            )
+            lines.append("| " + " | ".join(row) + " |")
+
+    lines.extend(["", "## Projection", ""])
+    lines.append(
+        "For {} infected users and {} observations per day.".format(
+            infected, observations_per_day
+        )
+    )
+    lines.append("")
+    columns = ["cost"] + protocols
+    lines.append("| " + " | ".join(columns) + " |")
+    lines.append("|" + "---|" * len(columns))
+    for metric in MODEL_METRICS:
+        row = [metric]
+        row.extend(
+            "{:.4g}".format(
+                predict(
+                    model[protocol][metric],
+                    infected=infected,
+                    observations_per_day=observations_per_day,
+                )
+            )
+            for protocol in protocols
+        )
+        lines.append("| " + " | ".join(row) + " |")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,41 @@
+"""
+Benchmarks of the crypto backends
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import secrets
+
+from dp3t.config import LENGTH_EPHID, NUM_EPOCHS_PER_DAY
+from dp3t.crypto import available_backends, load_backend
+
+from benchmarks.harness import benchmark
+
+
+@benchmark("crypto.prg_many", backend=available_backends, nr_keys=[1, 21, 1000])
+def prg_many(backend, nr_keys):
+    backend = load_backend(backend)
+    keys = [secrets.token_bytes(32) for _ in range(nr_keys)]
+    return lambda: backend.prg_many(keys, LENGTH_EPHID * NUM_EPOCHS_PER_DAY)
+
+
+@benchmark("crypto.sha256_many", backend=available_backends, nr_inputs=[96, 10000])
+def sha256_many(backend, nr_inputs):
+    backend = load_backend(backend)
+    inputs = [secrets.token_bytes(20) for _ in range(nr_inputs)]
+    return lambda: backend.sha256_many(inputs)
@@ -0,0 +1,240 @@
+"""
+Minimal benchmark harness: registration, timing, result files and comparison
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import datetime
+import fnmatch
+import itertools
+import json
+import os
+import platform
+import statistics
+import timeit
+
+#: Version of the result file format
+RESULTS_VERSION = 1
+
+#: All registered benchmarks, by name
+BENCHMARKS = {}
+
+
+class Benchmark:
+    """A benchmark function together with its parameter grid"""
+
+    def __init__(self, name, func, grid):
+        self.name = name
+        self.func = func
+        self.grid = grid
+
+    def resolve_grid(self):
+        """Return the parameter grid, calling the functions of deferred values"""
+        return {
+            param: values() if callable(values) else values
+            for (param, values) in self.grid.items()
+        }
+
+    def cases(self, overrides=None, quick=False):
+        """Return all parameter combinations of this benchmark
+
+        Args:
+            overrides (dict, optional): Replacement values for some parameters
+            quick (bool, optional): Only use the first value of each parameter
+
+        Returns:
+            [dict]: One dictionary of parameter values per combination
+        """
+        grid = self.resolve_grid()
+        for (param, values) in (overrides or {}).items():
+            if param in grid:
+                grid[param] = values
+
+        if quick:
+            grid = {param: values[:1] for (param, values) in grid.items()}
+
+        names = sorted(grid)
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*[grid[name] for name in names])
+        ]
+
+
+def benchmark(name, **grid):
+    """Register a benchmark with a parameter grid
+
+    The decorated function is called once for every combination of parameter
+    values. It should do all necessary setup, and return a function without
+    arguments that runs the measured operation once.
+
+    Args:
+        name (str): Unique name of the benchmark, e.g., "lowcost.add_observation"
+        **grid: For each parameter, the list of values to benchmark, or a
+            function without arguments that returns it. Functions are only
+            called when the benchmark is run or listed.
+    """
+
+    def register(func):
+        if name in BENCHMARKS:
+            raise ValueError("Benchmark {} registered twice".format(name))
+        BENCHMARKS[name] = Benchmark(name, func, grid)
+        return func
+
+    return register
+
+
+def time_function(run, repeat=5):
+    """Time a function, calling it often enough to obtain stable timings
+
+    Returns:
+        (number, timings): the number of calls per repetition and the time per
+            call (in seconds) of each repetition
+    """
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    timings = timer.repeat(repeat=repeat, number=number)
+    return number, [timing / number for timing in timings]
+
+
+def machine_info():
+    """Describe the host on which benchmarks are run"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def case_key(result):
+    """Key identifying a benchmark case across result files"""
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def format_params(params):
+    return ",".join("{}={}".format(name, value) for (name, value) in params.items())
+
+
+def run_benchmarks(patterns=None, overrides=None, quick=False, repeat=5, report=None):
+    """Run all registered benchmarks matching one of the patterns
+
+    Args:
+        patterns ([str], optional): Shell-style patterns on benchmark names.
+            Default: run all benchmarks
+        overrides (dict, optional): Replacement values for some parameters
+        quick (bool, optional): Only run the smallest case of each benchmark
+        repeat (int, optional): Number of repetitions per case. Default: 5
+        report (callable, optional): Called with each result as it comes in
+
+    Returns:
+        dict: The results, ready to be stored with :func:`save_results`
+    """
+    results = []
+
+    for name in sorted(BENCHMARKS):
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+
+        bench = BENCHMARKS[name]
+        for params in bench.cases(overrides, quick):
+            run = bench.func(**params)
+            number, timings = time_function(run, repeat)
+
+            result = {
+                "name": name,
+                "params": params,
+                "number": number,
+                "repeat": repeat,
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "mean": statistics.mean(timings),
+                "stdev": statistics.stdev(timings) if repeat > 1 else 0.0,
+            }
+            results.append(result)
+
+            if report is not None:
+                report(result)
+
+    return {"version": RESULTS_VERSION, "machine": machine_info(), "results": results}
+
+
+def save_results(results, path):
+    """Store benchmark results as JSON"""
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    """Load benchmark results stored with :func:`save_results`
+
+    Raises:
+        ValueError: If the file was written by an incompatible version
+    """
+    with open(path) as f:
+        results = json.load(f)
+
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError("Unsupported benchmark result version in {}".format(path))
+
+    return results
+
+
+def compare_results(baseline, current, threshold=0.05):
+    """Compare the median timings of two benchmark runs
+
+    Args:
+        baseline (dict): Results of the reference run
+        current (dict): Results of the new run
+        threshold (float, optional): Relative change below which timings are
+            considered unchanged. Default: 0.05
+
+    Returns:
+        [dict]: For each case present in both runs, the name, parameters,
+            both medians, the ratio current/baseline and a verdict: "faster",
+            "slower" or "same"
+    """
+    baseline_results = {case_key(r): r for r in baseline["results"]}
+
+    comparison = []
+    for result in current["results"]:
+        reference = baseline_results.get(case_key(result))
+        if reference is None:
+            continue
+
+        ratio = result["median"] / reference["median"]
+        if ratio > 1 + threshold:
+            verdict = "slower"
+        elif ratio < 1 - threshold:
+            verdict = "faster"
+        else:
+            verdict = "same"
+
+        comparison.append(
+            {
+                "name": result["name"],
+                "params": result["params"],
+                "baseline": reference["median"],
+                "current": result["median"],
+                "ratio": ratio,
+                "verdict": verdict,
+            }
+        )
+
+    return comparison
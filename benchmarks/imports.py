@@ -0,0 +1,50 @@
+"""
+Benchmarks of the start-up cost of short-lived processes
+
+Every case starts a fresh Python interpreter, so timings include the start-up
+time of the interpreter itself. The case `statement=python` only starts the
+interpreter and serves as a baseline.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import subprocess
+import sys
+
+from benchmarks.harness import benchmark
+
+#: Statements to run in a fresh interpreter, by name
+STATEMENTS = {
+    "python": "pass",
+    "dp3t": "import dp3t",
+    "epoch_math": "import dp3t; dp3t.epoch_from_time",
+    "lowcost": "import dp3t.protocols.lowcost",
+    "unlinkable": "import dp3t.protocols.unlinkable",
+    "lowcost_first_use": (
+        "import dp3t.protocols.lowcost as l; l.generate_ephids_for_day(bytes(32))"
+    ),
+    "unlinkable_first_use": (
+        "import dp3t.protocols.unlinkable as u; u.TracingDataBatch([], 0)"
+    ),
+}
+
+
+@benchmark("imports.startup", statement=list(STATEMENTS))
+def startup(statement):
+    command = [sys.executable, "-c", STATEMENTS[statement]]
+    return lambda: subprocess.run(command, check=True)
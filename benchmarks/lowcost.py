@@ -0,0 +1,104 @@
+"""
+Benchmarks of the low-cost DP3T design
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import secrets
+
+import dp3t.protocols.lowcost as lowcost
+from dp3t.config import RETENTION_PERIOD
+from dp3t.ingestion import LowcostIngestion
+
+from benchmarks.harness import benchmark
+from benchmarks.workloads import (
+    lowcost_reports,
+    observation_times,
+    random_ephids,
+    release_time,
+    tracer_with_observations,
+    START_TIME,
+)
+
+
+@benchmark("lowcost.generate_ephids_for_day")
+def generate_ephids_for_day():
+    key = secrets.token_bytes(32)
+    return lambda: lowcost.generate_ephids_for_day(key)
+
+
+@benchmark("lowcost.reconstruct_ephids", days=[1, 7, RETENTION_PERIOD])
+def reconstruct_ephids(days):
+    key = secrets.token_bytes(32)
+    start_time = release_time(0)
+    end_time = release_time(days - 1)
+    return lambda: lowcost.ContactTracer._reconstruct_ephids(key, start_time, end_time)
+
+
+@benchmark("lowcost.tracing_batch", reported_keys=[10, 100, 1000])
+def tracing_batch(reported_keys):
+    reports = lowcost_reports(reported_keys)
+    return lambda: lowcost.TracingDataBatch(reports, release_time=release_time(0))
+
+
+@benchmark("lowcost.ingest_reports", uploads=[10000, 100000, 1000000])
+def ingest_reports(uploads):
+    # One in ten uploads is a retry
+    reports = lowcost_reports(uploads - uploads // 10)
+    reports.extend(reports[: uploads // 10])
+
+    def run():
+        ingestion = LowcostIngestion(now=release_time(RETENTION_PERIOD))
+        ingestion.add_reports(reports)
+        return ingestion.reports()
+
+    return run
+
+
+@benchmark("lowcost.add_observation", observations_per_day=[100, 1000])
+def add_observation(observations_per_day):
+    times = observation_times(0, observations_per_day)
+    ephids = random_ephids(observations_per_day)
+
+    def run():
+        tracer = lowcost.ContactTracer(start_time=START_TIME)
+        for (ephid, time) in zip(ephids, times):
+            tracer.add_observation(ephid, time)
+
+    return run
+
+
+@benchmark(
+    "lowcost.matches_with_batch",
+    observations_per_day=[100, 1000],
+    reported_keys=[10, 100],
+    tracers=[1, 10],
+)
+def matches_with_batch(observations_per_day, reported_keys, tracers):
+    tracers = [
+        tracer_with_observations(lowcost, observations_per_day) for _ in range(tracers)
+    ]
+    batch = lowcost.TracingDataBatch(
+        lowcost_reports(reported_keys), release_time=release_time(RETENTION_PERIOD)
+    )
+
+    def run():
+        for tracer in tracers:
+            tracer.matches_with_batch(batch)
+
+    return run
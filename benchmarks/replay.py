@@ -0,0 +1,402 @@
+"""
+Replay of Bluetooth beacon traces into contact tracers
+
+A trace is a sequence of (receiver, EphID, timestamp) records: phone
+`receiver` observed `EphID` at `timestamp`, in seconds since UNIX Epoch.
+Traces are stored either as CSV, with a ``receiver,ephid,timestamp`` header
+and hex-encoded EphIDs, or in a compact binary format:
+
+ * the 8-byte magic string :data:`TRACE_MAGIC`
+ * the length of EphIDs, as a 1-byte integer
+ * records of a 4-byte receiver, an 8-byte timestamp in milliseconds and the
+   EphID, with integers in big-endian order
+
+:func:`replay` streams a trace into one contact tracer per receiver, as fast
+as `ContactTracer.add_observation` takes them. Records must be ordered by
+time for every receiver: when a receiver's records reach a later day, its
+tracer moves to that day first. Observations of days that a tracer already
+left are rejected. A replay reports:
+
+ * ``observations``: observations that tracers accepted
+ * ``rejected``: observations that tracers rejected
+ * ``receivers``: number of contact tracers
+ * ``elapsed``: wall time of the replay, including reading the trace, in seconds
+ * ``throughput``: accepted observations per second of wall time
+ * ``next_day``: total time spent moving tracers to the next day, in seconds
+ * ``latency_p50``, ``latency_p99``, ``latency_p999``, ``latency_max``: time
+   per `add_observation` call, in seconds. Percentiles come from a
+   :obj:`LatencyHistogram` and are exact up to its relative error.
+ * ``memory_growth``: growth of the memory in use, in bytes. Measured with
+   :mod:`tracemalloc` when the replay traces allocations, which slows it down,
+   and otherwise from the peak resident set size of the process, which only
+   grows once the replay exceeds the previous peak. The replay itself holds
+   constant memory, so the growth is that of the contact tracers.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import codecs
+import csv
+import datetime
+import itertools
+import math
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+from dp3t.config import DEFAULT_PARAMETERS, SECONDS_PER_DAY
+from dp3t.serialization import read_uint, write_magic, write_uint
+
+from benchmarks.harness import machine_info
+from benchmarks.sweep import PROTOCOLS
+from benchmarks.workloads import random_ephids, release_time
+
+#: Magic string of binary trace files
+TRACE_MAGIC = b"DP3TBTR\x01"
+
+#: Header of CSV trace files
+CSV_HEADER = ["receiver", "ephid", "timestamp"]
+
+#: Version of the replay result format
+REPLAY_VERSION = 1
+
+#: Number of binary records read at once
+READ_CHUNK_SIZE = 4096
+
+#: Measured costs, in the order in which they are reported
+METRICS = [
+    "observations",
+    "rejected",
+    "receivers",
+    "elapsed",
+    "throughput",
+    "next_day",
+    "latency_p50",
+    "latency_p99",
+    "latency_p999",
+    "latency_max",
+    "memory_growth",
+]
+
+
+### TRACE FILES ###
+
+
+def _record_struct(length_ephid):
+    return struct.Struct(">IQ{}s".format(length_ephid))
+
+
+def write_trace(f, records, length_ephid=DEFAULT_PARAMETERS.length_ephid):
+    """Write records to a binary trace file
+
+    Args:
+        f: A file opened in binary mode
+        records ([(int, bytes, float)]): Receivers, EphIDs and timestamps
+        length_ephid (int, optional): Length of the EphIDs
+
+    Returns:
+        int: The number of records written
+
+    Raises:
+        ValueError: If an EphID does not have length length_ephid
+    """
+    record = _record_struct(length_ephid)
+    write_magic(f, TRACE_MAGIC)
+    write_uint(f, length_ephid, 1)
+
+    nr_records = 0
+    for (receiver, ephid, timestamp) in records:
+        if len(ephid) != length_ephid:
+            raise ValueError("All EphIDs must be {} bytes long".format(length_ephid))
+        f.write(record.pack(receiver, round(timestamp * 1000), ephid))
+        nr_records += 1
+    return nr_records
+
+
+def write_csv_trace(f, records):
+    """Write records to a CSV trace file
+
+    Args:
+        f: A file opened in text mode, with newline=""
+        records ([(int, bytes, float)]): Receivers, EphIDs and timestamps
+
+    Returns:
+        int: The number of records written
+    """
+    writer = csv.writer(f)
+    writer.writerow(CSV_HEADER)
+
+    nr_records = 0
+    for (receiver, ephid, timestamp) in records:
+        writer.writerow([receiver, ephid.hex(), timestamp])
+        nr_records += 1
+    return nr_records
+
+
+def _read_binary_trace(f):
+    record = _record_struct(read_uint(f, 1))
+    chunk_length = READ_CHUNK_SIZE * record.size
+
+    while True:
+        data = f.read(chunk_length)
+        if len(data) % record.size:
+            raise ValueError("Unexpected end of file")
+        if not data:
+            return
+        for (receiver, timestamp, ephid) in record.iter_unpack(data):
+            yield (receiver, ephid, timestamp / 1000)
+
+
+def _read_csv_trace(lines):
+    for row in csv.reader(codecs.iterdecode(lines, "ascii")):
+        if not row or row == CSV_HEADER:
+            continue
+        (receiver, ephid, timestamp) = row
+        yield (int(receiver), bytes.fromhex(ephid), float(timestamp))
+
+
+def read_trace(f):
+    """Stream the records of a binary or CSV trace file
+
+    Args:
+        f: A file opened in binary mode
+
+    Yields:
+        (int, bytes, float): Receiver, EphID and timestamp of every record
+
+    Raises:
+        ValueError: If a binary trace is truncated or a CSV row is malformed
+    """
+    prefix = f.read(len(TRACE_MAGIC))
+    if prefix == TRACE_MAGIC:
+        return _read_binary_trace(f)
+    return _read_csv_trace(itertools.chain([prefix + f.readline()], f))
+
+
+def synthetic_trace(
+    receivers, senders, observations_per_day, days, parameters=DEFAULT_PARAMETERS
+):
+    """Generate the records of a random trace, ordered by time
+
+    Every sender broadcasts a random EphID per epoch. Observations are spread
+    evenly over every day, and each is an observation of a random sender by a
+    random receiver.
+
+    Args:
+        receivers (int): Number of receiving phones
+        senders (int): Number of broadcasting phones
+        observations_per_day (int): Number of observations on every day
+        days (int): Number of days
+        parameters (:obj:`ProtocolParameters`, optional): Epoch length and
+            EphID length. Default: :data:`DEFAULT_PARAMETERS`
+
+    Yields:
+        (int, bytes, float): Receiver, EphID and timestamp of every record
+    """
+    epoch_seconds = parameters.epoch_seconds
+    interval = SECONDS_PER_DAY / max(observations_per_day, 1)
+
+    epoch = None
+    for day in range(days):
+        start = release_time(day)
+        for i in range(observations_per_day):
+            timestamp = start + int(i * interval)
+            if timestamp // epoch_seconds != epoch:
+                epoch = timestamp // epoch_seconds
+                ephids = random_ephids(senders, parameters.length_ephid)
+            yield (random.randrange(receivers), random.choice(ephids), timestamp)
+
+
+### REPLAY ###
+
+
+class LatencyHistogram:
+    """Counts of latencies in log-spaced buckets, in constant memory
+
+    Bucket i holds the latencies from `smallest * growth ** (i - 1)` up to
+    `smallest * growth ** i`, the first bucket all latencies up to
+    `smallest`, and the last bucket all latencies beyond the others.
+    Percentiles are the upper bound of their bucket, so they overestimate
+    latencies by less than the factor `growth`.
+    """
+
+    def __init__(self, smallest=1e-7, largest=100.0, growth=1.02):
+        """Create an empty histogram
+
+        Args:
+            smallest (float, optional): Upper bound of the first bucket, in
+                seconds. Default: 100 ns
+            largest (float, optional): Latency from which on all latencies
+                share the last bucket, in seconds. Default: 100 s
+            growth (float, optional): Ratio of the bounds of consecutive
+                buckets. Default: 1.02
+        """
+        self.smallest = smallest
+        self.growth = growth
+        self._log_growth = math.log(growth)
+
+        nr_buckets = int(math.ceil(math.log(largest / smallest) / self._log_growth))
+        self.counts = [0] * (nr_buckets + 2)
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, latency):
+        """Count a latency, in seconds"""
+        if latency <= self.smallest:
+            index = 0
+        else:
+            index = int(math.ceil(math.log(latency / self.smallest) / self._log_growth))
+            index = min(index, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, fraction):
+        """Return the latency below which fraction of the latencies fall
+
+        Returns 0 for an empty histogram, and never more than the maximum.
+        """
+        if not self.total:
+            return 0.0
+
+        rank = min(int(fraction * self.total), self.total - 1)
+        seen = 0
+        for (index, count) in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return min(self.smallest * pow(self.growth, index), self.max)
+        return self.max
+
+
+def _peak_rss():
+    """Peak resident set size of the process in bytes, or 0 if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def replay(records, protocol, trace_memory=False, **kwargs):
+    """Feed the observations of a trace into one contact tracer per receiver
+
+    Args:
+        records ([(int, bytes, float)]): Receivers, EphIDs and timestamps, see
+            :func:`read_trace`
+        protocol (module): :mod:`dp3t.protocols.lowcost` or
+            :mod:`dp3t.protocols.unlinkable`
+        trace_memory (bool, optional): Measure memory growth with
+            :mod:`tracemalloc`. Default: False
+        **kwargs: Further arguments for `protocol.ContactTracer`
+
+    Returns:
+        (dict, dict): The value of each of the :data:`METRICS`, and the
+            contact tracers by receiver
+    """
+    if trace_memory:
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    else:
+        memory_before = _peak_rss()
+
+    utc = datetime.timezone.utc
+    tracers = {}
+    days = {}
+    latencies = LatencyHistogram()
+    rejected = 0
+    next_day_time = 0.0
+    perf_counter = time.perf_counter
+
+    start = perf_counter()
+    for (receiver, ephid, timestamp) in records:
+        day = int(timestamp // SECONDS_PER_DAY)
+        tracer = tracers.get(receiver)
+        if tracer is None:
+            start_time = datetime.datetime.fromtimestamp(day * SECONDS_PER_DAY, utc)
+            tracer = tracers[receiver] = protocol.ContactTracer(
+                start_time=start_time, **kwargs
+            )
+            days[receiver] = day
+        elif day > days[receiver]:
+            before = perf_counter()
+            for _ in range(day - days[receiver]):
+                tracer.next_day()
+            next_day_time += perf_counter() - before
+            days[receiver] = day
+
+        observation_time = datetime.datetime.fromtimestamp(timestamp, utc)
+        before = perf_counter()
+        try:
+            tracer.add_observation(ephid, observation_time)
+        except ValueError:
+            rejected += 1
+            continue
+        latencies.add(perf_counter() - before)
+    elapsed = perf_counter() - start
+
+    if trace_memory:
+        memory_growth = tracemalloc.get_traced_memory()[0] - memory_before
+        tracemalloc.stop()
+    else:
+        memory_growth = _peak_rss() - memory_before
+
+    metrics = {
+        "observations": latencies.total,
+        "rejected": rejected,
+        "receivers": len(tracers),
+        "elapsed": elapsed,
+        "throughput": latencies.total / elapsed if elapsed else 0.0,
+        "next_day": next_day_time,
+        "latency_p50": latencies.percentile(0.5),
+        "latency_p99": latencies.percentile(0.99),
+        "latency_p999": latencies.percentile(0.999),
+        "latency_max": latencies.max,
+        "memory_growth": memory_growth,
+    }
+    return metrics, tracers
+
+
+def run_replay(path, protocol, trace_memory=False):
+    """Replay a trace file into contact tracers of the given design
+
+    Args:
+        path (str): Path of a binary or CSV trace file
+        protocol (str): Name of the design, see :data:`PROTOCOLS`
+        trace_memory (bool, optional): See :func:`replay`
+
+    Returns:
+        dict: The results, ready to be stored with
+            :func:`benchmarks.harness.save_results`
+    """
+    with open(path, "rb") as f:
+        metrics, _ = replay(read_trace(f), PROTOCOLS[protocol], trace_memory)
+
+    return {
+        "version": REPLAY_VERSION,
+        "machine": machine_info(),
+        "protocol": protocol,
+        "trace": path,
+        "trace_memory": trace_memory,
+        "metrics": metrics,
+    }
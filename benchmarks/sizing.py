@@ -0,0 +1,151 @@
+"""
+Empirical costs of the filter sizing strategies of :mod:`dp3t.sizing`
+
+For every number of items, and every strategy in :data:`STRATEGIES`, a
+sizing run builds a filter of random items and measures:
+
+ * ``serialized_bytes``: size of the filter as published in a batch
+ * ``bytes_per_item``: the same, per inserted item
+ * ``load_factor``: fraction of the slots that hold an item
+ * ``build``: time to build the filter, in seconds
+ * ``query``: time per lookup in the frozen filter, in seconds
+ * ``false_negatives``: inserted items that the frozen filter does not find
+ * ``observed_fpr``: fraction of random non-members that the filter reports
+ * ``expected_fpr``: the false positive rate predicted by the sizing
+
+To observe false positives with a reasonable number of queries, measure with
+a much larger false positive rate than the one of the protocol.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import io
+import os
+import statistics
+
+from dp3t import filters, sizing
+
+from benchmarks.harness import machine_info, time_function
+
+#: Version of the sizing result format
+SIZING_VERSION = 1
+
+#: Sizing strategies, by name
+STRATEGIES = {"default": sizing.default_sizing, "tuned": sizing.tune}
+
+#: Measured costs, in the order in which they are reported
+METRICS = [
+    "serialized_bytes",
+    "bytes_per_item",
+    "load_factor",
+    "build",
+    "query",
+    "false_negatives",
+    "observed_fpr",
+    "expected_fpr",
+]
+
+
+def _random_items(n):
+    return [os.urandom(32) for _ in range(n)]
+
+
+def measure_sizing(filter_sizing, nr_items, nr_queries=10000, repeat=3):
+    """Measure the costs of a filter with the given sizing
+
+    Args:
+        filter_sizing (:obj:`dp3t.sizing.FilterSizing`): The sizing
+        nr_items (int): Number of random items to insert
+        nr_queries (int, optional): Number of random non-members to look up.
+            Default: 10000
+        repeat (int, optional): Number of repetitions of timings. Default: 3
+
+    Returns:
+        dict: The value of each of the :data:`METRICS`, and the `capacity` of
+            the filter, which is larger than that of filter_sizing if an
+            insertion failed
+    """
+    items = _random_items(nr_items)
+    queries = [filters.digest(item) for item in _random_items(nr_queries)]
+
+    _, timings = time_function(
+        lambda: sizing.build_filter(items, filter_sizing), repeat
+    )
+    frozen = filters.FrozenCuckooFilter.from_filter(
+        sizing.build_filter(items, filter_sizing)
+    )
+
+    serialized = io.BytesIO()
+    frozen.write(serialized)
+    serialized_bytes = len(serialized.getvalue())
+
+    def query():
+        for item_digest in queries:
+            frozen.contains_digest(item_digest)
+
+    _, query_timings = time_function(query, repeat)
+
+    built_sizing = filter_sizing._replace(capacity=frozen.capacity)
+    return {
+        "capacity": frozen.capacity,
+        "serialized_bytes": serialized_bytes,
+        "bytes_per_item": serialized_bytes / max(nr_items, 1),
+        "load_factor": built_sizing.load_factor(nr_items),
+        "build": statistics.median(timings),
+        "query": statistics.median(query_timings) / max(nr_queries, 1),
+        "false_negatives": sum(1 for item in items if item not in frozen),
+        "observed_fpr": sum(map(frozen.contains_digest, queries)) / max(nr_queries, 1),
+        "expected_fpr": built_sizing.false_positive_rate(nr_items),
+    }
+
+
+def run_sizing(nr_items, error_rate, nr_queries=10000, repeat=3, report=None):
+    """Compare the sizing strategies for several numbers of items
+
+    Args:
+        nr_items ([int]): The numbers of items to measure
+        error_rate (float): The target false positive rate
+        nr_queries, repeat: See :func:`measure_sizing`
+        report (callable, optional): Called with each case as it comes in
+
+    Returns:
+        dict: The results, ready to be stored with
+            :func:`benchmarks.harness.save_results`
+    """
+    cases = []
+    for n in nr_items:
+        for (name, strategy) in STRATEGIES.items():
+            filter_sizing = strategy(n, error_rate)
+            case = {
+                "strategy": name,
+                "nr_items": n,
+                "sizing": filter_sizing._asdict(),
+                "metrics": measure_sizing(filter_sizing, n, nr_queries, repeat),
+            }
+            cases.append(case)
+
+            if report is not None:
+                report(case)
+
+    return {
+        "version": SIZING_VERSION,
+        "machine": machine_info(),
+        "error_rate": error_rate,
+        "nr_queries": nr_queries,
+        "cases": cases,
+    }
@@ -0,0 +1,255 @@
+"""
+Cost curves of the DP3T designs across protocol parameters
+
+A sweep measures, for every combination of :obj:`dp3t.config.ProtocolParameters`
+values in a grid, the costs that these parameters trade off:
+
+ * ``next_day``: time for a phone to move to the next day
+ * ``record_day``: time for a phone to record a day of observations
+ * ``state_bytes``: size of the saved state of a phone after a full
+   retention period of observations
+ * ``build_batch``: time for the server to build a batch
+ * ``batch_bytes``: size of a batch file, i.e., of the download
+ * ``match``: time for a phone to match its observations with a batch
+
+Times are medians in seconds, sizes are in bytes. Parameters that are not in
+the grid keep their default value.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import csv
+import io
+import itertools
+import statistics
+
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+from dp3t.config import DEFAULT_PARAMETERS, ProtocolParameters
+
+from benchmarks.harness import machine_info, time_function
+from benchmarks.workloads import (
+    lowcost_reports,
+    observation_times,
+    random_ephids,
+    release_time,
+    tracer_with_observations,
+    unlinkable_reports,
+    START_TIME,
+)
+
+#: Version of the sweep result format
+SWEEP_VERSION = 1
+
+#: Protocols that can be swept, by name
+PROTOCOLS = {"lowcost": lowcost, "unlinkable": unlinkable}
+
+#: Measured costs, in the order in which they are reported
+METRICS = [
+    "next_day",
+    "record_day",
+    "state_bytes",
+    "build_batch",
+    "batch_bytes",
+    "match",
+]
+
+
+def parse_grid(assignments):
+    """Parse NAME=V1,V2,... assignments into a grid of parameter values
+
+    Values are integers where possible, and floating point numbers otherwise.
+    """
+    grid = {}
+    for assignment in assignments:
+        name, _, values = assignment.partition("=")
+        if not values:
+            raise ValueError("Expected NAME=V1,V2,..., got {}".format(assignment))
+        grid[name] = [_parse_value(value) for value in values.split(",")]
+    return grid
+
+
+def _parse_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def parameter_grid(grid):
+    """Return the parameters for all combinations of values in grid
+
+    Args:
+        grid (dict): For some fields of :obj:`dp3t.config.ProtocolParameters`,
+            the list of values to sweep
+
+    Returns:
+        [:obj:`dp3t.config.ProtocolParameters`]: One set of parameters per
+            combination
+
+    Raises:
+        ValueError: If the grid has an unknown field, or a combination of
+            values is invalid
+    """
+    unknown = sorted(set(grid) - set(ProtocolParameters._fields))
+    if unknown:
+        raise ValueError("Unknown protocol parameters: {}".format(", ".join(unknown)))
+
+    names = sorted(grid)
+    return [
+        DEFAULT_PARAMETERS.replace(**dict(zip(names, values)))
+        for values in itertools.product(*[grid[name] for name in names])
+    ]
+
+
+def _median_time(run, repeat):
+    _, timings = time_function(run, repeat)
+    return statistics.median(timings)
+
+
+def _reports(protocol, infected, parameters):
+    """Reports of infected users, each covering a day of EphIDs"""
+    days = parameters.retention_period
+    if protocol is lowcost:
+        return lowcost_reports(infected, days)
+    return unlinkable_reports(
+        infected * parameters.num_epochs_per_day, days, parameters
+    )
+
+
+def measure(protocol, parameters, observations_per_day=100, infected=10, repeat=3):
+    """Measure the costs of a protocol with the given parameters
+
+    Args:
+        protocol (module): :mod:`dp3t.protocols.lowcost` or
+            :mod:`dp3t.protocols.unlinkable`
+        parameters (:obj:`dp3t.config.ProtocolParameters`): The parameters
+        observations_per_day (int, optional): Observations of the phone on
+            every day. Default: 100
+        infected (int, optional): Number of infected users in the batch, each
+            reporting a day of EphIDs. Default: 10
+        repeat (int, optional): Number of repetitions of timings. Default: 3
+
+    Returns:
+        dict: The value of each of the :data:`METRICS`
+    """
+    metrics = {}
+
+    tracer = protocol.ContactTracer(start_time=START_TIME, parameters=parameters)
+    metrics["next_day"] = _median_time(tracer.next_day, repeat)
+
+    times = observation_times(0, observations_per_day)
+    ephids = random_ephids(observations_per_day, parameters.length_ephid)
+
+    def record_day():
+        tracer = protocol.ContactTracer(start_time=START_TIME, parameters=parameters)
+        for (ephid, time) in zip(ephids, times):
+            tracer.add_observation(ephid, time)
+
+    metrics["record_day"] = _median_time(record_day, repeat)
+
+    tracer = tracer_with_observations(
+        protocol, observations_per_day, parameters=parameters
+    )
+    state_file = io.BytesIO()
+    tracer.write(state_file)
+    metrics["state_bytes"] = len(state_file.getvalue())
+
+    reports = _reports(protocol, infected, parameters)
+    release = release_time(parameters.retention_period)
+
+    def build_batch():
+        return protocol.TracingDataBatch(
+            reports, release_time=release, parameters=parameters
+        )
+
+    metrics["build_batch"] = _median_time(build_batch, repeat)
+
+    # Phones match with the batch as downloaded
+    batch_file = io.BytesIO()
+    build_batch().write(batch_file)
+    metrics["batch_bytes"] = len(batch_file.getvalue())
+    batch_file.seek(0)
+    batch = protocol.TracingDataBatch.read(batch_file, parameters)
+
+    metrics["match"] = _median_time(lambda: tracer.matches_with_batch(batch), repeat)
+
+    return metrics
+
+
+def run_sweep(
+    protocol_name, grid, observations_per_day=100, infected=10, repeat=3, report=None
+):
+    """Measure the costs of a protocol for all combinations of parameters in grid
+
+    Args:
+        protocol_name (str): One of :data:`PROTOCOLS`
+        grid (dict): For some fields of :obj:`dp3t.config.ProtocolParameters`,
+            the list of values to sweep
+        observations_per_day, infected, repeat: See :func:`measure`
+        report (callable, optional): Called with each case as it comes in
+
+    Returns:
+        dict: The sweep, ready to be stored with
+            :func:`benchmarks.harness.save_results`
+
+    Raises:
+        ValueError: If the protocol or a parameter is unknown, or a
+            combination of values is invalid
+    """
+    if protocol_name not in PROTOCOLS:
+        raise ValueError("Unknown protocol {}".format(protocol_name))
+    protocol = PROTOCOLS[protocol_name]
+
+    cases = []
+    for parameters in parameter_grid(grid):
+        case = {
+            "params": {name: getattr(parameters, name) for name in sorted(grid)},
+            "metrics": measure(
+                protocol, parameters, observations_per_day, infected, repeat
+            ),
+        }
+        cases.append(case)
+
+        if report is not None:
+            report(case)
+
+    return {
+        "version": SWEEP_VERSION,
+        "machine": machine_info(),
+        "protocol": protocol_name,
+        "workload": {
+            "observations_per_day": observations_per_day,
+            "infected": infected,
+        },
+        "parameters": DEFAULT_PARAMETERS._asdict(),
+        "cases": cases,
+    }
+
+
+def write_csv(sweep, f):
+    """Write the cases of a sweep as CSV, one row per combination of parameters"""
+    cases = sweep["cases"]
+    names = list(cases[0]["params"]) if cases else []
+
+    writer = csv.writer(f)
+    writer.writerow(names + METRICS)
+    for case in cases:
+        row = [case["params"][name] for name in names]
+        row.extend(case["metrics"][metric] for metric in METRICS)
+        writer.writerow(row)
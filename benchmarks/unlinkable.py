@@ -0,0 +1,186 @@
+"""
+Benchmarks of the unlinkable DP3T design
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import concurrent.futures
+import io
+import secrets
+
+import dp3t.protocols.unlinkable as unlinkable
+from dp3t.config import LENGTH_EPHID, RETENTION_PERIOD
+from dp3t.ingestion import UnlinkableIngestion
+
+from benchmarks.harness import benchmark
+from benchmarks.workloads import (
+    observation_times,
+    random_ephids,
+    release_time,
+    tracer_with_observations,
+    unlinkable_reports,
+    START_TIME,
+)
+
+
+@benchmark("unlinkable.ephid_from_seed")
+def ephid_from_seed():
+    seed = secrets.token_bytes(32)
+    return lambda: unlinkable.ephid_from_seed(seed)
+
+
+@benchmark("unlinkable.hashed_observation_from_ephid")
+def hashed_observation_from_ephid():
+    ephid = secrets.token_bytes(LENGTH_EPHID)
+    return lambda: unlinkable.hashed_observation_from_ephid(ephid, 1762781)
+
+
+@benchmark("unlinkable.next_day")
+def next_day():
+    tracer = unlinkable.ContactTracer(start_time=START_TIME)
+    return tracer.next_day
+
+
+@benchmark("unlinkable.tracing_batch", reported_epochs=[96, 960, 9600])
+def tracing_batch(reported_epochs):
+    reports = unlinkable_reports(reported_epochs)
+    return lambda: unlinkable.TracingDataBatch(reports, release_time=release_time(0))
+
+
+@benchmark("unlinkable.ingest_reports", uploads=[10000, 100000, 1000000])
+def ingest_reports(uploads):
+    # About one in ten uploaded epochs is a retry
+    reports = unlinkable_reports(uploads - uploads // 10)
+    reports.extend(reports[: len(reports) // 9])
+
+    def run():
+        ingestion = UnlinkableIngestion(now=release_time(RETENTION_PERIOD))
+        ingestion.add_reports(reports)
+        return list(ingestion.reports())
+
+    return run
+
+
+@benchmark("unlinkable.add_observation", observations_per_day=[100, 1000])
+def add_observation(observations_per_day):
+    times = observation_times(0, observations_per_day)
+    ephids = random_ephids(observations_per_day)
+
+    def run():
+        tracer = unlinkable.ContactTracer(start_time=START_TIME)
+        for (ephid, time) in zip(ephids, times):
+            tracer.add_observation(ephid, time)
+
+    return run
+
+
+@benchmark(
+    "unlinkable.matches_with_batch",
+    observations_per_day=[100, 1000],
+    reported_epochs=[960, 9600],
+    tracers=[1, 10],
+)
+def matches_with_batch(observations_per_day, reported_epochs, tracers):
+    tracers = [
+        tracer_with_observations(unlinkable, observations_per_day)
+        for _ in range(tracers)
+    ]
+    batch = unlinkable.TracingDataBatch(
+        unlinkable_reports(reported_epochs), release_time=release_time(RETENTION_PERIOD)
+    )
+
+    def run():
+        for tracer in tracers:
+            tracer.matches_with_batch(batch)
+
+    return run
+
+
+@benchmark(
+    "unlinkable.matches_with_frozen_batch",
+    observations_per_day=[100, 1000],
+    reported_epochs=[9600],
+    observation_format=list(unlinkable.OBSERVATION_FORMATS),
+)
+def matches_with_frozen_batch(
+    observations_per_day, reported_epochs, observation_format
+):
+    tracer = tracer_with_observations(
+        unlinkable, observations_per_day, observation_format=observation_format
+    )
+    batch = unlinkable.TracingDataBatch(
+        unlinkable_reports(reported_epochs), release_time=release_time(RETENTION_PERIOD)
+    )
+
+    # Published batches are downloaded as frozen filters
+    batch_file = io.BytesIO()
+    batch.write(batch_file)
+    batch_file.seek(0)
+    frozen_batch = unlinkable.TracingDataBatch.read(batch_file)
+
+    return lambda: tracer.matches_with_batch(frozen_batch)
+
+
+#: Worker pools of the parallel matching benchmark, by number of workers.
+#: They are reused across cases, and shut down when the interpreter exits.
+_MATCHING_POOLS = {}
+
+
+@benchmark(
+    "unlinkable.parallel_matches",
+    observations_per_day=[10000, 50000],
+    workers=[0, 1, 2, 4],
+)
+def parallel_matches(observations_per_day, workers):
+    # Without workers, match in this process for comparison
+    tracer = tracer_with_observations(unlinkable, observations_per_day)
+    batch = unlinkable.TracingDataBatch(
+        unlinkable_reports(9600), release_time=release_time(RETENTION_PERIOD)
+    )
+    batch.freeze()
+
+    pool = None
+    if workers:
+        if workers not in _MATCHING_POOLS:
+            _MATCHING_POOLS[workers] = concurrent.futures.ProcessPoolExecutor(workers)
+        pool = _MATCHING_POOLS[workers]
+
+    return lambda: tracer.matches_with_batch(batch, pool=pool)
+
+
+@benchmark(
+    "unlinkable.matches_with_encounters",
+    sightings=[1, 10, 100],
+    encounters=[False, True],
+)
+def matches_with_encounters(sightings, encounters):
+    # 1000 EphIDs a day, each sighted repeatedly within a few seconds
+    tracer = unlinkable.ContactTracer(start_time=START_TIME, encounters=encounters)
+    for day in range(RETENTION_PERIOD):
+        times = observation_times(day, 1000)
+        for (ephid, time) in zip(random_ephids(len(times)), times):
+            for _ in range(sightings):
+                tracer.add_observation(ephid, time, 50 if encounters else None)
+        tracer.next_day()
+
+    batch = unlinkable.TracingDataBatch(
+        unlinkable_reports(9600), release_time=release_time(RETENTION_PERIOD)
+    )
+    batch.freeze()
+
+    return lambda: tracer.matches_with_batch(batch)
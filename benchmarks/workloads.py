@@ -0,0 +1,113 @@
+"""
+Synthetic workloads shared by the benchmarks
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import datetime
+import secrets
+
+from dp3t.config import (
+    DEFAULT_PARAMETERS,
+    LENGTH_EPHID,
+    RETENTION_PERIOD,
+    SECONDS_PER_DAY,
+)
+
+#: Start of the first simulated day
+START_TIME = datetime.datetime(2020, 4, 25, tzinfo=datetime.timezone.utc)
+
+
+def day_time(day):
+    """Start of the given simulated day (datetime.datetime)"""
+    return START_TIME + datetime.timedelta(days=day)
+
+
+def release_time(days):
+    """Release time (in UNIX epoch seconds) at the start of the given day"""
+    return int(START_TIME.timestamp()) + days * SECONDS_PER_DAY
+
+
+def observation_times(day, nr_observations):
+    """Spread nr_observations evenly over the given simulated day"""
+    interval = SECONDS_PER_DAY / max(nr_observations, 1)
+    return [
+        day_time(day) + datetime.timedelta(seconds=int(i * interval))
+        for i in range(nr_observations)
+    ]
+
+
+def random_ephids(nr_ephids, length_ephid=LENGTH_EPHID):
+    return [secrets.token_bytes(length_ephid) for _ in range(nr_ephids)]
+
+
+def tracer_with_observations(protocol, observations_per_day, days=None, **kwargs):
+    """Create a contact tracer that observed random EphIDs on each of the days
+
+    Args:
+        protocol (module): :mod:`dp3t.protocols.lowcost` or
+            :mod:`dp3t.protocols.unlinkable`
+        observations_per_day (int): Number of observations on every day
+        days (int, optional): Number of days. Default: the retention period of
+            the tracer
+        **kwargs: Further arguments for `protocol.ContactTracer`
+
+    Returns:
+        A `protocol.ContactTracer` on the day after the last observation
+    """
+    tracer = protocol.ContactTracer(start_time=START_TIME, **kwargs)
+    parameters = tracer.parameters
+    if days is None:
+        days = parameters.retention_period
+
+    for day in range(days):
+        times = observation_times(day, observations_per_day)
+        ephids = random_ephids(len(times), parameters.length_ephid)
+        for (ephid, time) in zip(ephids, times):
+            tracer.add_observation(ephid, time)
+        tracer.next_day()
+
+    return tracer
+
+
+def lowcost_reports(nr_keys, days=RETENTION_PERIOD):
+    """Random (start_time, key) reports that start within the given days"""
+    return [(release_time(i % days), secrets.token_bytes(32)) for i in range(nr_keys)]
+
+
+def unlinkable_reports(nr_epochs, days=RETENTION_PERIOD, parameters=DEFAULT_PARAMETERS):
+    """Random (epochs, seeds) reports covering nr_epochs epochs in total
+
+    Every report covers at most a single day, and starts within the given days.
+    """
+    num_epochs_per_day = parameters.num_epochs_per_day
+    first_epoch = release_time(0) // SECONDS_PER_DAY * num_epochs_per_day
+
+    reports = []
+    report_idx = 0
+    while nr_epochs > 0:
+        nr_report_epochs = min(nr_epochs, num_epochs_per_day)
+        start = first_epoch + (report_idx % days) * num_epochs_per_day
+        epochs = range(start, start + nr_report_epochs)
+        seeds = [secrets.token_bytes(32) for _ in epochs]
+        reports.append((epochs, seeds))
+
+        nr_epochs -= nr_report_epochs
+        report_idx += 1
+
+    return reports
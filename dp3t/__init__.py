@@ -0,0 +1,88 @@
+"""
+Reference implementation of the DP3T designs.
+
+Importing this package is cheap: the protocol modules, crypto backends and
+filter libraries are only loaded when they are first used. For example,
+``dp3t.epoch_from_time`` only loads :mod:`dp3t.protocols.unlinkable`, and
+does not load the cuckoo filter library or any crypto backend.
+
+The names below can be accessed as attributes of this package (Python 3.7+),
+or imported from their modules directly.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import importlib
+
+#: Lazily loaded modules, by attribute name
+_MODULES = {
+    "config": "dp3t.config",
+    "conformance": "dp3t.conformance",
+    "crypto": "dp3t.crypto",
+    "encounters": "dp3t.encounters",
+    "feed": "dp3t.feed",
+    "filters": "dp3t.filters",
+    "ingestion": "dp3t.ingestion",
+    "instrumentation": "dp3t.instrumentation",
+    "ledger": "dp3t.ledger",
+    "lowcost": "dp3t.protocols.lowcost",
+    "memory": "dp3t.memory",
+    "parallel": "dp3t.parallel",
+    "pool": "dp3t.pool",
+    "publication": "dp3t.publication",
+    "retention": "dp3t.retention",
+    "risk": "dp3t.risk",
+    "storage": "dp3t.storage",
+    "testvectors": "dp3t.testvectors",
+    "unlinkable": "dp3t.protocols.unlinkable",
+}
+
+#: Lazily loaded functions and constants, by the module that defines them
+_ATTRIBUTES = {
+    "RETENTION_PERIOD": "dp3t.config",
+    "EPOCH_LENGTH": "dp3t.config",
+    "NUM_EPOCHS_PER_DAY": "dp3t.config",
+    "LENGTH_EPHID": "dp3t.config",
+    "SECONDS_PER_DAY": "dp3t.config",
+    "ProtocolParameters": "dp3t.config",
+    "DEFAULT_PARAMETERS": "dp3t.config",
+    "day_start_from_time": "dp3t.protocols.lowcost",
+    "batch_start_from_time": "dp3t.protocols.lowcost",
+    "epoch_from_time": "dp3t.protocols.unlinkable",
+    "get_backend": "dp3t.crypto",
+    "set_backend": "dp3t.crypto",
+}
+
+__all__ = sorted(list(_MODULES) + list(_ATTRIBUTES))
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        value = importlib.import_module(_MODULES[name])
+    elif name in _ATTRIBUTES:
+        value = getattr(importlib.import_module(_ATTRIBUTES[name]), name)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    # Cache the value, so that later lookups do not go through this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
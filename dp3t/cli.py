@@ -0,0 +1,325 @@
+"""
+Command line interface to the DP3T designs
+
+Reports of infected users are read as JSON lines, one report per line:
+
+    lowcost:     {"start_time": 1587772800, "key": "<64 hex digits>"}
+    unlinkable:  {"epochs": [1763290, ...], "seeds": ["<64 hex digits>", ...]}
+                 or {"first_epoch": 1763290, "seeds": [...]} for consecutive epochs
+
+Reports are streamed, so batches can be built from millions of reports with
+bounded memory. Tracer states are created with `ContactTracer.write`.
+
+Examples:
+
+    dp3t lowcost build-batch reports.jsonl -o batch.bin --release-time 1587772800
+    dp3t lowcost match tracer.bin batch.bin
+    dp3t unlinkable build-batch - -o batch.bin < reports.jsonl
+    dp3t unlinkable vectors
+    dp3t lowcost generate-vectors -n 1000000 -o vectors.bin --workers 8
+    dp3t lowcost verify-vectors vectors.bin
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import argparse
+import functools
+import itertools
+import json
+import sys
+
+#: Number of lowcost tracing keys matched at a time
+MATCH_CHUNK_SIZE = 10000
+
+
+def read_lines(path):
+    """Yield the non-empty lines of path, or of stdin if path is "-" """
+    if path == "-":
+        lines = sys.stdin
+    else:
+        lines = open(path, "r")
+
+    try:
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def parse_lowcost_report(line):
+    """Parse a lowcost JSON report into a (start_time, key) pair"""
+    report = json.loads(line)
+    return int(report["start_time"]), bytes.fromhex(report["key"])
+
+
+def parse_unlinkable_report(line):
+    """Parse an unlinkable JSON report into an (epochs, seeds) pair"""
+    report = json.loads(line)
+    seeds = [bytes.fromhex(seed) for seed in report["seeds"]]
+    if "epochs" in report:
+        epochs = [int(epoch) for epoch in report["epochs"]]
+    else:
+        first_epoch = int(report["first_epoch"])
+        epochs = range(first_epoch, first_epoch + len(seeds))
+
+    if len(epochs) != len(seeds):
+        raise ValueError("Reports must have one seed per epoch")
+    return epochs, seeds
+
+
+def chunks(iterable, size):
+    """Split iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def report(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def cmd_lowcost_build_batch(args):
+    from dp3t.config import ProtocolParameters
+    from dp3t.protocols import lowcost
+
+    if args.seconds_per_batch is None:
+        parameters = ProtocolParameters()
+    else:
+        parameters = ProtocolParameters(seconds_per_batch=args.seconds_per_batch)
+
+    release_time = args.release_time
+    if release_time is None:
+        release_time = lowcost.TracingDataBatch([], parameters=parameters).release_time
+    elif release_time % parameters.seconds_per_batch != 0:
+        raise ValueError("Release time must be batch-aligned")
+
+    pairs = (parse_lowcost_report(line) for line in read_lines(args.input))
+    with open(args.output, "wb") as f:
+        nr_keys = lowcost.write_batch(f, pairs, release_time)
+
+    report("Wrote {} tracing keys to {}".format(nr_keys, args.output))
+
+
+def cmd_lowcost_match(args):
+    from dp3t.protocols import lowcost
+
+    with open(args.state, "rb") as f:
+        tracer = lowcost.ContactTracer.read(f)
+
+    nr_matches = 0
+    with open(args.batch, "rb") as f:
+        release_time, pairs = lowcost.read_batch(f)
+        for chunk in chunks(pairs, MATCH_CHUNK_SIZE):
+            batch = lowcost.TracingDataBatch(chunk, release_time, tracer.parameters)
+            nr_matches += tracer.matches_with_batch(batch)
+
+    print(nr_matches)
+
+
+def cmd_lowcost_vectors(args):
+    from dp3t.testvectors import print_lowcost_vectors
+
+    print_lowcost_vectors()
+
+
+def cmd_unlinkable_build_batch(args):
+    from dp3t.protocols import unlinkable
+
+    builder = unlinkable.BatchBuilder(args.release_time, tuned=args.tuned)
+    builder.add_reports(
+        parse_unlinkable_report(line) for line in read_lines(args.input)
+    )
+    nr_items = builder.nr_items
+    batch = builder.finish()
+
+    with open(args.output, "wb") as f:
+        batch.write(f)
+
+    report("Wrote {} hashed observations to {}".format(nr_items, args.output))
+
+
+def cmd_unlinkable_match(args):
+    from dp3t.protocols import unlinkable
+
+    with open(args.state, "rb") as f:
+        tracer = unlinkable.ContactTracer.read(f)
+
+    with open(args.batch, "rb") as f:
+        batch = unlinkable.TracingDataBatch.read(f, tracer.parameters)
+
+    print(tracer.matches_with_batch(batch))
+
+
+def cmd_unlinkable_vectors(args):
+    from dp3t.testvectors import print_unlinkable_vectors
+
+    print_unlinkable_vectors()
+
+
+def generate_vectors(design, args):
+    from dp3t import conformance
+
+    seed = bytes.fromhex(args.seed) if args.seed else None
+    with open(args.output, "wb") as f:
+        seed = conformance.generate(
+            f,
+            design,
+            args.nr_vectors,
+            seed=seed,
+            vector_format=args.format,
+            workers=args.workers,
+        )
+
+    report(
+        "Wrote {} vectors to {} (seed {})".format(
+            args.nr_vectors, args.output, seed.hex()
+        )
+    )
+
+
+def verify_vectors(design, args):
+    from dp3t import conformance
+
+    with open(args.vectors, "rb") as f:
+        result = conformance.verify(f)
+
+    if result.design != design:
+        raise ValueError("{} holds {} vectors".format(args.vectors, result.design))
+
+    for (index, field) in result.mismatches:
+        print("vector {}: wrong {}".format(index, field))
+    print(
+        "{} of {} vectors match".format(
+            result.nr_vectors - result.nr_mismatches, result.nr_vectors
+        )
+    )
+
+    return 0 if result.ok else 1
+
+
+COMMANDS = {
+    "lowcost": {
+        "build-batch": cmd_lowcost_build_batch,
+        "match": cmd_lowcost_match,
+        "vectors": cmd_lowcost_vectors,
+        "generate-vectors": functools.partial(generate_vectors, "lowcost"),
+        "verify-vectors": functools.partial(verify_vectors, "lowcost"),
+    },
+    "unlinkable": {
+        "build-batch": cmd_unlinkable_build_batch,
+        "match": cmd_unlinkable_match,
+        "vectors": cmd_unlinkable_vectors,
+        "generate-vectors": functools.partial(generate_vectors, "unlinkable"),
+        "verify-vectors": functools.partial(verify_vectors, "unlinkable"),
+    },
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="dp3t",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.set_defaults(func=None)
+    protocol_parsers = parser.add_subparsers()
+
+    for (protocol, commands) in COMMANDS.items():
+        protocol_parser = protocol_parsers.add_parser(
+            protocol, help="commands of the {} design".format(protocol)
+        )
+        subparsers = protocol_parser.add_subparsers()
+
+        build_parser = subparsers.add_parser(
+            "build-batch", help="build a batch from JSON-lines reports"
+        )
+        build_parser.add_argument("input", help='file of reports, or "-" for stdin')
+        build_parser.add_argument("-o", "--output", required=True)
+        build_parser.add_argument(
+            "--release-time",
+            type=int,
+            help="release time in seconds since UNIX Epoch",
+        )
+        if protocol == "lowcost":
+            build_parser.add_argument(
+                "--seconds-per-batch",
+                type=int,
+                help="length of a batch (default: the protocol default)",
+            )
+        if protocol == "unlinkable":
+            build_parser.add_argument(
+                "--tuned",
+                action="store_true",
+                help="size the filter to minimize the batch, see dp3t.sizing",
+            )
+        build_parser.set_defaults(func=commands["build-batch"])
+
+        match_parser = subparsers.add_parser(
+            "match", help="count matches of a saved tracer with a batch"
+        )
+        match_parser.add_argument("state", help="file written by ContactTracer.write")
+        match_parser.add_argument("batch", help="file written by build-batch")
+        match_parser.set_defaults(func=commands["match"])
+
+        vectors_parser = subparsers.add_parser("vectors", help="print test vectors")
+        vectors_parser.set_defaults(func=commands["vectors"])
+
+        generate_parser = subparsers.add_parser(
+            "generate-vectors", help="write a large conformance vector file"
+        )
+        generate_parser.add_argument(
+            "-n", "--nr-vectors", type=int, required=True, help="number of vectors"
+        )
+        generate_parser.add_argument("-o", "--output", required=True)
+        generate_parser.add_argument(
+            "--format", choices=["binary", "jsonl"], default="binary"
+        )
+        generate_parser.add_argument(
+            "--workers", type=int, help="worker processes (default: number of CPUs)"
+        )
+        generate_parser.add_argument(
+            "--seed", help="64 hex digits, to generate the same vectors again"
+        )
+        generate_parser.set_defaults(func=commands["generate-vectors"])
+
+        verify_parser = subparsers.add_parser(
+            "verify-vectors", help="check a conformance vector file"
+        )
+        verify_parser.add_argument("vectors", help="binary or JSON-lines vector file")
+        verify_parser.set_defaults(func=commands["verify-vectors"])
+
+    args = parser.parse_args(argv)
+    if args.func is None:
+        parser.print_help()
+        return 1
+
+    try:
+        return args.func(args) or 0
+    except (OSError, ValueError, KeyError) as error:
+        report("dp3t: error: {}".format(error))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
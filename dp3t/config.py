@@ -19,6 +19,8 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
+import collections
+
 
 #: For how many days we should store keys and observations
 RETENTION_PERIOD = 21
@@ -34,3 +36,99 @@ LENGTH_EPHID = 16
 
 #: Seconds in a UNIX Epoch day
 SECONDS_PER_DAY = 24 * 60 * 60
+
+#: Length of a batch in the low-cost design, in seconds
+SECONDS_PER_BATCH = 2 * 60 * 60
+
+#: False positive rate of the cuckoo filters in the unlinkable design
+CUCKOO_FPR = 2 ** -42
+
+
+class ProtocolParameters(
+    collections.namedtuple(
+        "ProtocolParameters",
+        [
+            "epoch_length",
+            "retention_period",
+            "length_ephid",
+            "seconds_per_batch",
+            "cuckoo_fpr",
+        ],
+    )
+):
+    """The system parameters of a contact tracer or a batch
+
+    Contact tracers and batches of both designs take their parameters at
+    construction. By default, they use :data:`DEFAULT_PARAMETERS`, i.e., the
+    module constants above. Parameters that are not given keep their default
+    value, for example::
+
+        parameters = ProtocolParameters(epoch_length=5, retention_period=14)
+
+    Attributes:
+        epoch_length (int): The length of an epoch in minutes
+        retention_period (int): For how many days to store keys and observations
+        length_ephid (int): Length of EphIDs in bytes
+        seconds_per_batch (int): Length of a batch in the low-cost design
+        cuckoo_fpr (float): False positive rate of the cuckoo filters in the
+            unlinkable design
+    """
+
+    __slots__ = ()
+
+    def __new__(
+        cls,
+        epoch_length=EPOCH_LENGTH,
+        retention_period=RETENTION_PERIOD,
+        length_ephid=LENGTH_EPHID,
+        seconds_per_batch=SECONDS_PER_BATCH,
+        cuckoo_fpr=CUCKOO_FPR,
+    ):
+        """Create and check a set of parameters
+
+        Raises:
+            ValueError: If epochs or batches do not evenly divide a day, if
+                EphIDs are longer than a SHA-256 digest, or if a value is out
+                of range
+        """
+        if epoch_length <= 0 or 1440 % epoch_length != 0:
+            raise ValueError("The epoch length must divide a day")
+        if retention_period <= 0:
+            raise ValueError("The retention period must be at least one day")
+        if not 0 < length_ephid <= 32:
+            raise ValueError("EphIDs must be between 1 and 32 bytes long")
+        if seconds_per_batch <= 0 or SECONDS_PER_DAY % seconds_per_batch != 0:
+            raise ValueError("The length of a batch must divide a day")
+        if not 0 < cuckoo_fpr < 1:
+            raise ValueError("The false positive rate must be between 0 and 1")
+
+        return super().__new__(
+            cls,
+            epoch_length,
+            retention_period,
+            length_ephid,
+            seconds_per_batch,
+            cuckoo_fpr,
+        )
+
+    @property
+    def num_epochs_per_day(self):
+        """Number of epochs in a day"""
+        return 1440 // self.epoch_length
+
+    @property
+    def epoch_seconds(self):
+        """The length of an epoch in seconds"""
+        return self.epoch_length * 60
+
+    def replace(self, **changes):
+        """Return a copy of these parameters with some values changed
+
+        Raises:
+            ValueError: If the new values are invalid, see :obj:`ProtocolParameters`
+        """
+        return type(self)(**dict(self._asdict(), **changes))
+
+
+#: The parameters of the DP3T white paper
+DEFAULT_PARAMETERS = ProtocolParameters()
@@ -0,0 +1,410 @@
+"""
+Large conformance vector files for other implementations of the DP3T designs.
+
+Where :mod:`dp3t.testvectors` prints a handful of vectors, this module writes
+any number of vectors for random inputs, and checks vector files written by
+other implementations. Every vector holds the inputs and the outputs of the
+cryptographic functions of a design:
+
+ * lowcost: a day key, the next day key (:func:`next_day_key`), and the
+   unshuffled EphIDs of the day (:func:`generate_ephids_for_day`)
+ * unlinkable: a seed, an epoch, the EphID (:func:`ephid_from_seed`), and the
+   hashed observation of the EphID in that epoch
+   (:func:`hashed_observation_from_ephid`)
+
+Vector files come in two formats. Binary files start with a magic string and
+the protocol parameters (see :mod:`dp3t.serialization`), followed by
+fixed-length records of the fields above in order; epochs are 4-byte
+big-endian integers. JSON-lines files start with a header line
+``{"design": ..., "parameters": {...}}``, followed by one vector per line::
+
+    lowcost:     {"key": "<hex>", "next_key": "<hex>", "ephids": ["<hex>", ...]}
+    unlinkable:  {"seed": "<hex>", "epoch": 1763290, "ephid": "<hex>",
+                  "hashed_observation": "<hex>"}
+
+Inputs are derived from a 32-byte generator seed, so that the same seed always
+gives the same file, regardless of the number of worker processes.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import secrets
+
+from dp3t.config import DEFAULT_PARAMETERS, ProtocolParameters
+from dp3t.serialization import (
+    LOWCOST_VECTORS,
+    UNLINKABLE_VECTORS,
+    read_exactly,
+    read_parameters,
+    write_magic,
+    write_parameters,
+)
+
+#: Designs with conformance vectors
+DESIGNS = ("lowcost", "unlinkable")
+
+#: Formats of vector files
+VECTOR_FORMATS = ("binary", "jsonl")
+
+#: Number of vectors generated or verified at a time
+CHUNK_SIZE = 1000
+
+_MAGICS = {"lowcost": LOWCOST_VECTORS, "unlinkable": UNLINKABLE_VECTORS}
+
+
+class VerificationReport(
+    collections.namedtuple(
+        "VerificationReport", ["design", "nr_vectors", "nr_mismatches", "mismatches"]
+    )
+):
+    """The result of :func:`verify`
+
+    Attributes:
+        design (str): The design of the vectors, one of :data:`DESIGNS`
+        nr_vectors (int): Number of verified vectors
+        nr_mismatches (int): Number of vectors with at least one wrong output
+        mismatches ([(int, str)]): The index and the first wrong field of the
+            first mismatching vectors
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.nr_mismatches == 0
+
+
+def record_length(design, parameters):
+    """Length in bytes of a binary vector record"""
+    if design == "lowcost":
+        return 32 + 32 + parameters.num_epochs_per_day * parameters.length_ephid
+    return 32 + 4 + parameters.length_ephid + 32
+
+
+def _inputs(seed, start, count):
+    """Derive the 32-byte inputs of vectors start, ..., start + count - 1"""
+    return [
+        hashlib.sha256(seed + index.to_bytes(8, "big")).digest()
+        for index in range(start, start + count)
+    ]
+
+
+def _lowcost_vectors(inputs, parameters):
+    from dp3t.protocols import lowcost
+
+    all_ephids = lowcost.generate_ephids_for_days(
+        inputs, shuffle=False, parameters=parameters
+    )
+    return [
+        (key, lowcost.next_day_key(key), ephids)
+        for (key, ephids) in zip(inputs, all_ephids)
+    ]
+
+
+def _unlinkable_vectors(inputs, parameters):
+    from dp3t.protocols import unlinkable
+
+    # Epochs up to 2^32 - 1, the largest epoch that hashed observations encode
+    epochs = [
+        int.from_bytes(hashlib.sha256(seed).digest()[:4], "big") for seed in inputs
+    ]
+    ephids = unlinkable.ephids_from_seeds(inputs, parameters)
+    hashed_observations = unlinkable.hashed_observations_from_seeds(
+        inputs, epochs, parameters
+    )
+    return list(zip(inputs, epochs, ephids, hashed_observations))
+
+
+def _encode_binary(design, vector):
+    if design == "lowcost":
+        (key, next_key, ephids) = vector
+        return key + next_key + b"".join(ephids)
+
+    (seed, epoch, ephid, hashed_observation) = vector
+    return seed + epoch.to_bytes(4, "big") + ephid + hashed_observation
+
+
+def _encode_json(design, vector):
+    if design == "lowcost":
+        (key, next_key, ephids) = vector
+        record = {
+            "key": key.hex(),
+            "next_key": next_key.hex(),
+            "ephids": [ephid.hex() for ephid in ephids],
+        }
+    else:
+        (seed, epoch, ephid, hashed_observation) = vector
+        record = {
+            "seed": seed.hex(),
+            "epoch": epoch,
+            "ephid": ephid.hex(),
+            "hashed_observation": hashed_observation.hex(),
+        }
+    return (json.dumps(record) + "\n").encode("ascii")
+
+
+def generate_chunk(design, seed, start, count, vector_format, parameters):
+    """Return vectors start, ..., start + count - 1 encoded in vector_format"""
+    inputs = _inputs(seed, start, count)
+    if design == "lowcost":
+        vectors = _lowcost_vectors(inputs, parameters)
+    else:
+        vectors = _unlinkable_vectors(inputs, parameters)
+
+    encode = _encode_binary if vector_format == "binary" else _encode_json
+    return b"".join(encode(design, vector) for vector in vectors)
+
+
+def _write_header(f, design, vector_format, parameters):
+    if vector_format == "binary":
+        write_magic(f, _MAGICS[design])
+        write_parameters(f, parameters)
+    else:
+        header = {"design": design, "parameters": parameters._asdict()}
+        f.write((json.dumps(header) + "\n").encode("ascii"))
+
+
+def generate(
+    f,
+    design,
+    nr_vectors,
+    seed=None,
+    vector_format="binary",
+    parameters=DEFAULT_PARAMETERS,
+    workers=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """Write conformance vectors to the binary file f
+
+    Chunks of vectors are computed by worker processes and written in order.
+    At most two chunks per worker are in flight, so memory use does not
+    depend on the number of vectors.
+
+    Args:
+        f: A binary file
+        design (str): One of :data:`DESIGNS`
+        nr_vectors (int): Number of vectors
+        seed (bytes, optional): 32-byte generator seed. Default: a random seed
+        vector_format (str, optional): One of :data:`VECTOR_FORMATS`.
+            Default: "binary"
+        parameters (:obj:`ProtocolParameters`, optional): The parameters of the
+            design. Default: :data:`DEFAULT_PARAMETERS`
+        workers (int, optional): Number of worker processes. 1 computes the
+            vectors in this process. Default: the number of CPUs
+        chunk_size (int, optional): Number of vectors per chunk
+
+    Returns:
+        bytes: The generator seed
+
+    Raises:
+        ValueError: If the design or format is unknown
+    """
+    if design not in DESIGNS:
+        raise ValueError("Unknown design {}".format(design))
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError("Unknown vector format {}".format(vector_format))
+    if seed is None:
+        seed = secrets.token_bytes(32)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _write_header(f, design, vector_format, parameters)
+
+    chunks = (
+        (design, seed, start, min(chunk_size, nr_vectors - start), vector_format)
+        for start in range(0, nr_vectors, chunk_size)
+    )
+
+    if workers <= 1:
+        for chunk in chunks:
+            f.write(generate_chunk(*chunk, parameters))
+        return seed
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                f.write(pending.popleft().result())
+            pending.append(pool.submit(generate_chunk, *chunk, parameters))
+
+        while pending:
+            f.write(pending.popleft().result())
+
+    return seed
+
+
+def _read_binary_vectors(f, design, parameters):
+    """Yield the vectors of a binary file, after its header"""
+    length_ephid = parameters.length_ephid
+    length = record_length(design, parameters)
+
+    while True:
+        record = f.read(length)
+        if not record:
+            return
+        if len(record) != length:
+            raise ValueError("Unexpected end of file")
+
+        if design == "lowcost":
+            ephids = record[64:]
+            yield (
+                record[:32],
+                record[32:64],
+                [
+                    ephids[i : i + length_ephid]
+                    for i in range(0, len(ephids), length_ephid)
+                ],
+            )
+        else:
+            yield (
+                record[:32],
+                int.from_bytes(record[32:36], "big"),
+                record[36 : 36 + length_ephid],
+                record[36 + length_ephid :],
+            )
+
+
+def _read_json_vectors(f, design):
+    """Yield the vectors of a JSON-lines file, after its header"""
+    for (line_number, line) in enumerate(f, 2):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if design == "lowcost":
+                yield (
+                    bytes.fromhex(record["key"]),
+                    bytes.fromhex(record["next_key"]),
+                    [bytes.fromhex(ephid) for ephid in record["ephids"]],
+                )
+            else:
+                yield (
+                    bytes.fromhex(record["seed"]),
+                    int(record["epoch"]),
+                    bytes.fromhex(record["ephid"]),
+                    bytes.fromhex(record["hashed_observation"]),
+                )
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError("Invalid vector on line {}: {}".format(line_number, error))
+
+
+def read_vectors(f):
+    """Read the header of a vector file, and return its vectors
+
+    Args:
+        f: A binary file in either of the :data:`VECTOR_FORMATS`
+
+    Returns:
+        (design, parameters, vectors): The design, the
+            :obj:`ProtocolParameters`, and a generator of the vectors, as
+            tuples of the fields in file order
+
+    Raises:
+        ValueError: If f is not a vector file
+    """
+    start = read_exactly(f, 8)
+    for (design, magic) in _MAGICS.items():
+        if start == magic:
+            parameters = read_parameters(f)
+            return design, parameters, _read_binary_vectors(f, design, parameters)
+
+    try:
+        header = json.loads(start + f.readline())
+        design = header["design"]
+        parameters = ProtocolParameters(**header["parameters"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Not a conformance vector file")
+    if design not in DESIGNS:
+        raise ValueError("Unknown design {}".format(design))
+
+    return design, parameters, _read_json_vectors(f, design)
+
+
+def _lowcost_mismatches(vectors, parameters):
+    """Yield the index within vectors and the first wrong field of each mismatch"""
+    keys = [key for (key, _, _) in vectors]
+    expected = _lowcost_vectors(keys, parameters)
+
+    for (index, (vector, expected_vector)) in enumerate(zip(vectors, expected)):
+        if vector[1] != expected_vector[1]:
+            yield index, "next_key"
+        elif vector[2] != expected_vector[2]:
+            yield index, "ephids"
+
+
+def _unlinkable_mismatches(vectors, parameters):
+    from dp3t.protocols import unlinkable
+
+    seeds = [seed for (seed, _, _, _) in vectors]
+    expected_ephids = unlinkable.ephids_from_seeds(seeds, parameters)
+
+    for (index, (vector, expected_ephid)) in enumerate(zip(vectors, expected_ephids)):
+        (_, epoch, ephid, hashed_observation) = vector
+        if ephid != expected_ephid:
+            yield index, "ephid"
+        elif hashed_observation != unlinkable.hashed_observation_from_ephid(
+            ephid, epoch
+        ):
+            yield index, "hashed_observation"
+
+
+def verify(f, max_mismatches=10, chunk_size=CHUNK_SIZE):
+    """Check the vectors of a file against this implementation
+
+    The file is read in chunks of vectors, so memory use does not depend on
+    the size of the file.
+
+    Args:
+        f: A binary file written by :func:`generate` or by another
+            implementation in the same format
+        max_mismatches (int, optional): Number of mismatches to report in
+            detail. All mismatches are counted. Default: 10
+        chunk_size (int, optional): Number of vectors checked at a time
+
+    Returns:
+        :obj:`VerificationReport`: The result
+
+    Raises:
+        ValueError: If f is not a valid vector file
+    """
+    design, parameters, vectors = read_vectors(f)
+    mismatches_in = (
+        _lowcost_mismatches if design == "lowcost" else _unlinkable_mismatches
+    )
+
+    nr_vectors = 0
+    nr_mismatches = 0
+    mismatches = []
+    while True:
+        chunk = list(itertools.islice(vectors, chunk_size))
+        if not chunk:
+            break
+
+        for (index, field) in mismatches_in(chunk, parameters):
+            nr_mismatches += 1
+            if len(mismatches) < max_mismatches:
+                mismatches.append((nr_vectors + index, field))
+        nr_vectors += len(chunk)
+
+    return VerificationReport(design, nr_vectors, nr_mismatches, mismatches)
@@ -0,0 +1,195 @@
+"""
+Pluggable backends for the cryptographic primitives of the DP3T designs.
+
+Both designs only need SHA-256, HMAC-SHA256 and a pseudo-random generator
+(PRG) built from AES-256 in counter mode. A backend provides these
+primitives, and expands many PRG keys at once with the cipher of its library.
+The protocols use the active backend, see :func:`get_backend`.
+
+Backends are loaded on first use. The default backend is selected by the
+environment variable DP3T_CRYPTO_BACKEND, and otherwise is
+:data:`DEFAULT_BACKEND`. Use :func:`select_fastest_backend` to pick the
+fastest backend available on the host.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import abc
+import contextlib
+import hashlib
+import hmac
+import importlib
+import os
+
+
+#: Registered backends: for each name, the module and class implementing it
+BACKENDS = {
+    "pycryptodome": ("dp3t.crypto.pycryptodome", "PycryptodomeBackend"),
+    "openssl": ("dp3t.crypto.openssl", "OpenSSLBackend"),
+}
+
+#: Backend used when DP3T_CRYPTO_BACKEND is not set
+DEFAULT_BACKEND = "pycryptodome"
+
+#: Environment variable that selects the default backend
+BACKEND_ENVIRONMENT_VARIABLE = "DP3T_CRYPTO_BACKEND"
+
+_active_backend = None
+
+
+class CryptoBackend(abc.ABC):
+    """Cryptographic primitives used by the DP3T designs
+
+    Backends must implement :func:`prg` and :func:`prg_many`. Hashing
+    defaults to the implementations of the Python standard library.
+    """
+
+    #: Name of the backend, see :data:`BACKENDS`
+    name = None
+
+    def sha256(self, data):
+        """Return the SHA-256 digest of data"""
+        return hashlib.sha256(data).digest()
+
+    def sha256_many(self, items):
+        """Return the SHA-256 digest of each of the items
+
+        The standard library hashes one item at a time, this only saves the
+        lookups of :func:`sha256` for every item.
+        """
+        sha256 = hashlib.sha256
+        return [sha256(item).digest() for item in items]
+
+    def hmac_sha256(self, key, message):
+        """Return HMAC-SHA256 of message under key"""
+        return hmac.new(key, message, hashlib.sha256).digest()
+
+    @abc.abstractmethod
+    def prg(self, key, length):
+        """Expand key into length pseudo-random bytes
+
+        The output is the AES-256 CTR-mode key stream for the given key with
+        a 128-bit counter starting at zero, i.e., the encryption of an
+        all-zero message of the given length.
+
+        Args:
+            key (byte array): A 32-byte key
+            length (int): Number of bytes to produce
+        """
+
+    @abc.abstractmethod
+    def prg_many(self, keys, length):
+        """Expand each of the keys into length pseudo-random bytes, see :func:`prg`"""
+
+    def __repr__(self):
+        return "<{}: {}>".format(type(self).__name__, self.name)
+
+
+def load_backend(name):
+    """Create an instance of the backend with the given name
+
+    Raises:
+        ValueError: If no backend with that name is registered
+        ImportError: If the library needed by the backend is not installed
+    """
+    if name not in BACKENDS:
+        raise ValueError("Unknown crypto backend {}".format(name))
+
+    module_name, class_name = BACKENDS[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)()
+
+
+def available_backends():
+    """Return the names of the backends whose libraries are installed"""
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+
+    return names
+
+
+def get_backend():
+    """Return the active backend, loading the default backend if needed"""
+    if _active_backend is None:
+        set_backend(os.environ.get(BACKEND_ENVIRONMENT_VARIABLE, DEFAULT_BACKEND))
+    return _active_backend
+
+
+def set_backend(backend):
+    """Make a backend the active backend
+
+    Args:
+        backend (str or :obj:`CryptoBackend`): The backend or its name. None
+            resets to the default backend, which is loaded on next use.
+
+    Returns:
+        :obj:`CryptoBackend`: The previously active backend, or None
+    """
+    global _active_backend
+
+    if isinstance(backend, str):
+        backend = load_backend(backend)
+
+    previous, _active_backend = _active_backend, backend
+    return previous
+
+
+@contextlib.contextmanager
+def use_backend(backend):
+    """Use a backend for the duration of a with-block"""
+    previous = set_backend(backend)
+    try:
+        yield _active_backend
+    finally:
+        set_backend(previous)
+
+
+def time_backend(backend, nr_keys=21, nr_inputs=2016, number=10, repeat=3):
+    """Time a representative workload: the PRG and hashing for 21 days
+
+    Returns:
+        float: The fastest time of the workload, in seconds
+    """
+    import timeit
+
+    keys = [bytes([i]) * 32 for i in range(nr_keys)]
+    inputs = [i.to_bytes(20, "big") for i in range(nr_inputs)]
+
+    def workload():
+        backend.prg_many(keys, 1536)
+        backend.sha256_many(inputs)
+
+    return min(timeit.repeat(workload, number=number, repeat=repeat)) / number
+
+
+def select_fastest_backend():
+    """Benchmark all available backends and activate the fastest one
+
+    Returns:
+        (name, timings): The name of the selected backend, and for each
+            available backend the time of :func:`time_backend`
+    """
+    timings = {name: time_backend(load_backend(name)) for name in available_backends()}
+    fastest = min(timings, key=timings.get)
+    set_backend(fastest)
+    return fastest, timings
@@ -0,0 +1,47 @@
+"""
+Crypto backend based on OpenSSL, through the cryptography package
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from dp3t.crypto import CryptoBackend
+
+# The initial counter block: a 128-bit counter starting at zero
+_ZERO_COUNTER = bytes(16)
+
+
+class OpenSSLBackend(CryptoBackend):
+    """AES from OpenSSL through the cryptography package
+
+    Hashing uses the Python standard library, which also relies on OpenSSL.
+    """
+
+    name = "openssl"
+
+    def prg(self, key, length):
+        encryptor = Cipher(algorithms.AES(key), modes.CTR(_ZERO_COUNTER)).encryptor()
+        return encryptor.update(bytes(length)) + encryptor.finalize()
+
+    def prg_many(self, keys, length):
+        zeros = bytes(length)
+        mode = modes.CTR(_ZERO_COUNTER)
+        return [
+            Cipher(algorithms.AES(key), mode).encryptor().update(zeros) for key in keys
+        ]
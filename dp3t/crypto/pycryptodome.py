@@ -0,0 +1,46 @@
+"""
+Crypto backend based on pycryptodomex
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from Cryptodome.Cipher import AES
+
+from dp3t.crypto import CryptoBackend
+
+
+class PycryptodomeBackend(CryptoBackend):
+    """AES from pycryptodomex, hashing from the Python standard library"""
+
+    name = "pycryptodome"
+
+    def prg(self, key, length):
+        # Start with a fresh counter and initialize AES in CTR mode. An empty
+        # nonce makes the full 128-bit block the counter.
+        prg = AES.new(key, AES.MODE_CTR, nonce=b"", initial_value=0)
+
+        # To get the raw output, we ask the library to "encrypt" an all-zero
+        # message of sufficient length.
+        return prg.encrypt(bytes(length))
+
+    def prg_many(self, keys, length):
+        zeros = bytes(length)
+        return [
+            AES.new(key, AES.MODE_CTR, nonce=b"", initial_value=0).encrypt(zeros)
+            for key in keys
+        ]
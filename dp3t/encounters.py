@@ -0,0 +1,334 @@
+"""
+Encounter records that aggregate the sightings of an EphID.
+
+A phone sees the same EphID many times while it is near another phone, and
+real deployments record the signal attenuation of every sighting to estimate
+the distance. Storing an observation per sighting makes memory and matching
+cost grow with the number of sightings. An :obj:`EncounterStore` instead
+aggregates the sightings of every encounter, an observed EphID in the
+low-cost design, or a hashed observation (of an EphID and its epoch) in the
+unlinkable design, into columns of :mod:`array` arrays:
+
+ * the number of sightings
+ * the times of the first and last sighting, in seconds since UNIX Epoch
+ * the minimum, sum and number of the attenuations of the sightings, in dB
+
+Stores behave like read-only sequences of the distinct encounter keys, so
+matching visits every encounter once. Freezing a store sorts the encounters
+and keeps the keys in a single byte string, without the index that makes
+adding sightings fast. Sorting also hides the order of the encounters.
+
+Contact tracers of both designs record encounters when created with
+`encounters=True`. `add_observation` then takes an attenuation, and
+`matches_with_batch` takes a `weight` function that turns the
+:obj:`Encounter` of every match into an exposure, e.g., :func:`sighting_count`
+or :func:`proximity_weight`.
+
+*Privacy:* Encounter records keep the time of the first and last sighting,
+which bare observations do not.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from array import array
+import bisect
+from collections import namedtuple
+import struct
+
+from dp3t.serialization import read_exactly, read_uint, write_uint
+
+#: The aggregated sightings of an encounter
+Encounter = namedtuple(
+    "Encounter",
+    ["key", "count", "first_seen", "last_seen", "min_attenuation", "mean_attenuation"],
+)
+Encounter.__doc__ = """The aggregated sightings of an encounter
+
+Attributes:
+    key (bytes): The observed EphID or hashed observation
+    count (int): Number of sightings
+    first_seen (int): Time of the first sighting, in seconds since UNIX Epoch
+    last_seen (int): Time of the last sighting, in seconds since UNIX Epoch
+    min_attenuation (int): Lowest attenuation of the sightings in dB, or None
+        if no sighting has an attenuation
+    mean_attenuation (float): Mean attenuation of the sightings that have one
+        in dB, or None
+"""
+
+#: Highest attenuation that a store records, in dB
+MAX_ATTENUATION = 254
+
+#: Mean attenuation up to which :func:`proximity_weight` counts sightings fully
+NEAR_ATTENUATION = 55
+
+#: Mean attenuation up to which :func:`proximity_weight` counts sightings half
+FAR_ATTENUATION = 63
+
+# Minimum attenuation of encounters without attenuations
+_NO_ATTENUATION = 255
+
+# Columns in memory and in files: the typecode of the array, and the
+# big-endian struct format
+_COLUMNS = [
+    ("counts", "L", "I"),
+    ("first_seen", "q", "q"),
+    ("last_seen", "q", "q"),
+    ("min_attenuations", "B", "B"),
+    ("attenuation_sums", "Q", "Q"),
+    ("attenuation_counts", "L", "I"),
+]
+
+
+### WEIGHTS ###
+
+
+def sighting_count(encounter):
+    """Weigh an encounter by its number of sightings"""
+    return encounter.count
+
+
+def proximity_weight(encounter, near=NEAR_ATTENUATION, far=FAR_ATTENUATION):
+    """Weigh an encounter by its number of sightings and its mean attenuation
+
+    Sightings count fully if the mean attenuation is at most `near`, half if
+    it is at most `far`, and not at all beyond. Encounters without
+    attenuations count fully. Use :func:`functools.partial` to change the
+    thresholds.
+    """
+    attenuation = encounter.mean_attenuation
+    if attenuation is None or attenuation <= near:
+        return encounter.count
+    if attenuation <= far:
+        return encounter.count / 2
+    return 0
+
+
+### STORE ###
+
+
+class EncounterStore:
+    """Columnar records of the encounters of a day (or of a batch)
+
+    See the module documentation.
+    """
+
+    def __init__(self, key_length):
+        """Create an empty store
+
+        Args:
+            key_length (int): Length of the encounter keys in bytes
+        """
+        self.key_length = key_length
+
+        # The keys of all encounters, concatenated in the order of the columns
+        self._keys = bytearray()
+        # The row of every key, until the store is frozen
+        self._index = {}
+
+        for (name, typecode, _) in _COLUMNS:
+            setattr(self, "_" + name, array(typecode))
+
+    @property
+    def frozen(self):
+        """Whether the store is sorted and read-only"""
+        return self._index is None
+
+    @property
+    def nr_sightings(self):
+        """Total number of sightings of all encounters"""
+        return sum(self._counts)
+
+    def add(self, key, time, attenuation=None):
+        """Add a sighting
+
+        Args:
+            key (bytes): The observed EphID or hashed observation
+            time (int): Time of the sighting, in seconds since UNIX Epoch
+            attenuation (int, optional): Attenuation of the signal in dB, from
+                0 to :data:`MAX_ATTENUATION`. Default: unknown
+
+        Raises:
+            ValueError: If the store is frozen, if the key does not have the
+                key length, or if the attenuation is out of range
+        """
+        if attenuation is None:
+            self._add_row(key, 1, time, time, _NO_ATTENUATION, 0, 0)
+            return
+
+        if not 0 <= attenuation <= MAX_ATTENUATION:
+            raise ValueError(
+                "Attenuation must be between 0 and {} dB".format(MAX_ATTENUATION)
+            )
+        self._add_row(key, 1, time, time, attenuation, attenuation, 1)
+
+    def _add_row(
+        self,
+        key,
+        count,
+        first_seen,
+        last_seen,
+        min_attenuation,
+        attenuation_sum,
+        attenuation_count,
+    ):
+        """Aggregate a row into the store"""
+        if self._index is None:
+            raise ValueError("Cannot add sightings to a frozen store")
+
+        row = self._index.get(key)
+        if row is None:
+            if len(key) != self.key_length:
+                raise ValueError(
+                    "All keys must be {} bytes long".format(self.key_length)
+                )
+            self._index[key] = len(self._counts)
+            self._keys += key
+            self._counts.append(count)
+            self._first_seen.append(first_seen)
+            self._last_seen.append(last_seen)
+            self._min_attenuations.append(min_attenuation)
+            self._attenuation_sums.append(attenuation_sum)
+            self._attenuation_counts.append(attenuation_count)
+            return
+
+        self._counts[row] += count
+        self._first_seen[row] = min(self._first_seen[row], first_seen)
+        self._last_seen[row] = max(self._last_seen[row], last_seen)
+        self._min_attenuations[row] = min(self._min_attenuations[row], min_attenuation)
+        self._attenuation_sums[row] += attenuation_sum
+        self._attenuation_counts[row] += attenuation_count
+
+    def freeze(self):
+        """Sort the encounters by key and drop the index
+
+        Frozen stores take less memory, but no longer accept sightings.
+        """
+        if self._index is None:
+            return
+
+        order = sorted(range(len(self)), key=self.__getitem__)
+        self._keys = b"".join(self[row] for row in order)
+        for (name, typecode, _) in _COLUMNS:
+            column = getattr(self, "_" + name)
+            setattr(self, "_" + name, array(typecode, (column[row] for row in order)))
+        self._index = None
+
+    @classmethod
+    def merged(cls, stores, key_length):
+        """Return a frozen store with the encounters of several stores
+
+        The sightings of keys that are in several stores are aggregated.
+        """
+        result = cls(key_length)
+        for store in stores:
+            for row in range(len(store)):
+                result._add_row(store[row], *store._row(row))
+        result.freeze()
+        return result
+
+    def _row(self, row):
+        return [getattr(self, "_" + name)[row] for (name, _, _) in _COLUMNS]
+
+    def _find(self, key):
+        """Return the row of key, or None"""
+        if self._index is not None:
+            return self._index.get(key)
+
+        row = bisect.bisect_left(self, key)
+        if row < len(self) and self[row] == key:
+            return row
+        return None
+
+    def encounter(self, key):
+        """Return the :obj:`Encounter` of key
+
+        Raises:
+            KeyError: If the store holds no encounter with key
+        """
+        row = self._find(key)
+        if row is None:
+            raise KeyError(key)
+
+        (
+            count,
+            first_seen,
+            last_seen,
+            min_attenuation,
+            total,
+            nr_attenuations,
+        ) = self._row(row)
+        if not nr_attenuations:
+            return Encounter(key, count, first_seen, last_seen, None, None)
+        return Encounter(
+            key, count, first_seen, last_seen, min_attenuation, total / nr_attenuations
+        )
+
+    def encounters(self):
+        """Yield the :obj:`Encounter` of every key, in the order of the store"""
+        for key in self:
+            yield self.encounter(key)
+
+    def write(self, f):
+        """Write the store to the binary file f"""
+        nr_rows = len(self)
+        write_uint(f, self.frozen, 1)
+        write_uint(f, nr_rows)
+        f.write(self._keys)
+        for (name, _, fmt) in _COLUMNS:
+            f.write(
+                struct.pack(">{}{}".format(nr_rows, fmt), *getattr(self, "_" + name))
+            )
+
+    @classmethod
+    def read(cls, f, key_length):
+        """Read a store written by :func:`write` from the binary file f
+
+        Stores that were not frozen accept further sightings.
+        """
+        store = cls(key_length)
+        frozen = read_uint(f, 1)
+        nr_rows = read_uint(f)
+        store._keys = read_exactly(f, nr_rows * key_length)
+        for (name, typecode, fmt) in _COLUMNS:
+            column = struct.Struct(">{}{}".format(nr_rows, fmt))
+            values = column.unpack(read_exactly(f, column.size))
+            setattr(store, "_" + name, array(typecode, values))
+
+        if frozen:
+            store._index = None
+        else:
+            store._keys = bytearray(store._keys)
+            store._index = {key: row for (row, key) in enumerate(store)}
+        return store
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError("Encounter index out of range")
+        offset = row * self.key_length
+        return bytes(self._keys[offset : offset + self.key_length])
+
+    def __iter__(self):
+        key_length = self.key_length
+        for offset in range(0, len(self._keys), key_length):
+            yield bytes(self._keys[offset : offset + key_length])
+
+    def __contains__(self, key):
+        return self._find(key) is not None
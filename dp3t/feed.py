@@ -0,0 +1,415 @@
+"""
+Incremental download of published batches.
+
+A phone that was offline for a while needs the batches released since the
+last one it processed. A :obj:`BatchFeed` holds the serialized batches that
+the server published during the retention period, ordered by release time.
+Clients present a cursor, the release time of the last batch they received,
+and get the batches released after it as a single stream, see
+:func:`write_feed`. Batches can be of either design, or deltas of
+:mod:`dp3t.publication`: anything with a release time that can be written to
+a binary file.
+
+Every response carries an ETag that identifies the batches in it. A request
+that presents the ETag of the response for its cursor gets an empty answer
+without a body. Clients that are up to date present the ETag of an empty
+response, so polls transfer nothing until a new batch is released.
+
+:func:`serve` makes a feed available over HTTP on localhost, as a stand-in
+for the backend in tests and simulations. A :obj:`FeedClient` polls either a
+feed in the same process, through a :obj:`LocalTransport`, or a served feed,
+through an :obj:`HTTPTransport`. It advances its cursor as the batches of
+a response are consumed, so a client that stops halfway resumes where it
+stopped. Pass the batches to a :obj:`dp3t.ledger.BatchLedger` to process
+each of them exactly once.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import bisect
+from collections import namedtuple
+import hashlib
+import http.server
+import io
+import socketserver
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from dp3t.config import DEFAULT_PARAMETERS, SECONDS_PER_DAY
+from dp3t.serialization import (
+    BATCH_FEED,
+    read_bytes,
+    read_exactly,
+    read_magic,
+    write_bytes,
+    write_magic,
+    write_uint,
+)
+
+#: A published batch
+FeedEntry = namedtuple("FeedEntry", ["release_time", "digest", "data"])
+FeedEntry.__doc__ = """A published batch
+
+Attributes:
+    release_time (int): Release time in seconds since UNIX Epoch
+    digest (bytes): SHA-256 hash of data
+    data (bytes): The serialized batch
+"""
+
+#: Path under which :func:`serve` publishes the feed
+FEED_PATH = "/feed"
+
+
+### FEED ###
+
+
+def feed_etag(entries):
+    """Return the ETag of a response holding the given entries"""
+    h = hashlib.sha256()
+    for entry in entries:
+        h.update(entry.release_time.to_bytes(8, "big"))
+        h.update(entry.digest)
+    return '"{}"'.format(h.hexdigest()[:32])
+
+
+class BatchFeed:
+    """The serialized batches of the retention period, by release time"""
+
+    def __init__(self, parameters=DEFAULT_PARAMETERS):
+        """Create an empty feed
+
+        Args:
+            parameters (:obj:`ProtocolParameters`, optional): The retention
+                period. Default: :data:`DEFAULT_PARAMETERS`
+        """
+        self.parameters = parameters
+
+        # Entries by increasing release time, and their release times
+        self._entries = []
+        self._release_times = []
+        self._lock = threading.Lock()
+
+    def publish(self, batch, release_time=None):
+        """Add a batch to the feed
+
+        Args:
+            batch: A batch of either design, or any object with a
+                `release_time` and a `write(f)` method, or already serialized
+                bytes
+            release_time (int, optional): Release time in seconds since UNIX
+                Epoch. Must be later than that of the previous batch.
+                Default: the release time of the batch
+
+        Returns:
+            :obj:`FeedEntry`: The published entry
+
+        Raises:
+            ValueError: If the batch has no release time, or if it is not
+                released after the previous batch
+        """
+        if release_time is None:
+            release_time = getattr(batch, "release_time", None)
+        if release_time is None:
+            raise ValueError("Batches in a feed need a release time")
+
+        if isinstance(batch, bytes):
+            data = batch
+        else:
+            f = io.BytesIO()
+            batch.write(f)
+            data = f.getvalue()
+
+        entry = FeedEntry(release_time, hashlib.sha256(data).digest(), data)
+        with self._lock:
+            if self._release_times and release_time <= self._release_times[-1]:
+                raise ValueError("Batches must be published in order of release")
+            self._entries.append(entry)
+            self._release_times.append(release_time)
+        return entry
+
+    def expire(self, now):
+        """Drop the batches released before the retention period
+
+        Args:
+            now (int): The current time in seconds since UNIX Epoch
+
+        Returns:
+            int: The number of dropped batches
+        """
+        first_time = now - self.parameters.retention_period * SECONDS_PER_DAY
+        with self._lock:
+            nr_expired = bisect.bisect_left(self._release_times, first_time)
+            del self._entries[:nr_expired]
+            del self._release_times[:nr_expired]
+        return nr_expired
+
+    def since(self, cursor=None):
+        """Return the entries released after the cursor
+
+        Args:
+            cursor (int, optional): A release time. Default: return all entries
+
+        Returns:
+            [:obj:`FeedEntry`]: The entries, by increasing release time
+        """
+        with self._lock:
+            if cursor is None:
+                return list(self._entries)
+            return self._entries[bisect.bisect_right(self._release_times, cursor) :]
+
+    def respond(self, cursor=None, etag=None):
+        """Answer a request for the batches released after the cursor
+
+        Args:
+            cursor (int, optional): See :func:`since`
+            etag (str, optional): The ETag of a previous response for the same
+                cursor
+
+        Returns:
+            (str, [:obj:`FeedEntry`]): The ETag of the response, and its
+                entries, or None if they match etag
+        """
+        entries = self.since(cursor)
+        response_etag = feed_etag(entries)
+        if etag == response_etag:
+            return response_etag, None
+        return response_etag, entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def write_feed(f, entries):
+    """Write entries to the binary file f, as they are produced
+
+    Returns:
+        int: The number of entries written
+    """
+    write_magic(f, BATCH_FEED)
+
+    nr_entries = 0
+    for entry in entries:
+        write_uint(f, entry.release_time, 8)
+        f.write(entry.digest)
+        write_bytes(f, entry.data)
+        nr_entries += 1
+    return nr_entries
+
+
+def read_feed(f):
+    """Read the entries written by :func:`write_feed` from the binary file f
+
+    Returns:
+        An iterator that reads the :obj:`FeedEntry` from f as it is consumed
+
+    Raises:
+        ValueError: If f does not hold a feed, or if an entry does not match
+            its digest
+    """
+    read_magic(f, BATCH_FEED)
+
+    def entries():
+        while True:
+            header = f.read(8)
+            if not header:
+                return
+            if len(header) != 8:
+                raise ValueError("Unexpected end of file")
+
+            release_time = int.from_bytes(header, "big")
+            digest = read_exactly(f, 32)
+            data = read_bytes(f)
+            if hashlib.sha256(data).digest() != digest:
+                raise ValueError("Batch does not match its digest")
+            yield FeedEntry(release_time, digest, data)
+
+    return entries()
+
+
+### TRANSPORTS ###
+
+
+class LocalTransport:
+    """Requests the batches of a feed in the same process"""
+
+    def __init__(self, feed):
+        self.feed = feed
+
+    def request(self, cursor, etag):
+        """Request the batches released after the cursor
+
+        Returns:
+            (str, iterator): The ETag of the response, and an iterator over
+                its entries, or None if they match etag
+        """
+        (response_etag, entries) = self.feed.respond(cursor, etag)
+        return response_etag, None if entries is None else iter(entries)
+
+
+class HTTPTransport:
+    """Requests the batches of a feed served by :func:`serve`"""
+
+    def __init__(self, url, timeout=10):
+        """Create a transport
+
+        Args:
+            url (str): The URL of the feed, e.g., ``http://127.0.0.1:8000/feed``
+            timeout (float, optional): Timeout of requests in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def request(self, cursor, etag):
+        """Request the batches released after the cursor, see :obj:`LocalTransport`
+
+        Entries are read from the connection as they are consumed. Consume
+        all of them to release the connection.
+        """
+        url = self.url
+        if cursor is not None:
+            url += "?" + urllib.parse.urlencode({"since": cursor})
+        request = urllib.request.Request(url)
+        if etag is not None:
+            request.add_header("If-None-Match", etag)
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return e.headers["ETag"], None
+            raise
+
+        def entries():
+            with response:
+                yield from read_feed(response)
+
+        return response.headers["ETag"], entries()
+
+
+### SERVER ###
+
+
+class _FeedHandler(http.server.BaseHTTPRequestHandler):
+    # Buffer responses, which are written in small pieces
+    wbufsize = 64 * 1024
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != FEED_PATH:
+            self.send_error(404)
+            return
+
+        try:
+            query = urllib.parse.parse_qs(url.query)
+            cursor = int(query["since"][0]) if "since" in query else None
+        except ValueError:
+            self.send_error(400, "Invalid cursor")
+            return
+
+        (etag, entries) = self.server.feed.respond(
+            cursor, self.headers.get("If-None-Match")
+        )
+        if entries is None:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        # Stream the entries, the end of the response is the end of the feed
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        write_feed(self.wfile, entries)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FeedServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def serve(feed, port, address="127.0.0.1"):
+    """Serve a feed over HTTP from a background thread
+
+    The feed is available under :data:`FEED_PATH`, with the cursor as the
+    `since` query parameter.
+
+    Args:
+        feed (:obj:`BatchFeed`): The feed
+        port (int): The port to listen on, 0 picks a free port
+        address (str, optional): The address to bind to. Default: localhost only
+
+    Returns:
+        The :obj:`http.server.HTTPServer`. Call its `shutdown` method to stop.
+    """
+    server = _FeedServer((address, port), _FeedHandler)
+    server.feed = feed
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+### CLIENT ###
+
+
+class FeedClient:
+    """Polls a feed for the batches released since the last poll"""
+
+    def __init__(self, transport, cursor=None):
+        """Create a client
+
+        Args:
+            transport: A :obj:`LocalTransport` or :obj:`HTTPTransport`
+            cursor (int, optional): Release time of the last batch received,
+                e.g., :func:`ContactTracer` state restored from disk.
+                Default: receive all batches of the feed
+        """
+        self.transport = transport
+        self.cursor = cursor
+        self.etag = None
+
+        #: Number of polls answered without any entries, as nothing changed
+        self.not_modified = 0
+
+    def poll(self):
+        """Yield the batches released since the cursor
+
+        The cursor advances as entries are consumed. Once all entries were
+        consumed, the next poll presents the ETag of an empty response, so
+        the feed only answers with entries if there are new ones.
+
+        Yields:
+            :obj:`FeedEntry`: The new entries, by increasing release time
+        """
+        (etag, entries) = self.transport.request(self.cursor, self.etag)
+        if entries is None:
+            self.not_modified += 1
+            return
+
+        self.etag = None
+        for entry in entries:
+            self.cursor = entry.release_time
+            yield entry
+
+        # Nothing was released after the last entry when the feed responded
+        self.etag = feed_etag([])
@@ -0,0 +1,393 @@
+"""
+Compact, read-only cuckoo filters.
+
+The cuckoo filter library stores every bucket and every fingerprint as a
+separate Python object. That is convenient while building a filter, but
+wasteful for a published filter that is only queried. A
+:obj:`FrozenCuckooFilter` stores all buckets in a single contiguous byte
+table, can be written to and read from files, and answers membership queries
+with the same hash functions as :obj:`cuckoo.filter.CuckooFilter`. A
+:obj:`FilterUnion` queries several filters as one.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import itertools
+import math
+
+import mmh3
+
+from dp3t.serialization import read_exactly, read_uint, write_uint
+
+#: Length of the digest of an item, see :func:`digest`
+DIGEST_LENGTH = 16
+
+#: Length of the probe data of an item, see :func:`probe`
+PROBE_LENGTH = 2 * DIGEST_LENGTH
+
+#: Number of probes that :func:`FilterUnion.matching_probes` holds at a time
+UNION_CHUNK_SIZE = 4096
+
+
+def fingerprint_size(error_rate, bucket_size=4):
+    """Return the length in bits of fingerprints of a filter with error_rate
+
+    This is the length that :obj:`cuckoo.filter.CuckooFilter` uses.
+    """
+    return int(math.ceil(math.log(1.0 / error_rate, 2) + math.log(2 * bucket_size, 2)))
+
+
+def _fingerprint_bytes(item_digest, fingerprint_size):
+    """Return the fingerprint of an item digest, padded to whole bytes"""
+    fingerprint_length = (fingerprint_size + 7) // 8
+    unused_bits = 8 * fingerprint_length - fingerprint_size
+
+    fingerprint = bytearray(item_digest[:fingerprint_length])
+    fingerprint[-1] &= (0xFF << unused_bits) & 0xFF
+    return bytes(fingerprint)
+
+
+def digest(item):
+    """Return the digest of item that determines all filter lookups
+
+    Cuckoo filters derive both the fingerprint and the two candidate buckets
+    of an item from its 128-bit MurmurHash3 digest: the fingerprint is a
+    prefix of the digest, the first bucket is the digest modulo the number of
+    buckets, and the second bucket depends only on the first bucket and the
+    fingerprint. Looking up the digest with :func:`contains_digest` therefore
+    gives the same result as looking up the item, for every filter capacity.
+    """
+    return mmh3.hash_bytes(item)
+
+
+def probe(item_digest, fingerprint_size):
+    """Return the probe data of an item, given its digest
+
+    The probe data is the digest followed by the digest of the item's
+    fingerprint. Together, they determine the fingerprint and both candidate
+    buckets of the item in any filter with fingerprints of fingerprint_size
+    bits, so a lookup only takes two modulo operations and a table scan. See
+    :func:`contains_probe`. The bucket indices depend on the capacity of the
+    filter, so the probe keeps both full digests rather than the indices.
+    """
+    return item_digest + digest(_fingerprint_bytes(item_digest, fingerprint_size))
+
+
+def contains_probe(cuckoo_filter, item_probe, fingerprint_size):
+    """Return whether the item with the given probe data (probably) is in the filter
+
+    Args:
+        cuckoo_filter: A :obj:`FrozenCuckooFilter` or a
+            :obj:`cuckoo.filter.CuckooFilter`
+        item_probe (bytes): The probe data of the item, see :func:`probe`
+        fingerprint_size (int): The fingerprint size used to compute item_probe.
+            If the filter uses a different size, the probe data is recomputed.
+    """
+    if isinstance(cuckoo_filter, FilterUnion):
+        return any(
+            contains_probe(member, item_probe, fingerprint_size)
+            for member in cuckoo_filter.filters
+        )
+
+    item_digest = item_probe[:DIGEST_LENGTH]
+    if cuckoo_filter.fingerprint_size != fingerprint_size:
+        return contains_digest(cuckoo_filter, item_digest)
+
+    capacity = cuckoo_filter.capacity
+    index = int.from_bytes(item_digest, "big") % capacity
+    fingerprint_index = int.from_bytes(item_probe[DIGEST_LENGTH:], "big") % capacity
+    alternative_index = (index ^ fingerprint_index) % capacity
+
+    if isinstance(cuckoo_filter, FrozenCuckooFilter):
+        fingerprint = _fingerprint_bytes(item_digest, fingerprint_size)
+        if cuckoo_filter.bucket_contains(index, fingerprint):
+            return True
+        return cuckoo_filter.bucket_contains(alternative_index, fingerprint)
+
+    return _buckets_contain(
+        cuckoo_filter, (index, alternative_index), item_digest, fingerprint_size
+    )
+
+
+def matching_probes(cuckoo_filter, probes, fingerprint_size):
+    """Yield the probes of items that are (probably) in the filter
+
+    See :func:`contains_probe`. For a :obj:`FrozenCuckooFilter`, this is
+    considerably faster than testing the probes one by one.
+    """
+    if isinstance(cuckoo_filter, (FrozenCuckooFilter, FilterUnion)):
+        yield from cuckoo_filter.matching_probes(probes, fingerprint_size)
+        return
+
+    for item_probe in probes:
+        if contains_probe(cuckoo_filter, item_probe, fingerprint_size):
+            yield item_probe
+
+
+def _buckets_contain(cuckoo_filter, indices, item_digest, fingerprint_size):
+    """Return whether a bucket of a library filter holds the item's fingerprint"""
+    from bitarray import bitarray
+
+    fingerprint = bitarray()
+    fingerprint.frombytes(item_digest)
+    fingerprint = fingerprint[:fingerprint_size]
+
+    for index in indices:
+        bucket = cuckoo_filter.buckets[index]
+        if bucket is not None and fingerprint in bucket:
+            return True
+    return False
+
+
+def contains_digest(cuckoo_filter, item_digest):
+    """Return whether the item with the given digest (probably) is in the filter
+
+    Args:
+        cuckoo_filter: A :obj:`FrozenCuckooFilter` or a
+            :obj:`cuckoo.filter.CuckooFilter`
+        item_digest (bytes): The digest of the item, see :func:`digest`
+    """
+    if isinstance(cuckoo_filter, (FrozenCuckooFilter, FilterUnion)):
+        return cuckoo_filter.contains_digest(item_digest)
+
+    item_probe = probe(item_digest, cuckoo_filter.fingerprint_size)
+    return contains_probe(cuckoo_filter, item_probe, cuckoo_filter.fingerprint_size)
+
+
+class FrozenCuckooFilter:
+    """A read-only cuckoo filter stored in a single byte table
+
+    Each of the `capacity` buckets holds `bucket_size` slots, and each slot
+    holds a fingerprint padded to whole bytes. Empty slots are all zero. As a
+    result, an item whose fingerprint is zero (probability
+    2^-fingerprint_size) is always reported as a member.
+    """
+
+    def __init__(self, capacity, bucket_size, fingerprint_size, table, size=0):
+        """Create a filter from its byte table
+
+        Args:
+            capacity (int): Number of buckets
+            bucket_size (int): Number of fingerprints per bucket
+            fingerprint_size (int): Length of fingerprints in bits
+            table (bytes-like): The buckets, see :func:`from_filter`
+            size (int, optional): Number of items in the filter
+
+        Raises:
+            ValueError: If the table does not have the expected length
+        """
+        self.capacity = capacity
+        self.bucket_size = bucket_size
+        self.fingerprint_size = fingerprint_size
+        self.size = size
+
+        self.fingerprint_length = (fingerprint_size + 7) // 8
+        self.bucket_length = bucket_size * self.fingerprint_length
+
+        if len(table) != capacity * self.bucket_length:
+            raise ValueError("Filter table does not match the filter parameters")
+        self.table = table
+
+    @classmethod
+    def from_filter(cls, cuckoo_filter):
+        """Freeze a :obj:`cuckoo.filter.CuckooFilter`"""
+        fingerprint_length = (cuckoo_filter.fingerprint_size + 7) // 8
+        bucket_length = cuckoo_filter.bucket_size * fingerprint_length
+
+        table = bytearray(cuckoo_filter.capacity * bucket_length)
+        for (index, bucket) in enumerate(cuckoo_filter.buckets):
+            if bucket is None:
+                continue
+            offset = index * bucket_length
+            for fingerprint in bucket.bucket:
+                table[offset : offset + fingerprint_length] = fingerprint.tobytes()
+                offset += fingerprint_length
+
+        return cls(
+            cuckoo_filter.capacity,
+            cuckoo_filter.bucket_size,
+            cuckoo_filter.fingerprint_size,
+            bytes(table),
+            cuckoo_filter.size,
+        )
+
+    def fingerprint(self, item_digest):
+        """Return the fingerprint, padded to whole bytes, of an item digest"""
+        return _fingerprint_bytes(item_digest, self.fingerprint_size)
+
+    def indices(self, item_digest, fingerprint):
+        """Return the two candidate buckets of an item"""
+        index = int.from_bytes(item_digest, "big") % self.capacity
+        fingerprint_index = (
+            int.from_bytes(mmh3.hash_bytes(fingerprint), "big") % self.capacity
+        )
+        return index, (index ^ fingerprint_index) % self.capacity
+
+    def bucket_contains(self, index, fingerprint):
+        """Return whether bucket index holds fingerprint"""
+        start = index * self.bucket_length
+        end = start + self.bucket_length
+
+        # Fingerprints can also match across slot boundaries, only accept
+        # matches at the start of a slot
+        position = self.table.find(fingerprint, start, end)
+        while position != -1:
+            if (position - start) % self.fingerprint_length == 0:
+                return True
+            position = self.table.find(fingerprint, position + 1, end)
+        return False
+
+    def contains_digest(self, item_digest):
+        """Return whether the item with the given digest (probably) is in the filter"""
+        fingerprint = self.fingerprint(item_digest)
+        (index, alternative_index) = self.indices(item_digest, fingerprint)
+        return self.bucket_contains(index, fingerprint) or self.bucket_contains(
+            alternative_index, fingerprint
+        )
+
+    def matching_probes(self, probes, fingerprint_size):
+        """Yield the probes of items that are (probably) in the filter
+
+        This is :func:`contains_probe` for many probes, with the bucket
+        lookups inlined.
+        """
+        if fingerprint_size != self.fingerprint_size:
+            for item_probe in probes:
+                if self.contains_digest(item_probe[:DIGEST_LENGTH]):
+                    yield item_probe
+            return
+
+        find = self.table.find
+        from_bytes = int.from_bytes
+        capacity = self.capacity
+        bucket_length = self.bucket_length
+        fingerprint_length = self.fingerprint_length
+        last = fingerprint_length - 1
+        last_byte_mask = (0xFF << (8 * fingerprint_length - fingerprint_size)) & 0xFF
+
+        for item_probe in probes:
+            fingerprint = item_probe[:last] + bytes(
+                (item_probe[last] & last_byte_mask,)
+            )
+            index = from_bytes(item_probe[:DIGEST_LENGTH], "big") % capacity
+            fingerprint_index = from_bytes(item_probe[DIGEST_LENGTH:], "big") % capacity
+
+            for bucket in (index, (index ^ fingerprint_index) % capacity):
+                start = bucket * bucket_length
+                end = start + bucket_length
+                position = find(fingerprint, start, end)
+                while position != -1 and (position - start) % fingerprint_length:
+                    position = find(fingerprint, position + 1, end)
+                if position != -1:
+                    yield item_probe
+                    break
+
+    def contains(self, item):
+        """Return whether item (probably) is in the filter"""
+        return self.contains_digest(digest(item))
+
+    def __contains__(self, item):
+        return self.contains(item)
+
+    def load_factor(self):
+        return round(float(self.size) / (self.capacity * self.bucket_size), 4)
+
+    def write(self, f):
+        """Write the filter to the binary file f"""
+        write_uint(f, self.capacity, 8)
+        write_uint(f, self.bucket_size, 1)
+        write_uint(f, self.fingerprint_size, 1)
+        write_uint(f, self.size, 8)
+        f.write(self.table)
+
+    @classmethod
+    def read(cls, f):
+        """Read a filter written by :func:`write` from the binary file f
+
+        Raises:
+            ValueError: If the file is truncated
+        """
+        capacity = read_uint(f, 8)
+        bucket_size = read_uint(f, 1)
+        fingerprint_size = read_uint(f, 1)
+        size = read_uint(f, 8)
+        table_length = capacity * bucket_size * ((fingerprint_size + 7) // 8)
+        table = read_exactly(f, table_length)
+        return cls(capacity, bucket_size, fingerprint_size, table, size)
+
+
+class FilterUnion:
+    """The union of several cuckoo filters
+
+    An item is (probably) in the union if it is (probably) in one of the
+    filters. The false positive rate of the union is at most the sum of the
+    false positive rates of its filters. The functions of this module accept
+    unions wherever they accept filters.
+    """
+
+    def __init__(self, filters):
+        """Create the union of filters
+
+        Args:
+            filters: :obj:`FrozenCuckooFilter` or
+                :obj:`cuckoo.filter.CuckooFilter` instances
+        """
+        self.filters = list(filters)
+
+    @property
+    def size(self):
+        """Number of items in the filters"""
+        return sum(member.size for member in self.filters)
+
+    def contains_digest(self, item_digest):
+        """Return whether the item with the given digest (probably) is in the union"""
+        return any(contains_digest(member, item_digest) for member in self.filters)
+
+    def matching_probes(self, probes, fingerprint_size):
+        """Yield the probes of items that are (probably) in the union
+
+        Probes are yielded in order, and at most once even if several filters
+        match them. The probes are consumed in chunks of
+        :data:`UNION_CHUNK_SIZE`, so only a chunk is held in memory. Within a
+        chunk, every filter only tests the probes that no earlier filter
+        matched.
+        """
+        probes = iter(probes)
+        while True:
+            chunk = list(itertools.islice(probes, UNION_CHUNK_SIZE))
+            if not chunk:
+                return
+
+            remaining = chunk
+            matches = set()
+            for member in self.filters:
+                matches.update(matching_probes(member, remaining, fingerprint_size))
+                remaining = [
+                    item_probe for item_probe in remaining if item_probe not in matches
+                ]
+                if not remaining:
+                    break
+
+            yield from (item_probe for item_probe in chunk if item_probe in matches)
+
+    def contains(self, item):
+        """Return whether item (probably) is in the union"""
+        return any(item in member for member in self.filters)
+
+    def __contains__(self, item):
+        return self.contains(item)
@@ -0,0 +1,228 @@
+"""
+Server-side ingestion of the reports of infected users.
+
+Reports that phones upload should not go straight into a batch. Apps retry
+uploads, so the same (start day, key) or (epoch, seed) pair can arrive more
+than once, and reports can cover days that phones no longer keep
+observations of. Expanding such entries into EphIDs or hashed observations
+only costs time and, for the unlinkable design, space in the batch.
+
+An ingestion stage collects the reports for a single batch. It drops
+malformed entries and entries outside the retention period before any
+cryptographic operation runs, rolls low-cost keys that start before the
+retention period forward to its first day, deduplicates the remaining
+entries with a hash set, and emits them sorted, so that the order of a batch does not reveal the
+order of the uploads. Feed the reports of an :obj:`UnlinkableIngestion` to a
+:obj:`dp3t.protocols.unlinkable.BatchBuilder`, and those of a
+:obj:`LowcostIngestion` to a :obj:`dp3t.protocols.lowcost.TracingDataBatch`.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import namedtuple
+import time
+
+from dp3t.config import DEFAULT_PARAMETERS, SECONDS_PER_DAY
+
+#: Length of low-cost day keys and unlinkable seeds
+SECRET_LENGTH = 32
+
+#: Number of epochs per report emitted by :func:`UnlinkableIngestion.reports`
+REPORT_CHUNK_SIZE = 10000
+
+#: Counts of the entries that an ingestion stage received
+IngestionStats = namedtuple(
+    "IngestionStats", ["received", "accepted", "duplicates", "expired", "invalid"]
+)
+IngestionStats.__doc__ = """Counts of the entries that an ingestion stage received
+
+An entry is a (start day, key) pair of the low-cost design, or an
+(epoch, seed) pair of the unlinkable design. Every received entry is counted
+exactly once in accepted, duplicates, expired or invalid.
+"""
+
+
+class _Ingestion:
+    """Deduplicates entries, encoded as byte strings that sort like the entries"""
+
+    def __init__(self, now=None, parameters=DEFAULT_PARAMETERS):
+        """Create an empty ingestion stage
+
+        Args:
+            now (int, optional): The release time of the batch, in seconds since
+                UNIX Epoch. Default: the current time
+            parameters (:obj:`ProtocolParameters`, optional): The retention
+                period. Default: :data:`DEFAULT_PARAMETERS`
+        """
+        if now is None:
+            now = int(time.time())
+        self.now = now
+        self.parameters = parameters
+
+        #: Start of the first day that phones still keep observations of
+        self.first_retained_time = (
+            now // SECONDS_PER_DAY - parameters.retention_period
+        ) * SECONDS_PER_DAY
+
+        self._entries = set()
+        self._received = 0
+        self._expired = 0
+        self._invalid = 0
+
+    @property
+    def stats(self):
+        """The :obj:`IngestionStats` of the entries received so far"""
+        accepted = len(self._entries)
+        return IngestionStats(
+            self._received,
+            accepted,
+            self._received - accepted - self._expired - self._invalid,
+            self._expired,
+            self._invalid,
+        )
+
+    def __len__(self):
+        """Number of accepted entries"""
+        return len(self._entries)
+
+
+def _roll_forward(key, nr_days):
+    """Return the day key nr_days after key"""
+    from dp3t.protocols.lowcost import next_day_key
+
+    for _ in range(nr_days):
+        key = next_day_key(key)
+    return key
+
+
+class LowcostIngestion(_Ingestion):
+    """Ingestion stage for (start_time, key) reports of the low-cost design"""
+
+    def add(self, start_time, key):
+        """Add a report, see :func:`add_reports`"""
+        self.add_reports([(start_time, key)])
+
+    def add_reports(self, reports):
+        """Add reports
+
+        Reports must start on a day boundary and not after now. A day key
+        derives the keys of all later days, so reports that start before the
+        first retained day are rolled forward to the key of that day, and
+        stored under its start time. Phones only keep the keys of a retention
+        period, so reports that start more than a retention period before the
+        first retained day are expired rather than rolled forward.
+
+        Args:
+            reports ([(int, byte array)]): Start times, in seconds since UNIX
+                Epoch, and day keys, see :func:`ContactTracer.get_tracing_information`
+        """
+        first = self.first_retained_time
+        last = self.now
+        oldest = first - self.parameters.retention_period * SECONDS_PER_DAY
+
+        entries = []
+        for (start_time, key) in reports:
+            self._received += 1
+            invalid = start_time % SECONDS_PER_DAY or len(key) != SECRET_LENGTH
+            if invalid or start_time > last:
+                self._invalid += 1
+            elif start_time < oldest:
+                self._expired += 1
+            else:
+                if start_time < first:
+                    key = _roll_forward(key, (first - start_time) // SECONDS_PER_DAY)
+                    start_time = first
+                entries.append(start_time.to_bytes(8, "big") + key)
+
+        self._entries.update(entries)
+
+    def reports(self):
+        """Return the accepted reports, sorted by start time and key
+
+        Returns:
+            [(int, bytes)]: The time_key_pairs of a :obj:`TracingDataBatch`
+        """
+        return [
+            (int.from_bytes(entry[:8], "big"), entry[8:])
+            for entry in sorted(self._entries)
+        ]
+
+
+class UnlinkableIngestion(_Ingestion):
+    """Ingestion stage for (epochs, seeds) reports of the unlinkable design"""
+
+    def __init__(self, now=None, parameters=DEFAULT_PARAMETERS):
+        super().__init__(now, parameters)
+        epoch_seconds = parameters.epoch_seconds
+        self.first_epoch = self.first_retained_time // epoch_seconds
+        self.last_epoch = self.now // epoch_seconds
+
+    def add(self, epochs, seeds):
+        """Add the report of a single user, see :func:`add_reports`"""
+        self.add_reports([(epochs, seeds)])
+
+    def add_reports(self, reports):
+        """Add reports
+
+        Epochs must lie between the first epoch of the first retained day and
+        the epoch of now. Reports with a different number of epochs and seeds
+        are invalid as a whole.
+
+        Args:
+            reports ([(reported_epochs, seeds)]): Epochs and seeds per user,
+                see :func:`ContactTracer.get_tracing_information`
+        """
+        first = self.first_epoch
+        last = self.last_epoch
+
+        entries = []
+        for (epochs, seeds) in reports:
+            epochs = list(epochs)
+            self._received += len(epochs)
+            if len(epochs) != len(seeds):
+                self._invalid += len(epochs)
+                continue
+
+            for (epoch, seed) in zip(epochs, seeds):
+                if len(seed) != SECRET_LENGTH or epoch > last:
+                    self._invalid += 1
+                elif epoch < first:
+                    self._expired += 1
+                else:
+                    entries.append(epoch.to_bytes(4, "big") + seed)
+
+        self._entries.update(entries)
+
+    def reports(self, chunk_size=REPORT_CHUNK_SIZE):
+        """Yield the accepted entries as reports, sorted by epoch and seed
+
+        Args:
+            chunk_size (int, optional): Number of epochs per report.
+                Default: :data:`REPORT_CHUNK_SIZE`
+
+        Yields:
+            (reported_epochs, seeds): Reports for a :obj:`BatchBuilder` or
+                :obj:`TracingDataBatch`
+        """
+        entries = sorted(self._entries)
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start : start + chunk_size]
+            yield (
+                [int.from_bytes(entry[:4], "big") for entry in chunk],
+                [entry[4:] for entry in chunk],
+            )
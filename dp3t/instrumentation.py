@@ -0,0 +1,266 @@
+"""
+Optional call counters and timers for the hot paths of the DP3T designs.
+
+Instrumentation is disabled by default and then costs nothing: the protocol
+modules run their original functions. :func:`enable` replaces the functions
+listed in :data:`PROBES` by wrappers that count calls and measure the time
+spent in them, and :func:`disable` restores the original functions.
+
+The functions are replaced for the whole process, including third-party
+cuckoo filters. Calls to :func:`enable` and :func:`disable` nest, also across
+threads: the original functions are only restored once every :func:`enable`
+has been matched by a :func:`disable`.
+
+Only calls that go through the module or class attribute are measured. A
+function that was imported by name elsewhere (``from ... import ...``) before
+enabling instrumentation is not replaced. Timings are inclusive: the time
+spent in nested instrumented calls also counts for the caller.
+
+Example::
+
+    from dp3t import instrumentation
+
+    with instrumentation.instrumented():
+        tracer.matches_with_batch(batch)
+    print(instrumentation.exposition())
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import contextlib
+import functools
+import http.server
+import importlib
+import threading
+import time
+
+
+#: Instrumented functions as (module, attribute within module, probe name)
+PROBES = [
+    ("dp3t.protocols.lowcost", "generate_ephids_for_day", "lowcost.generate_ephids"),
+    (
+        "dp3t.protocols.lowcost",
+        "generate_ephids_for_days",
+        "lowcost.generate_ephids_bulk",
+    ),
+    ("dp3t.protocols.lowcost", "next_day_key", "lowcost.next_day_key"),
+    ("dp3t.protocols.lowcost", "secure_shuffle", "lowcost.secure_shuffle"),
+    (
+        "dp3t.protocols.lowcost",
+        "ContactTracer.housekeeping_after_batch",
+        "lowcost.housekeeping_after_batch",
+    ),
+    ("dp3t.protocols.unlinkable", "ephid_from_seed", "unlinkable.ephid_from_seed"),
+    ("dp3t.protocols.unlinkable", "ephids_from_seeds", "unlinkable.ephids_bulk"),
+    (
+        "dp3t.protocols.unlinkable",
+        "hashed_observation_from_ephid",
+        "unlinkable.hashed_observation",
+    ),
+    (
+        "dp3t.protocols.unlinkable",
+        "hashed_observations_from_seeds",
+        "unlinkable.hashed_observations_bulk",
+    ),
+    ("cuckoo.filter", "CuckooFilter.insert", "filter.insert"),
+    ("cuckoo.filter", "CuckooFilter.contains", "filter.lookup"),
+    ("dp3t.filters", "FrozenCuckooFilter.contains", "frozen_filter.lookup"),
+    ("dp3t.filters", "contains_digest", "filter.lookup_digest"),
+    ("dp3t.filters", "contains_probe", "filter.lookup_probe"),
+    ("dp3t.filters", "matching_probes", "filter.lookup_probes_bulk"),
+]
+
+#: Prefix of all exported metric names
+METRIC_PREFIX = "dp3t"
+
+# The original functions of instrumented probes, by (owner, attribute)
+_originals = {}
+
+# Number of calls to enable that disable has not matched yet, and the lock
+# that guards it together with the replaced functions
+_depth = 0
+_patch_lock = threading.Lock()
+
+# Number of calls and total time in seconds, by probe name
+_stats = {}
+_lock = threading.Lock()
+
+
+def _resolve(module_name, path):
+    """Return the object holding the attribute path in module, and its name"""
+    owner = importlib.import_module(module_name)
+    names = path.split(".")
+    for name in names[:-1]:
+        owner = getattr(owner, name)
+    return owner, names[-1]
+
+
+def _wrap(probe_name, func):
+    stats = _stats.setdefault(probe_name, [0, 0.0])
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                stats[0] += 1
+                stats[1] += elapsed
+
+    return wrapper
+
+
+def _patch():
+    for (module_name, path, probe_name) in PROBES:
+        owner, attribute = _resolve(module_name, path)
+        if (owner, attribute) in _originals:
+            continue
+
+        original = getattr(owner, attribute)
+        _originals[(owner, attribute)] = original
+        setattr(owner, attribute, _wrap(probe_name, original))
+
+
+def _restore():
+    while _originals:
+        (owner, attribute), original = _originals.popitem()
+        setattr(owner, attribute, original)
+
+
+def enable():
+    """Replace the functions in :data:`PROBES` by instrumented versions"""
+    global _depth
+
+    with _patch_lock:
+        if _depth == 0:
+            _patch()
+        _depth += 1
+
+
+def disable():
+    """Match a call to :func:`enable`
+
+    The last matching call restores the original functions. Collected
+    statistics are kept.
+    """
+    global _depth
+
+    with _patch_lock:
+        if _depth == 0:
+            return
+        _depth -= 1
+        if _depth == 0:
+            _restore()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def reset():
+    """Set all counters and timers to zero"""
+    with _lock:
+        for stats in _stats.values():
+            stats[0] = 0
+            stats[1] = 0.0
+
+
+@contextlib.contextmanager
+def instrumented():
+    """Enable instrumentation for the duration of a with-block"""
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+def snapshot():
+    """Return the current statistics
+
+    Returns:
+        dict: For every probe name, a dictionary with the number of `calls` and
+            the total time in `seconds` spent in these calls
+    """
+    with _lock:
+        return {
+            name: {"calls": calls, "seconds": seconds}
+            for (name, (calls, seconds)) in _stats.items()
+        }
+
+
+def exposition(stats=None):
+    """Format statistics in the Prometheus text exposition format
+
+    Args:
+        stats (dict, optional): Statistics as returned by :func:`snapshot`.
+            Default: the current statistics
+
+    Returns:
+        str: One counter sample per probe for calls and for seconds
+    """
+    if stats is None:
+        stats = snapshot()
+
+    lines = []
+    for (metric, field, description) in [
+        ("calls_total", "calls", "Number of calls to instrumented functions"),
+        ("seconds_total", "seconds", "Time spent in instrumented functions"),
+    ]:
+        name = "{}_{}".format(METRIC_PREFIX, metric)
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} counter".format(name))
+        for probe_name in sorted(stats):
+            lines.append(
+                '{}{{function="{}"}} {}'.format(
+                    name, probe_name, stats[probe_name][field]
+                )
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+class _ExpositionHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, address="127.0.0.1"):
+    """Serve :func:`exposition` over HTTP from a background thread
+
+    Args:
+        port (int): The port to listen on, 0 picks a free port
+        address (str, optional): The address to bind to. Default: localhost only
+
+    Returns:
+        The :obj:`http.server.HTTPServer`. Call its `shutdown` method to stop.
+    """
+    server = http.server.HTTPServer((address, port), _ExpositionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
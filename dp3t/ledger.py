@@ -0,0 +1,415 @@
+"""
+Client-side bookkeeping of downloaded batches.
+
+Contact tracers do not remember which batches they processed. If an app
+retries a download, matching the same batch again counts its matches twice.
+Moreover, the low-cost design requires batches to be processed in order of
+release: once :func:`ContactTracer.housekeeping_after_batch` ran for a batch,
+observations before its release time no longer have batch granularity, so an
+earlier batch can no longer be matched correctly.
+
+A :obj:`BatchLedger` sits between the download code and the tracer. Batches
+are submitted as downloaded, i.e., serialized, and identified by their
+release time and the SHA-256 hash of their contents. The ledger
+
+ * skips batches that it already processed,
+ * for the low-cost design, queues batches that arrive before the batches
+   released before them, and processes them once the gap is filled,
+ * caches the serialized batches, so that they can be matched again later,
+   and
+ * forgets batches released before the retention period, as the tracer no
+   longer holds observations that could match them.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import namedtuple
+import hashlib
+import io
+import os
+import time
+
+from dp3t.config import SECONDS_PER_DAY
+from dp3t.serialization import (
+    BATCH_LEDGER,
+    read_bytes,
+    read_exactly,
+    read_magic,
+    read_optional_int,
+    read_uint,
+    write_bytes,
+    write_magic,
+    write_optional_int,
+    write_uint,
+)
+
+#: The batch was processed, possibly together with queued batches
+PROCESSED = "processed"
+
+#: The batch was submitted before, and is skipped
+DUPLICATE = "duplicate"
+
+#: A batch released before this one is missing, see :func:`BatchLedger.flush`
+QUEUED = "queued"
+
+#: A batch released after this one was already processed. Low-cost batches
+#: that arrive this late cannot be processed anymore.
+LATE = "late"
+
+#: Outcome of :func:`BatchLedger.submit`
+Submission = namedtuple("Submission", ["key", "status", "processed"])
+Submission.__doc__ = """Outcome of submitting a batch
+
+Attributes:
+    key ((int, bytes)): The release time and content hash of the batch
+    status (str): One of :data:`PROCESSED`, :data:`DUPLICATE`, :data:`QUEUED`
+        and :data:`LATE`
+    processed ([:obj:`ProcessedBatch`]): The batches processed as a result,
+        in order of processing
+"""
+
+#: A batch that the ledger passed to its handler
+ProcessedBatch = namedtuple("ProcessedBatch", ["key", "result"])
+
+
+def _batch_class(tracer):
+    from dp3t.protocols import lowcost, unlinkable
+
+    for protocol in (lowcost, unlinkable):
+        if isinstance(tracer, protocol.ContactTracer):
+            return protocol.TracingDataBatch
+    raise TypeError("Unsupported contact tracer {!r}".format(tracer))
+
+
+class _Entry:
+    """A batch known to the ledger"""
+
+    __slots__ = ("release_time", "time", "size", "pending", "cached")
+
+    def __init__(self, release_time, time, size, pending, cached):
+        self.release_time = release_time
+        # Release time, or submission time for batches without one
+        self.time = time
+        self.size = size
+        self.pending = pending
+        self.cached = cached
+
+
+class BatchLedger:
+    """Processes every downloaded batch exactly once, and in order
+
+    See the module documentation. Serialized batches are cached in memory,
+    or in a directory if one is given. Queued batches are always cached.
+    Processed batches are cached as long as the cache stays below
+    `max_cache_bytes`, the oldest batches are evicted first.
+    """
+
+    def __init__(self, tracer, handler=None, directory=None, max_cache_bytes=None):
+        """Create an empty ledger
+
+        Args:
+            tracer: A :obj:`ContactTracer` of either design
+            handler (callable, optional): Called with every batch to process,
+                its result is reported in :obj:`ProcessedBatch`. For the
+                low-cost design, the ledger runs the housekeeping of the
+                tracer afterwards. Default: :func:`ContactTracer.matches_with_batch`
+            directory (str, optional): Directory to cache serialized batches in.
+                Default: cache in memory
+            max_cache_bytes (int, optional): Bound on the size of the cached
+                processed batches. Default: no bound other than the retention
+                period
+
+        Raises:
+            TypeError: If tracer is not a contact tracer of a known design
+        """
+        self._batch_class = _batch_class(tracer)
+
+        self.tracer = tracer
+        self.handler = tracer.matches_with_batch if handler is None else handler
+        self.directory = directory
+        self.max_cache_bytes = max_cache_bytes
+
+        # Only the low-cost design depends on the order of batches
+        self.ordered = hasattr(tracer, "housekeeping_after_batch")
+        self.last_release = None
+
+        # Known batches by content hash, and cached batches if not on disk
+        self._entries = {}
+        self._cache = {}
+
+    @property
+    def parameters(self):
+        return self.tracer.parameters
+
+    def _key(self, digest):
+        return (self._entries[digest].release_time, digest)
+
+    def keys(self, pending=None):
+        """Return the keys of known batches, in order of release
+
+        Args:
+            pending (bool, optional): Only return queued batches if True, only
+                processed batches if False. Default: all batches
+        """
+        digests = [
+            digest
+            for (digest, entry) in self._entries.items()
+            if pending is None or entry.pending == pending
+        ]
+        digests.sort(key=lambda digest: self._entries[digest].time)
+        return [self._key(digest) for digest in digests]
+
+    def __contains__(self, data):
+        """Return whether the serialized batch data is known to the ledger"""
+        return hashlib.sha256(data).digest() in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, "batch-{}.bin".format(digest.hex()))
+
+    def _store(self, digest, data):
+        if self.directory is None:
+            self._cache[digest] = data
+        else:
+            with open(self._path(digest), "wb") as f:
+                f.write(data)
+        self._entries[digest].cached = True
+
+    def _load(self, digest):
+        if self.directory is None:
+            return self._cache[digest]
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def _evict(self, digest):
+        entry = self._entries[digest]
+        if not entry.cached:
+            return
+        if self.directory is None:
+            del self._cache[digest]
+        else:
+            os.remove(self._path(digest))
+        entry.cached = False
+
+    @property
+    def cache_bytes(self):
+        """Size of the cached serialized batches"""
+        return sum(entry.size for entry in self._entries.values() if entry.cached)
+
+    def _bound_cache(self):
+        if self.max_cache_bytes is None:
+            return
+
+        cache_bytes = self.cache_bytes
+        for (_, digest) in self.keys(pending=False):
+            if cache_bytes <= self.max_cache_bytes:
+                return
+            if self._entries[digest].cached:
+                cache_bytes -= self._entries[digest].size
+                self._evict(digest)
+
+    def _read_batch(self, data):
+        return self._batch_class.read(io.BytesIO(data), self.parameters)
+
+    def batch(self, key):
+        """Return the cached batch with the given key
+
+        Raises:
+            KeyError: If the batch is unknown or no longer cached
+        """
+        (_, digest) = key
+        entry = self._entries.get(digest)
+        if entry is None or not entry.cached:
+            raise KeyError("Batch {} is not cached".format(digest.hex()))
+        return self._read_batch(self._load(digest))
+
+    def _process(self, digest, batch):
+        result = self.handler(batch)
+        if self.ordered:
+            self.tracer.housekeeping_after_batch(batch)
+            self.last_release = batch.release_time
+
+        self._entries[digest].pending = False
+        return ProcessedBatch(self._key(digest), result)
+
+    def _process_pending(self, until=None):
+        """Process queued batches in order, up to the next missing batch
+
+        Args:
+            until (int, optional): Process all queued batches released before
+                or at until, even if batches are missing. Default: stop at the
+                first missing batch
+        """
+        processed = []
+        for (release_time, digest) in self.keys(pending=True):
+            expected = self.last_release + self.parameters.seconds_per_batch
+            if release_time > expected and (until is None or release_time > until):
+                break
+            batch = self._read_batch(self._load(digest))
+            processed.append(self._process(digest, batch))
+
+        self._bound_cache()
+        return processed
+
+    def submit(self, data, now=None):
+        """Process a downloaded batch, unless the ledger already knows it
+
+        Args:
+            data (bytes): The serialized batch, see :func:`TracingDataBatch.write`
+            now (int, optional): The current time in seconds since UNIX Epoch.
+                Default: the current time
+
+        Returns:
+            :obj:`Submission`: What the ledger did with the batch
+
+        Raises:
+            ValueError: If data does not hold a batch of the tracer's design
+
+        Errors of the handler propagate. The ledger then forgets the batch,
+        so that it can be submitted again, and keeps queued batches that
+        failed queued.
+        """
+        if now is None:
+            now = int(time.time())
+        self.expire(now)
+
+        digest = hashlib.sha256(data).digest()
+        if digest in self._entries:
+            return Submission(self._key(digest), DUPLICATE, [])
+
+        batch = self._read_batch(data)
+        release_time = batch.release_time
+        key = (release_time, digest)
+
+        if self.ordered and self.last_release is not None:
+            if release_time < self.last_release:
+                return Submission(key, LATE, [])
+
+            if release_time > self.last_release + self.parameters.seconds_per_batch:
+                self._entries[digest] = _Entry(
+                    release_time, release_time, len(data), True, False
+                )
+                self._store(digest, data)
+                return Submission(key, QUEUED, [])
+
+        entry_time = now if release_time is None else release_time
+        self._entries[digest] = _Entry(release_time, entry_time, len(data), True, False)
+        self._store(digest, data)
+
+        try:
+            processed = [self._process(digest, batch)]
+        except Exception:
+            self._evict(digest)
+            del self._entries[digest]
+            raise
+
+        if self.ordered:
+            processed.extend(self._process_pending())
+        self._bound_cache()
+
+        return Submission(key, PROCESSED, processed)
+
+    def flush(self, until=None):
+        """Give up on missing batches, and process the queued batches
+
+        Args:
+            until (int, optional): Only process queued batches released before
+                or at until. Default: all queued batches
+
+        Returns:
+            [:obj:`ProcessedBatch`]: The processed batches, in order
+        """
+        if not self.ordered or self.last_release is None:
+            return []
+        if until is None:
+            until = max((key[0] for key in self.keys(pending=True)), default=0)
+        return self._process_pending(until)
+
+    def expire(self, now):
+        """Forget the batches released before the retention period
+
+        Queued batches that expire are dropped without being processed.
+
+        Args:
+            now (int): The current time in seconds since UNIX Epoch
+
+        Returns:
+            [(int, bytes)]: The keys of the forgotten batches
+        """
+        cutoff = now - self.parameters.retention_period * SECONDS_PER_DAY
+        expired = [
+            digest for (digest, entry) in self._entries.items() if entry.time < cutoff
+        ]
+
+        keys = []
+        for digest in expired:
+            keys.append(self._key(digest))
+            self._evict(digest)
+            del self._entries[digest]
+        return keys
+
+    def write(self, f):
+        """Save the ledger to the binary file f
+
+        Batches cached in memory are saved with the ledger, batches cached in
+        a directory stay there. The tracer is saved separately.
+        """
+        write_magic(f, BATCH_LEDGER)
+        write_optional_int(f, self.last_release)
+        write_uint(f, len(self._entries))
+        for (digest, entry) in self._entries.items():
+            f.write(digest)
+            write_optional_int(f, entry.release_time)
+            write_optional_int(f, entry.time)
+            write_uint(f, entry.size)
+            write_uint(f, entry.pending, 1)
+            write_uint(f, entry.cached, 1)
+            if entry.cached and self.directory is None:
+                write_bytes(f, self._cache[digest])
+
+    @classmethod
+    def read(cls, f, tracer, handler=None, directory=None, max_cache_bytes=None):
+        """Load a ledger saved by :func:`write` from the binary file f
+
+        The other arguments are as for :obj:`BatchLedger`. The directory must
+        be the one that the ledger was saved with.
+
+        Raises:
+            ValueError: If f does not hold a batch ledger
+        """
+        read_magic(f, BATCH_LEDGER)
+        ledger = cls(tracer, handler, directory, max_cache_bytes)
+        ledger.last_release = read_optional_int(f)
+
+        for _ in range(read_uint(f)):
+            digest = read_exactly(f, hashlib.sha256().digest_size)
+            release_time = read_optional_int(f)
+            entry_time = read_optional_int(f)
+            size = read_uint(f)
+            pending = bool(read_uint(f, 1))
+            cached = bool(read_uint(f, 1))
+
+            ledger._entries[digest] = _Entry(
+                release_time, entry_time, size, pending, cached
+            )
+            if cached and directory is None:
+                ledger._cache[digest] = read_bytes(f)
+
+        return ledger
@@ -0,0 +1,157 @@
+"""
+Accounting for the memory that contact tracers and batches hold.
+
+The `memory_report` methods of the contact tracers and batches of both
+designs return a :obj:`MemoryReport`: the deep size of every component, e.g.,
+the observations or the EphIDs, and of the state of every retained day.
+Deep sizes follow references to containers and objects, as measured by
+:func:`sys.getsizeof`, and count every object once. Objects shared between
+tracers, such as the protocol parameters, an observation store or a
+pregeneration pool, are not counted. Observations that an
+:obj:`dp3t.storage.ObservationStore` moved to disk only count with the
+small object that maps them.
+
+:func:`aggregate` sums the reports of many tracers, e.g., to check a memory
+budget for all tracers of a :obj:`dp3t.pool.TracerPool`.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import namedtuple
+import sys
+import types
+
+#: The memory held by a tracer, a batch, or many of them
+MemoryReport = namedtuple("MemoryReport", ["total", "components", "days"])
+MemoryReport.__doc__ = """The memory held by a tracer, a batch, or many of them
+
+Attributes:
+    total (int): Deep size of the object in bytes, the sum of the components
+    components (dict): Deep size in bytes of every component, by name. The
+        `overhead` component holds everything that is not in another one.
+    days (dict): Deep size in bytes of the state of every retained day, by
+        :obj:`datetime.date`. Empty for batches.
+"""
+
+# Objects that belong to the program rather than to a tracer or batch
+_SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+)
+
+# Objects without references to other objects
+_LEAF_TYPES = (bytes, bytearray, str, int, float, bool, memoryview)
+
+
+def _referents(obj):
+    if isinstance(obj, dict):
+        yield from obj.keys()
+        yield from obj.values()
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        yield from obj
+    else:
+        attributes = getattr(obj, "__dict__", None)
+        if attributes is not None:
+            yield attributes
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(obj, name):
+                    yield getattr(obj, name)
+
+
+def deep_sizeof(obj, seen=None):
+    """Return the size of obj and of all objects it refers to, in bytes
+
+    Args:
+        obj: Any object
+        seen (set, optional): IDs of objects that are not counted. Objects
+            counted by this call are added, so that several calls with the
+            same set count every object once. Default: an empty set
+
+    Returns:
+        int: The deep size
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if obj is None or id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if not isinstance(obj, _LEAF_TYPES):
+            pending.extend(_referents(obj))
+    return size
+
+
+def build_report(obj, components, days=None, shared=()):
+    """Account for the memory of obj by component and by day
+
+    Components are counted in order, so objects that several components
+    refer to count for the first of them.
+
+    Args:
+        obj: The tracer or batch
+        components ([(str, [object])]): The name of every component, and the
+            objects it consists of
+        days ([(datetime.date, object)], optional): The state of every
+            retained day. Days are measured independently of the components.
+        shared ([object], optional): Objects that obj refers to, but that are
+            shared with other tracers or batches
+
+    Returns:
+        :obj:`MemoryReport`: The report, with the remaining memory of obj as
+            the `overhead` component
+    """
+    excluded = {id(item) for item in shared}
+
+    seen = set(excluded)
+    sizes = {}
+    for (name, objects) in components:
+        sizes[name] = sum(deep_sizeof(item, seen) for item in objects)
+    sizes["overhead"] = deep_sizeof(obj, seen)
+
+    day_sizes = {day: deep_sizeof(state, set(excluded)) for (day, state) in days or ()}
+    return MemoryReport(sum(sizes.values()), sizes, day_sizes)
+
+
+def aggregate(reports):
+    """Sum the reports of many tracers or batches
+
+    Args:
+        reports ([:obj:`MemoryReport`]): The reports
+
+    Returns:
+        :obj:`MemoryReport`: The total of every component and of every day
+    """
+    total = 0
+    components = {}
+    days = {}
+    for report in reports:
+        total += report.total
+        for (name, size) in report.components.items():
+            components[name] = components.get(name, 0) + size
+        for (day, size) in report.days.items():
+            days[day] = days.get(day, 0) + size
+    return MemoryReport(total, components, days)
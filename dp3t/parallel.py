@@ -0,0 +1,213 @@
+"""
+Matching the observations of an unlinkable contact tracer on several cores.
+
+:func:`ContactTracer.matches_with_batch` looks up every retained observation
+in the batch filter, one after the other. With a `pool`, a
+:obj:`concurrent.futures.ProcessPoolExecutor`, it instead calls
+:func:`parallel_matches`, which splits the observations into contiguous
+ranges and matches the ranges in the worker processes.
+
+Neither the filter nor the observations are pickled. The byte tables of the
+filter, see :obj:`dp3t.filters.FrozenCuckooFilter`, and the observations are
+written to files in shared memory (``/dev/shm`` where available), which every
+worker maps read-only. Workers only receive the paths and dimensions
+of these files and return the number of matches in their range, so the
+result is the same as that of serial matching.
+
+Every call writes its own shared files, and removes them once all workers
+are done, also if one of them fails. Batch filters that are not frozen yet
+are frozen on every call, so freeze batches that are matched repeatedly
+first, see :func:`TracingDataBatch.freeze`. Parallel matching pays off when
+the tracer holds many observations: writing them and starting the tasks
+costs time as well.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import namedtuple
+import concurrent.futures
+import mmap
+import os
+import shutil
+import tempfile
+
+from dp3t.filters import FilterUnion, FrozenCuckooFilter
+
+#: Directory for the shared files, if the system has one in memory
+SHARED_MEMORY_DIRECTORY = "/dev/shm"
+
+#: A frozen filter table in a shared file
+_SharedFilter = namedtuple(
+    "_SharedFilter", ["path", "capacity", "bucket_size", "fingerprint_size", "size"]
+)
+
+
+def _frozen_filters(infected_observations):
+    """Return the frozen filters whose union is infected_observations"""
+    if isinstance(infected_observations, FilterUnion):
+        members = infected_observations.filters
+    else:
+        members = [infected_observations]
+
+    return [
+        member
+        if isinstance(member, FrozenCuckooFilter)
+        else FrozenCuckooFilter.from_filter(member)
+        for member in members
+    ]
+
+
+def _share_filter(frozen, path):
+    with open(path, "wb") as f:
+        f.write(frozen.table)
+    return _SharedFilter(
+        path, frozen.capacity, frozen.bucket_size, frozen.fingerprint_size, frozen.size
+    )
+
+
+def _map_file(path):
+    """Map a file read-only. Like bytes, the mapping supports find and slicing."""
+    with open(path, "rb") as f:
+        # Empty files cannot be mapped
+        if not os.fstat(f.fileno()).st_size:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _share_observations(tracer, path):
+    """Write the observations of all retained days, return their number"""
+    nr_observations = 0
+    with open(path, "wb") as f:
+        for observations in tracer.observations_per_day.values():
+            for observation in observations:
+                f.write(observation)
+            nr_observations += len(observations)
+    return nr_observations
+
+
+def match_range(
+    shared_filters,
+    observations_path,
+    record_length,
+    start,
+    stop,
+    observation_format,
+    parameters,
+):
+    """Count the matches of a range of shared observations, in a worker process
+
+    Args:
+        shared_filters ([_SharedFilter]): The filter tables of the batch
+        observations_path (str): File of the observations
+        record_length (int): Length of an observation
+        start (int): Index of the first observation to match
+        stop (int): Index after the last observation to match
+        observation_format (str): The format of the observations
+        parameters (:obj:`ProtocolParameters`): The parameters of the tracer
+
+    Returns:
+        int: The number of matching observations
+    """
+    from dp3t.protocols.unlinkable import matching_observations
+
+    tables = [_map_file(shared.path) for shared in shared_filters]
+    data = _map_file(observations_path)
+    try:
+        filters = [
+            FrozenCuckooFilter(
+                shared.capacity,
+                shared.bucket_size,
+                shared.fingerprint_size,
+                table,
+                shared.size,
+            )
+            for (shared, table) in zip(shared_filters, tables)
+        ]
+        observations = (
+            data[i * record_length : (i + 1) * record_length]
+            for i in range(start, stop)
+        )
+        matches = matching_observations(
+            filters[0] if len(filters) == 1 else FilterUnion(filters),
+            observations,
+            observation_format,
+            parameters,
+        )
+        return sum(1 for _ in matches)
+    finally:
+        for mapping in tables + [data]:
+            if isinstance(mapping, mmap.mmap):
+                mapping.close()
+
+
+def parallel_matches(tracer, batch, pool, nr_tasks=None, directory=None):
+    """Count the matches of an unlinkable tracer with a batch in worker processes
+
+    Args:
+        tracer (:obj:`dp3t.protocols.unlinkable.ContactTracer`): The tracer
+        batch: A :obj:`TracingDataBatch`, or any object with a filter as
+            `infected_observations`, e.g., a :obj:`dp3t.publication.ClientChain`
+        pool (:obj:`concurrent.futures.Executor`): The workers
+        nr_tasks (int, optional): Number of ranges of observations. Default:
+            the number of CPUs
+        directory (str, optional): Directory for the shared files. Default:
+            :data:`SHARED_MEMORY_DIRECTORY` if it exists, and the temporary
+            directory otherwise
+
+    Returns:
+        int: How many EphIDs of infected persons the tracer saw, see
+            :func:`ContactTracer.matches_with_batch`
+    """
+    if nr_tasks is None:
+        nr_tasks = os.cpu_count() or 1
+    if directory is None and os.path.isdir(SHARED_MEMORY_DIRECTORY):
+        directory = SHARED_MEMORY_DIRECTORY
+
+    frozen_filters = _frozen_filters(batch.infected_observations)
+
+    tmp = tempfile.mkdtemp(prefix="dp3t-match-", dir=directory)
+    futures = []
+    try:
+        shared_filters = [
+            _share_filter(frozen, os.path.join(tmp, "filter-{}.bin".format(i)))
+            for (i, frozen) in enumerate(frozen_filters)
+        ]
+        observations_path = os.path.join(tmp, "observations.bin")
+        nr_observations = _share_observations(tracer, observations_path)
+
+        step = -(-nr_observations // nr_tasks)
+        futures = [
+            pool.submit(
+                match_range,
+                shared_filters,
+                observations_path,
+                tracer.observation_length,
+                start,
+                min(start + step, nr_observations),
+                tracer.observation_format,
+                tracer.parameters,
+            )
+            for start in range(0, nr_observations, step or 1)
+        ]
+        return sum(future.result() for future in futures)
+    finally:
+        # Workers must be done with the files before they are removed
+        for future in futures:
+            future.cancel()
+        concurrent.futures.wait(futures)
+        shutil.rmtree(tmp, ignore_errors=True)
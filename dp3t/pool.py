@@ -0,0 +1,252 @@
+"""
+Hosting many contact tracers in a single process.
+
+Simulations and tests host a contact tracer for every simulated phone. Each
+tracer keeps the keys or seeds, EphIDs and observations of the retention
+period in memory, and most of them are idle most of the time. A
+:obj:`TracerPool` keeps at most `max_resident` tracers in memory. When it
+needs room, it evicts the least recently used tracer by saving its state
+(see :func:`ContactTracer.write`) to a snapshot file, and it loads the tracer
+again the next time it is used.
+
+The pool identifies tracers by tenant ID, any hashable value. Call
+:func:`TracerPool.add_observation`, :func:`TracerPool.next_day` and
+:func:`TracerPool.matches_with_batch` with the tenant ID, or obtain the
+tracer with :func:`TracerPool.get`. Do not hold on to a tracer obtained from
+the pool: once evicted, changes to it are lost.
+
+Snapshots hold the state that :func:`ContactTracer.write` saves, including
+the observations that a tracer moved to an
+:obj:`dp3t.storage.ObservationStore`, whose files the pool then deletes. The
+pool keeps the observation store and the pregeneration pool of an evicted
+tracer, and attaches them again when it loads the tracer, which then moves
+its past days back to the store.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import OrderedDict, namedtuple
+import itertools
+import os
+import shutil
+import tempfile
+
+from dp3t.memory import aggregate
+
+#: Counts of the accesses to the tracers of a pool
+PoolStats = namedtuple("PoolStats", ["hits", "loads", "evictions"])
+PoolStats.__doc__ = """Counts of the accesses to the tracers of a pool
+
+Attributes:
+    hits (int): Accesses to tracers that were in memory
+    loads (int): Accesses that loaded a tracer from its snapshot
+    evictions (int): Tracers saved to a snapshot to make room
+"""
+
+# An evicted tracer: its class, snapshot file, and the attachments that the
+# snapshot does not hold
+_Snapshot = namedtuple(
+    "_Snapshot", ["tracer_class", "path", "observation_store", "pregeneration_pool"]
+)
+
+
+class TracerPool:
+    """Keeps the most recently used contact tracers in memory
+
+    See the module documentation.
+    """
+
+    def __init__(self, tracer_class, max_resident, directory=None):
+        """Create an empty pool
+
+        Args:
+            tracer_class (type): The :obj:`ContactTracer` class of either
+                design, used by :func:`create`
+            max_resident (int): Number of tracers to keep in memory
+            directory (str, optional): Directory for the snapshot files.
+                Default: a new temporary directory, removed by :func:`close`
+
+        Raises:
+            ValueError: If max_resident is smaller than 1
+        """
+        if max_resident < 1:
+            raise ValueError("A pool must keep at least one tracer in memory")
+        self.tracer_class = tracer_class
+        self.max_resident = max_resident
+
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="dp3t-tracers-")
+        self.directory = directory
+
+        # Tracers in memory, least recently used first
+        self._resident = OrderedDict()
+        # Evicted tracers, by tenant
+        self._snapshots = {}
+        self._snapshot_ids = itertools.count()
+
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+
+    def create(self, tenant, **kwargs):
+        """Create a tracer for a new tenant
+
+        Args:
+            tenant: The tenant ID
+            **kwargs: Arguments for the tracer class
+
+        Returns:
+            The new :obj:`ContactTracer`
+
+        Raises:
+            KeyError: If the pool already holds a tracer for tenant
+        """
+        tracer = self.tracer_class(**kwargs)
+        self.add(tenant, tracer)
+        return tracer
+
+    def add(self, tenant, tracer):
+        """Add an existing tracer of either design for a new tenant
+
+        Raises:
+            KeyError: If the pool already holds a tracer for tenant
+        """
+        if tenant in self:
+            raise KeyError("Tenant {!r} already has a tracer".format(tenant))
+        self._make_room()
+        self._resident[tenant] = tracer
+
+    def get(self, tenant):
+        """Return the tracer of tenant, loading it from its snapshot if needed
+
+        Raises:
+            KeyError: If the pool holds no tracer for tenant
+        """
+        tracer = self._resident.get(tenant)
+        if tracer is not None:
+            self._resident.move_to_end(tenant)
+            self._hits += 1
+            return tracer
+
+        snapshot = self._snapshots[tenant]
+        self._make_room()
+        with open(snapshot.path, "rb") as f:
+            tracer = snapshot.tracer_class.read(
+                f,
+                observation_store=snapshot.observation_store,
+                pregeneration_pool=snapshot.pregeneration_pool,
+            )
+        os.remove(snapshot.path)
+        del self._snapshots[tenant]
+
+        self._resident[tenant] = tracer
+        self._loads += 1
+        return tracer
+
+    def remove(self, tenant):
+        """Remove the tracer of tenant from the pool, and delete its snapshot
+
+        Raises:
+            KeyError: If the pool holds no tracer for tenant
+        """
+        if tenant in self._resident:
+            self._resident.pop(tenant).release_observations()
+        else:
+            os.remove(self._snapshots.pop(tenant).path)
+
+    def evict(self, tenant):
+        """Save the tracer of tenant to a snapshot, if it is in memory"""
+        tracer = self._resident.pop(tenant, None)
+        if tracer is None:
+            return
+
+        path = os.path.join(
+            self.directory, "tracer-{}.state".format(next(self._snapshot_ids))
+        )
+        with open(path, "wb") as f:
+            tracer.write(f)
+        tracer.release_observations()
+        self._snapshots[tenant] = _Snapshot(
+            type(tracer), path, tracer.observation_store, tracer.pregeneration_pool
+        )
+        self._evictions += 1
+
+    def _make_room(self):
+        while len(self._resident) >= self.max_resident:
+            self.evict(next(iter(self._resident)))
+
+    def add_observation(self, tenant, *args, **kwargs):
+        """Add an observation for tenant, see :func:`ContactTracer.add_observation`"""
+        self.get(tenant).add_observation(*args, **kwargs)
+
+    def next_day(self, tenant):
+        """Move the tracer of tenant to the next day"""
+        self.get(tenant).next_day()
+
+    def matches_with_batch(self, tenant, *args, **kwargs):
+        """Match a batch for tenant, see :func:`ContactTracer.matches_with_batch`"""
+        return self.get(tenant).matches_with_batch(*args, **kwargs)
+
+    def tenants(self):
+        """Return the tenant IDs of all tracers, in memory or not"""
+        return list(self._resident) + list(self._snapshots)
+
+    def is_resident(self, tenant):
+        """Return whether the tracer of tenant is in memory"""
+        return tenant in self._resident
+
+    @property
+    def stats(self):
+        """The :obj:`PoolStats` of the accesses so far"""
+        return PoolStats(self._hits, self._loads, self._evictions)
+
+    def memory_report(self):
+        """Return the memory that the tracers in memory hold, together
+
+        Evicted tracers hold no memory. Their snapshots are on disk.
+
+        Returns:
+            :obj:`dp3t.memory.MemoryReport`: The sum of the reports of the
+                tracers, see :func:`dp3t.memory.aggregate`
+        """
+        return aggregate(tracer.memory_report() for tracer in self._resident.values())
+
+    def __contains__(self, tenant):
+        return tenant in self._resident or tenant in self._snapshots
+
+    def __len__(self):
+        return len(self._resident) + len(self._snapshots)
+
+    def close(self):
+        """Forget all tracers and delete their snapshots"""
+        for tracer in self._resident.values():
+            tracer.release_observations()
+        self._resident.clear()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            for snapshot in self._snapshots.values():
+                os.remove(snapshot.path)
+        self._snapshots.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
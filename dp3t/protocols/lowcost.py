@@ -20,20 +20,27 @@ __copyright__ = """
 __license__ = "Apache 2.0"
 
 import datetime
-import hashlib
-import hmac
+import functools
 import secrets
-import random
 
-from Cryptodome.Util import Counter
-from Cryptodome.Cipher import AES
-
-from dp3t.config import (
-    EPOCH_LENGTH,
-    RETENTION_PERIOD,
-    NUM_EPOCHS_PER_DAY,
-    LENGTH_EPHID,
-    SECONDS_PER_DAY,
+from dp3t.config import DEFAULT_PARAMETERS, SECONDS_PER_DAY
+from dp3t.crypto import get_backend
+from dp3t.encounters import EncounterStore
+from dp3t.memory import build_report
+from dp3t.retention import TimeWheel
+from dp3t.risk import DayCandidate, evaluate_risk
+from dp3t.serialization import (
+    LOWCOST_BATCH,
+    LOWCOST_STATE,
+    read_exactly,
+    read_items,
+    read_magic,
+    read_parameters,
+    read_uint,
+    write_items,
+    write_magic,
+    write_parameters,
+    write_uint,
 )
 
 
@@ -44,8 +51,11 @@ from dp3t.config import (
 #: Constant string "broadcast key" for domain seperation
 BROADCAST_KEY = "broadcast key".encode("ascii")
 
-#: Length of a batch (2 hours)
-SECONDS_PER_BATCH = 2 * 60 * 60
+#: Default length of a batch (2 hours), see :obj:`dp3t.config.ProtocolParameters`
+SECONDS_PER_BATCH = DEFAULT_PARAMETERS.seconds_per_batch
+
+#: Length of a serialized (start_time, key) pair in a batch file
+BATCH_RECORD_LENGTH = 8 + 32
 
 
 #########################
@@ -65,16 +75,18 @@ def day_start_from_time(time):
     return (int(time.timestamp()) // SECONDS_PER_DAY) * SECONDS_PER_DAY
 
 
-def batch_start_from_time(time):
+def batch_start_from_time(time, parameters=DEFAULT_PARAMETERS):
     """Return the first Unix epoch second of the batch corresponding to time
 
     Args:
         datetime (obj:datetime.datetime): A datetime
+        parameters (:obj:`ProtocolParameters`, optional): The length of batches
 
     Returns:
         The first Unix epoch second on that day
     """
-    return (int(time.timestamp()) // SECONDS_PER_BATCH) * SECONDS_PER_BATCH
+    seconds_per_batch = parameters.seconds_per_batch
+    return (int(time.timestamp()) // seconds_per_batch) * seconds_per_batch
 
 
 def secure_shuffle(items):
@@ -86,7 +98,7 @@ def secure_shuffle(items):
     Returns:
         Nothing. Items are shuffled in place
     """
-    random.shuffle(items, secrets.SystemRandom().random)
+    secrets.SystemRandom().shuffle(items)
 
 
 #########################################
@@ -108,43 +120,94 @@ def next_day_key(current_day_key):
     Returns:
         byte array: The next 32-byte key
     """
-    return hashlib.sha256(current_day_key).digest()
+    return get_backend().sha256(current_day_key)
+
+
+def _split_ephids(prg_output_bytes, shuffle, length_ephid):
+    """Split the output of the PRG into EphIDs, and optionally shuffle them"""
+    ephids = [
+        prg_output_bytes[idx : idx + length_ephid]
+        for idx in range(0, len(prg_output_bytes), length_ephid)
+    ]
+
+    # Shuffle the resulting ephids
+    if shuffle:
+        secure_shuffle(ephids)
+
+    return ephids
 
 
-def generate_ephids_for_day(current_day_key, shuffle=True):
+def generate_ephids_for_day(
+    current_day_key, shuffle=True, parameters=DEFAULT_PARAMETERS
+):
     """Generates the list of EphIDs for the current day
 
     Args:
         key (byte array): A 32-byte key
         shuffle (bool, optional): Whether to shuffle the list of EphIDs. Default: True.
             Should only be set to False when testing or when generating test vectors
+        parameters (:obj:`ProtocolParameters`, optional): The number of epochs
+            per day and the length of EphIDs
 
     Returns:
         list of byte arrays: The list of EphIDs for the day
     """
+    backend = get_backend()
 
     # Compute key for stream cipher based on current_day_key
-    stream_key = hmac.new(current_day_key, BROADCAST_KEY, hashlib.sha256).digest()
-
-    # Start with a fresh counter each day and initialize AES in CTR mode
-    counter = Counter.new(128, initial_value=0)
-    prg = AES.new(stream_key, AES.MODE_CTR, counter=counter)
+    stream_key = backend.hmac_sha256(current_day_key, BROADCAST_KEY)
 
     # Create the number of desired ephIDs by drawing from AES in CTR mode
-    # operating a s a stream cipher. To get the raw output, we ask the library
-    # to "encrypt" an all-zero message of sufficient length.
-    prg_output_bytes = prg.encrypt(bytes(LENGTH_EPHID * NUM_EPOCHS_PER_DAY))
+    # operating as a stream cipher, starting with a fresh counter each day.
+    length_ephid = parameters.length_ephid
+    prg_output_bytes = backend.prg(
+        stream_key, length_ephid * parameters.num_epochs_per_day
+    )
 
-    ephids = [
-        prg_output_bytes[idx : idx + LENGTH_EPHID]
-        for idx in range(0, len(prg_output_bytes), LENGTH_EPHID)
+    return _split_ephids(prg_output_bytes, shuffle, length_ephid)
+
+
+def generate_ephids_for_days(day_keys, shuffle=True, parameters=DEFAULT_PARAMETERS):
+    """Generates the lists of EphIDs for several days at once
+
+    See :func:`generate_ephids_for_day`. This function uses the bulk
+    operations of the crypto backend.
+
+    Args:
+        day_keys ([byte array]): The 32-byte keys of the days
+        shuffle (bool, optional): Whether to shuffle the lists of EphIDs. Default: True.
+        parameters (:obj:`ProtocolParameters`, optional): See
+            :func:`generate_ephids_for_day`
+
+    Returns:
+        list of lists of byte arrays: For each key, the list of EphIDs
+    """
+    backend = get_backend()
+
+    stream_keys = [backend.hmac_sha256(key, BROADCAST_KEY) for key in day_keys]
+    length_ephid = parameters.length_ephid
+    prg_outputs = backend.prg_many(
+        stream_keys, length_ephid * parameters.num_epochs_per_day
+    )
+
+    return [
+        _split_ephids(prg_output, shuffle, length_ephid) for prg_output in prg_outputs
     ]
 
-    # Shuffle the resulting ephids
-    if shuffle:
-        secure_shuffle(ephids)
 
-    return ephids
+def next_day_ephids(current_day_key, parameters=DEFAULT_PARAMETERS):
+    """Return the key and the EphIDs of the next day
+
+    Args:
+        current_day_key (byte array): The 32-byte key of the current day
+        parameters (:obj:`ProtocolParameters`, optional): See
+            :func:`generate_ephids_for_day`
+
+    Returns:
+        (key, ephids): The next 32-byte key, and the shuffled list of its EphIDs
+    """
+    key = next_day_key(current_day_key)
+    return key, generate_ephids_for_day(key, parameters=parameters)
 
 
 #############################################################
@@ -158,7 +221,9 @@ class TracingDataBatch:
     the backend server to the phone at regular intervals.
     """
 
-    def __init__(self, time_key_pairs, release_time=None):
+    def __init__(
+        self, time_key_pairs, release_time=None, parameters=DEFAULT_PARAMETERS
+    ):
         """Create a published batch of tracing keys
 
         Args:
@@ -166,19 +231,120 @@ class TracingDataBatch:
                 infected people and the corresponding start times.
             release_time (int, optional): Release time in seconds since UNIX Epoch
                 when missing, defaults to current time
+            parameters (:obj:`ProtocolParameters`, optional): The length of
+                batches. Default: :data:`DEFAULT_PARAMETERS`
 
         Raises:
             ValueError: if the release_time is not aligned to a batch boundary
         """
         if release_time is None:
-            release_time = batch_start_from_time(datetime.datetime.now())
+            release_time = batch_start_from_time(datetime.datetime.now(), parameters)
 
-        if release_time % SECONDS_PER_BATCH != 0:
+        if release_time % parameters.seconds_per_batch != 0:
             raise ValueError("Release time must be batch-aligned")
 
+        self.parameters = parameters
         self.release_time = release_time
         self.time_key_pairs = time_key_pairs
 
+    def write(self, f):
+        """Write the batch to the binary file f, see :func:`write_batch`"""
+        write_batch(f, self.time_key_pairs, self.release_time)
+
+    @classmethod
+    def read(cls, f, parameters=DEFAULT_PARAMETERS):
+        """Read a batch written by :func:`write` from the binary file f
+
+        Args:
+            f: A binary file
+            parameters (:obj:`ProtocolParameters`, optional): The parameters
+                of the batch, these are not part of the file
+
+        Raises:
+            ValueError: If f does not hold a batch of this design
+        """
+        release_time, time_key_pairs = read_batch(f)
+        return cls(list(time_key_pairs), release_time, parameters)
+
+    def memory_report(self):
+        """Return the memory that the batch holds
+
+        Returns:
+            :obj:`dp3t.memory.MemoryReport`: The deep size of the
+                `time_key_pairs`, and the `overhead`
+        """
+        return build_report(
+            self, [("time_key_pairs", [self.time_key_pairs])], shared=[self.parameters]
+        )
+
+
+def write_batch(f, time_key_pairs, release_time):
+    """Write a batch of tracing keys to the binary file f
+
+    Pairs are written as they are produced, so `time_key_pairs` can be a
+    generator over more keys than fit in memory.
+
+    Args:
+        f: A binary file opened for writing
+        time_key_pairs ([(time, byte array)]): Tracing keys of infected people
+            and the corresponding start times
+        release_time (int): Release time in seconds since UNIX Epoch
+
+    Returns:
+        int: The number of keys written
+    """
+    write_magic(f, LOWCOST_BATCH)
+    write_uint(f, release_time, 8)
+
+    nr_keys = 0
+    for (start_time, key) in time_key_pairs:
+        if len(key) != 32:
+            raise ValueError("Tracing keys must be 32 bytes long")
+        write_uint(f, start_time, 8)
+        f.write(key)
+        nr_keys += 1
+
+    return nr_keys
+
+
+def read_batch(f):
+    """Read a batch written by :func:`write_batch` from the binary file f
+
+    Returns:
+        (release_time, time_key_pairs): The release time, and an iterator that
+            reads the (start_time, key) pairs from f as it is consumed
+
+    Raises:
+        ValueError: If f does not hold a batch of this design
+    """
+    read_magic(f, LOWCOST_BATCH)
+    release_time = read_uint(f, 8)
+
+    def time_key_pairs():
+        while True:
+            record = f.read(BATCH_RECORD_LENGTH)
+            if not record:
+                return
+            if len(record) != BATCH_RECORD_LENGTH:
+                raise ValueError("Unexpected end of file")
+            yield int.from_bytes(record[:8], "big"), record[8:]
+
+    return release_time, time_key_pairs()
+
+
+class _DayState:
+    """The day key and observations of a single day"""
+
+    __slots__ = ("key", "observations")
+
+    def __init__(self):
+        # The day key, set once the day is over
+        self.key = None
+
+        # For each batch (or the whole day), a list of observed EphIDs, or the
+        # records of the encounters with them
+        self.observations = {}
+
 
 class ContactTracer:
     """Simple reference implementation of the contact tracer.
@@ -194,83 +360,346 @@ class ContactTracer:
 
     Actual implementations will probably take into account extra information
     from the Bluetooth backend to do better distance measurements, and
-    subsequently use this information to do a better risk computation.
+    subsequently use this information to do a better risk computation. With
+    `encounters=True`, the tracer records the number, time span and
+    attenuation of the sightings of every EphID, see :mod:`dp3t.encounters`,
+    and weighs matches by them.
 
     A note on internal data representation:
      * All internal times are in seconds since UNIX epoch
      * The start of each day is aligned with a day-boundary (i.e., multiples of
        86400 seconds)
-     * Batches are aligned at batch boundaries (e.g., multiples of SECONDS_PER_BATCH)
+     * Batches are aligned at batch boundaries (e.g., multiples of
+       `parameters.seconds_per_batch`)
 
     All external facing interfaces use datetime.datetime objects instead.
     """
 
     @staticmethod
-    def _reconstruct_ephids(key, start_time, end_time):
+    def _reconstruct_ephids(key, start_time, end_time, parameters=DEFAULT_PARAMETERS):
         """Regenerate all EphIDs given start and end times
 
         Args:
             key (byte array): A 32-byte key
             start_time (int): In seconds since UNIX epoch (expect to be day aligned)
             end_time (int): In seconds since UNIX epoch (does not have to be day aligned)
+            parameters (:obj:`ProtocolParameters`, optional): The parameters
+                of the EphIDs
 
         Returns:
             dictionary: For each day, start_date <= day <= end_date, a list of EphIDs
         """
-        day = start_time
-
-        ephids_per_day = {}
-        while day <= end_time:
-            ephids_per_day[day] = generate_ephids_for_day(key)
+        days = range(start_time, end_time + 1, SECONDS_PER_DAY)
 
+        day_keys = []
+        for _ in days:
+            day_keys.append(key)
             key = next_day_key(key)
-            day += SECONDS_PER_DAY
 
-        return ephids_per_day
+        return dict(
+            zip(days, generate_ephids_for_days(day_keys, parameters=parameters))
+        )
 
-    def __init__(self, start_time=None):
+    def __init__(
+        self,
+        start_time=None,
+        observation_store=None,
+        pregeneration_pool=None,
+        parameters=DEFAULT_PARAMETERS,
+        encounters=False,
+    ):
         """Initialize a new contact tracer
 
         Args:
             start_time (:obj:`datetime.datetime`, optional): The current time
                 The default value is the current time.
-        """
-        self.past_keys = []
+            observation_store (:obj:`dp3t.storage.ObservationStore`, optional):
+                Moves observations of past days to disk once they exceed its
+                memory limit. Default: keep all observations in memory
+            pregeneration_pool (:obj:`concurrent.futures.Executor`, optional):
+                Prepares the key and EphIDs of the next day in the background,
+                so that :func:`next_day` only swaps them in. Default: generate
+                them in :func:`next_day`
+            parameters (:obj:`ProtocolParameters`, optional): The epoch length,
+                retention period, EphID length and batch length of the tracer.
+                Default: :data:`DEFAULT_PARAMETERS`
+            encounters (bool, optional): Whether to aggregate the sightings of
+                every EphID into a record of a
+                :obj:`dp3t.encounters.EncounterStore`. Default: False
 
-        # For each day, a list of observed EphIDs
-        self.observations = {}
+        Raises:
+            ValueError: If encounters are combined with an observation store
+        """
+        if encounters and observation_store is not None:
+            raise ValueError(
+                "Encounter records cannot be moved to an observation store"
+            )
 
         if start_time is None:
             start_time = datetime.datetime.now()
         self.start_of_today = day_start_from_time(start_time)
+        self.parameters = parameters
+        self._store = observation_store
+        self.encounters = encounters
+
+        # For each retained day, the day key and the observed EphIDs
+        self._days = TimeWheel(
+            self.start_of_today // SECONDS_PER_DAY,
+            parameters.retention_period,
+            _DayState,
+        )
 
         # Generate initial day key
         self.current_day_key = generate_new_day_key()
 
         # Generate new batch of EphIDs
-        self.current_ephids = generate_ephids_for_day(self.current_day_key)
+        self.current_ephids = generate_ephids_for_day(
+            self.current_day_key, parameters=parameters
+        )
+
+        self._pool = pregeneration_pool
+        self._schedule_next_day()
+
+    def _schedule_next_day(self):
+        """Start preparing the key and EphIDs of the next day in the background"""
+        self._next_day = None
+        if self._pool is not None:
+            self._next_day = self._pool.submit(
+                next_day_ephids, self.current_day_key, self.parameters
+            )
+
+    def _discard_next_day(self):
+        """Discard the prepared next day, it no longer follows the current key"""
+        if self._next_day is not None:
+            self._next_day.cancel()
+        self._schedule_next_day()
+
+    def write(self, f):
+        """Save the state of the tracer to the binary file f
+
+        *Warning:* The state contains the day keys and the observations of
+        the user. Store it with the same care as the tracer itself.
+        """
+        length_ephid = self.parameters.length_ephid
+
+        write_magic(f, LOWCOST_STATE)
+        write_parameters(f, self.parameters)
+        write_uint(f, self.start_of_today, 8)
+        write_uint(f, self.encounters, 1)
+        f.write(self.current_day_key)
+        write_items(f, self.current_ephids, length_ephid, 2)
+
+        days = list(self._days.items())
+        write_uint(f, len(days), 2)
+        for (day, state) in days:
+            write_uint(f, day)
+            write_uint(f, state.key is not None, 1)
+            f.write(state.key or bytes(32))
+
+            write_uint(f, len(state.observations))
+            for (time, ephids) in state.observations.items():
+                write_uint(f, time, 8)
+                if self.encounters:
+                    ephids.write(f)
+                else:
+                    write_items(f, ephids, length_ephid)
+
+    @classmethod
+    def read(cls, f, observation_store=None, pregeneration_pool=None):
+        """Load a tracer saved by :func:`write` from the binary file f
+
+        The observation store and the pregeneration pool are not part of the
+        state. Pass them again to attach them to the loaded tracer, which
+        then moves past days to the store right away.
 
-    def next_day(self):
-        """Setup keys and EphIDs for the next day, and do housekeeping"""
+        Args:
+            f: A binary file
+            observation_store (:obj:`dp3t.storage.ObservationStore`, optional):
+                As for :obj:`ContactTracer`
+            pregeneration_pool (:obj:`concurrent.futures.Executor`, optional):
+                As for :obj:`ContactTracer`
 
-        # Keep a list of the past RETENTION_PERIOD keys
-        self.past_keys.insert(0, self.current_day_key)
-        self.past_keys = self.past_keys[:RETENTION_PERIOD]
+        Raises:
+            ValueError: If f does not hold a tracer state of this design, or
+                if it holds encounters and an observation store is given
+        """
+        read_magic(f, LOWCOST_STATE)
+
+        tracer = cls.__new__(cls)
+        tracer._store = None
+        tracer._pool = None
+        tracer._next_day = None
+        tracer.parameters = parameters = read_parameters(f)
+        length_ephid = parameters.length_ephid
+
+        tracer.start_of_today = read_uint(f, 8)
+        tracer.encounters = bool(read_uint(f, 1))
+        tracer.current_day_key = read_exactly(f, 32)
+        tracer.current_ephids = read_items(f, length_ephid, 2)
+        tracer._days = TimeWheel(
+            tracer.start_of_today // SECONDS_PER_DAY,
+            parameters.retention_period,
+            _DayState,
+        )
+
+        for _ in range(read_uint(f, 2)):
+            day = read_uint(f)
+            state = _DayState()
+            has_key = read_uint(f, 1)
+            key = read_exactly(f, 32)
+            state.key = key if has_key else None
+
+            for _ in range(read_uint(f)):
+                time = read_uint(f, 8)
+                if tracer.encounters:
+                    state.observations[time] = EncounterStore.read(f, length_ephid)
+                else:
+                    state.observations[time] = read_items(f, length_ephid)
+            tracer._days[day] = state
+
+        if tracer.encounters and observation_store is not None:
+            raise ValueError(
+                "Encounter records cannot be moved to an observation store"
+            )
+        tracer._store = observation_store
+        tracer._pool = pregeneration_pool
+        tracer._schedule_next_day()
+        tracer._spill_observations()
+        return tracer
+
+    @property
+    def observation_store(self):
+        """The :obj:`dp3t.storage.ObservationStore` of the tracer, or None"""
+        return self._store
+
+    @property
+    def pregeneration_pool(self):
+        """The executor that prepares the next day in the background, or None"""
+        return self._pool
+
+    @property
+    def past_keys(self):
+        """The keys of the past retention period, most recent first"""
+        past_keys = []
+        for (day, state) in self._days.items():
+            if day == self._days.current_day:
+                continue
+            if state.key is None:
+                break
+            past_keys.append(state.key)
 
-        # Update the day key
-        self.current_day_key = next_day_key(self.current_day_key)
+        return past_keys
 
-        # Generate new batch of EphIDs
-        self.current_ephids = generate_ephids_for_day(self.current_day_key)
+    @property
+    def observations(self):
+        """For each batch (or day) start time, a list of observed EphIDs"""
+        return {
+            time: ephids
+            for (_, state) in self._days.items()
+            for (time, ephids) in state.observations.items()
+        }
+
+    def memory_report(self):
+        """Return the memory that the tracer holds, by component and by day
+
+        The components are the `observations`, the `past_keys`, the
+        `current_day_key`, the `current_ephids` and the `overhead`. The state of
+        a day holds its key, once the day is over, and its observations.
+
+        Returns:
+            :obj:`dp3t.memory.MemoryReport`: The report
+        """
+        days = list(self._days.items())
+        components = [
+            ("observations", [state.observations for (_, state) in days]),
+            ("past_keys", self.past_keys),
+            ("current_day_key", [self.current_day_key]),
+            ("current_ephids", [self.current_ephids]),
+        ]
+        epoch = datetime.date(1970, 1, 1)
+        return build_report(
+            self,
+            components,
+            [(epoch + datetime.timedelta(days=day), state) for (day, state) in days],
+            shared=[self.parameters, self._store, self._pool],
+        )
+
+    def next_day(self):
+        """Setup keys and EphIDs for the next day, and do housekeeping"""
+
+        # The encounters of past days no longer change
+        if self.encounters:
+            for encounters in self._days.current.observations.values():
+                encounters.freeze()
+
+        # Keep today's key as a past key. Moving to the next day drops the key
+        # and the observations of the oldest retained day.
+        self._days.current.key = self.current_day_key
+        dropped = self._days.advance()
+        if dropped is not None and self._store is not None:
+            for ephids in dropped.observations.values():
+                self._store.release(ephids)
+
+        # Update the day key and generate new batch of EphIDs, or swap in the
+        # ones prepared in the background
+        if self._next_day is not None:
+            self.current_day_key, self.current_ephids = self._next_day.result()
+        else:
+            self.current_day_key, self.current_ephids = next_day_ephids(
+                self.current_day_key, self.parameters
+            )
+        self._schedule_next_day()
 
         # Update current day
         self.start_of_today = self.start_of_today + SECONDS_PER_DAY
 
-        # Remove old observations
-        last_retained = self.start_of_today - RETENTION_PERIOD * SECONDS_PER_DAY
-        delete_times = [time for time in self.observations if time < last_retained]
-        for time in delete_times:
-            del self.observations[time]
+        self._spill_observations()
+
+    def _spill_observations(self):
+        """Move past days to the observation store until within its memory limit
+
+        Only days whose observations all have day granularity are moved, as
+        these no longer change (see :func:`housekeeping_after_batch`). The
+        oldest days are moved first.
+        """
+        if self._store is None:
+            return
+
+        length_ephid = self.parameters.length_ephid
+        days = list(self._days.items())
+        memory = sum(
+            len(ephids) * length_ephid
+            for (_, state) in days
+            for ephids in state.observations.values()
+            if not self._store.is_spilled(ephids)
+        )
+
+        for (day, state) in reversed(days):
+            if memory <= self._store.memory_limit:
+                break
+
+            day_time = day * SECONDS_PER_DAY
+            if day == self._days.current_day or list(state.observations) != [day_time]:
+                continue
+
+            ephids = state.observations[day_time]
+            if self._store.is_spilled(ephids):
+                continue
+
+            memory -= len(ephids) * length_ephid
+            state.observations[day_time] = self._store.spill(ephids, length_ephid)
+
+    def release_observations(self):
+        """Delete the files of the observations moved to the observation store
+
+        Call this before dropping a tracer with an observation store. The
+        tracer cannot be used afterwards.
+        """
+        if self._store is None:
+            return
+        for (_, state) in self._days.items():
+            for ephids in state.observations.values():
+                self._store.release(ephids)
 
     def get_ephid_for_time(self, time):
         """Return the EphID corresponding to the requested time
@@ -287,11 +716,11 @@ class ContactTracer:
             raise ValueError("Requested EphID not availavle. Did you call next_day()?")
 
         # Compute the corresponding epoch within the day
-        epoch = (int(time.timestamp()) - day_start) // (EPOCH_LENGTH * 60)
+        epoch = (int(time.timestamp()) - day_start) // self.parameters.epoch_seconds
 
         return self.current_ephids[epoch]
 
-    def add_observation(self, ephid, time):
+    def add_observation(self, ephid, time, attenuation=None):
         """Add ephID to list of observations. Time must correspond to the current day
 
         Initially observations are stored with a receive time that has batch
@@ -302,26 +731,42 @@ class ContactTracer:
         can be updated to have day granularity. See
         :func:`housekeeping_after_batch`.
 
+        Tracers that record encounters keep the sightings of an EphID in a
+        single record per batch (or day), which also holds the time of the
+        first and last sighting.
+
         Args:
             ephID (byte array): the observed ephID
             time (:obj:`datatime.datetime`): time of observation
+            attenuation (int, optional): Attenuation of the signal in dB. Only
+                tracers that record encounters keep it. Default: unknown
 
         Raises:
-            ValueError: If time does not correspond to the current day
+            ValueError: If time does not correspond to the current day, or if
+                an attenuation is given to a tracer without encounter records
         """
 
-        batch_start = batch_start_from_time(time)
+        batch_start = batch_start_from_time(time, self.parameters)
 
         end_of_today = self.start_of_today + SECONDS_PER_DAY
         if not self.start_of_today <= batch_start < end_of_today:
             raise ValueError("Observation must correspond to current day")
+        if attenuation is not None and not self.encounters:
+            raise ValueError("Attenuations are only kept with encounter records")
 
-        if batch_start not in self.observations:
-            self.observations[batch_start] = []
-        self.observations[batch_start].append(ephid)
+        observations = self._days.current.observations
+        if self.encounters:
+            if batch_start not in observations:
+                observations[batch_start] = EncounterStore(self.parameters.length_ephid)
+            observations[batch_start].add(ephid, int(time.timestamp()), attenuation)
+            return
+
+        if batch_start not in observations:
+            observations[batch_start] = []
+        observations[batch_start].append(ephid)
 
         # Shuffle observations to hide receive order
-        secure_shuffle(self.observations[batch_start])
+        secure_shuffle(observations[batch_start])
 
     def get_tracing_information(
         self,
@@ -370,65 +815,164 @@ class ContactTracer:
             self.current_day_key = generate_new_day_key()
 
             # Generate new batch of EphIDs
-            self.current_ephids = generate_ephids_for_day(self.current_day_key)
+            self.current_ephids = generate_ephids_for_day(
+                self.current_day_key, parameters=self.parameters
+            )
 
             # Destroy history, as it will no longer be valid
-            self.past_keys = []
+            for (_, state) in self._days.items():
+                state.key = None
+
+            # The prepared next day derives from the released key
+            self._discard_next_day()
 
         return start_contagious_day, tracing_key
 
-    def matches_with_key(self, key, start_time, release_time):
+    def matches_with_key(self, key, start_time, release_time, weight=None):
         """Count #contacts with infected person given person's day key
 
         Args:
             key (byte array): A 32-byte key of an infected person
             start_time (int): The first day (in UNIX epoch seconds) on which this key is valid
             release_time (int): The publication time of the key
+            weight (callable, optional): See :func:`matches_with_batch`
 
         Returns:
-            int: How many epochs we saw EphIDs of the infected person
+            int: How many epochs we saw EphIDs of the infected person, or the
+                sum of the weights of the matching encounters
+
+        Raises:
+            ValueError: If a weight is given to a tracer without encounter
+                records
         """
+        if weight is not None and not self.encounters:
+            raise ValueError("Weighted exposure requires encounter records")
 
-        ephids_per_day = self._reconstruct_ephids(key, start_time, release_time)
+        ephids_per_day = self._reconstruct_ephids(
+            key, start_time, release_time, self.parameters
+        )
 
         nr_encounters = 0
 
-        for time in self.observations:
-            # Ignore observations on or after publication time of the key
-            if time >= release_time:
+        for (day, state) in self._days.items():
+            # Skip if we don't have corresponding EphIDs
+            day_start = day * SECONDS_PER_DAY
+            if day_start not in ephids_per_day:
                 continue
 
-            # Get start of the day corresponding to the time
-            day = (time // SECONDS_PER_DAY) * SECONDS_PER_DAY
+            for (time, observations) in state.observations.items():
+                # Ignore observations on or after publication time of the key
+                if time >= release_time:
+                    continue
 
-            # Skip if we don't have corresponding observations
-            if day not in ephids_per_day:
-                continue
-
-            for ephid in ephids_per_day[day]:
-                if ephid in self.observations[time]:
-                    nr_encounters += 1
+                for ephid in ephids_per_day[day_start]:
+                    if ephid not in observations:
+                        continue
+                    if weight is None:
+                        nr_encounters += 1
+                    else:
+                        nr_encounters += weight(observations.encounter(ephid))
 
         return nr_encounters
 
-    def matches_with_batch(self, batch):
+    def matches_with_batch(self, batch, weight=None):
         """Count #contacts with each infected person in batch
 
         Args:
             batch (`obj`:TracingDataBatch): A batch of tracing keys
+            weight (callable, optional): Turns the
+                :obj:`dp3t.encounters.Encounter` of every match into an
+                exposure, e.g., :func:`dp3t.encounters.proximity_weight`.
+                Requires encounter records. Default: count every match once
 
         Returns:
-            int: How many EphIDs of infected persons we saw
+            int: How many EphIDs of infected persons we saw, or the sum of
+                the weights of the matching encounters
+
+        Raises:
+            ValueError: If a weight is given to a tracer without encounter
+                records
         """
+        if weight is not None and not self.encounters:
+            raise ValueError("Weighted exposure requires encounter records")
 
         seen_infected_ephids = 0
         release_time = batch.release_time
 
         for (start_time, key) in batch.time_key_pairs:
-            seen_infected_ephids += self.matches_with_key(key, start_time, release_time)
+            seen_infected_ephids += self.matches_with_key(
+                key, start_time, release_time, weight
+            )
 
         return seen_infected_ephids
 
+    def _matches_on_day(self, batch, day_start, buckets):
+        """Yield once for every infected EphID in buckets
+
+        Args:
+            batch (`obj`:TracingDataBatch): A batch of tracing keys
+            day_start (int): The day (in UNIX epoch seconds) of the observations
+            buckets ([[byte array]]): EphIDs observed on that day, by time
+        """
+        # Only read spilled observations once the day is evaluated
+        observed_ephids = []
+        for observations in buckets:
+            observed_ephids.extend(set(observations))
+
+        for (start_time, key) in batch.time_key_pairs:
+            if not start_time <= day_start <= batch.release_time:
+                continue
+
+            # Derive the key of the observation day
+            for _ in range((day_start - start_time) // SECONDS_PER_DAY):
+                key = next_day_key(key)
+
+            infected_ephids = set(
+                generate_ephids_for_day(key, shuffle=False, parameters=self.parameters)
+            )
+            for ephid in observed_ephids:
+                if ephid in infected_ephids:
+                    yield ephid
+
+    def _day_candidates(self, batch):
+        """Return a :obj:`dp3t.risk.DayCandidate` for every retained day"""
+        candidates = []
+
+        for (day, state) in self._days.items():
+            # Ignore observations on or after publication time of the batch
+            buckets = [
+                observations
+                for (time, observations) in state.observations.items()
+                if time < batch.release_time
+            ]
+            nr_observations = sum(len(observations) for observations in buckets)
+
+            day_start = day * SECONDS_PER_DAY
+            matches = functools.partial(self._matches_on_day, batch, day_start, buckets)
+            candidates.append(DayCandidate(day_start, nr_observations, matches))
+
+        return candidates
+
+    def evaluate_risk(self, batch, threshold=1, stop_early=True):
+        """Determine whether we had enough contacts with infected persons in batch
+
+        Contrary to :func:`matches_with_batch`, this function evaluates the
+        most recent days first and stops as soon as the number of infected
+        EphIDs seen on a single day reaches `threshold`.
+
+        Args:
+            batch (`obj`:TracingDataBatch): A batch of tracing keys
+            threshold (int, optional): Number of infected EphIDs seen on a single
+                day for the user to be at risk. Default: 1
+            stop_early (bool, optional): Whether to stop as soon as the threshold
+                is reached. Default: True
+
+        Returns:
+            :obj:`dp3t.risk.RiskEvaluation`: The per-day exposures, where days
+                are in UNIX epoch seconds
+        """
+        return evaluate_risk(self._day_candidates(batch), threshold, stop_early)
+
     def housekeeping_after_batch(self, batch):
         """Update stored observations after processing batch.
 
@@ -441,25 +985,38 @@ class ContactTracer:
         also :func:`add_observation`
         """
 
-        update_list = {}
-
-        # Gather observations we should update
-        for time in self.observations:
-            if time < batch.release_time and time % SECONDS_PER_DAY != 0:
-                update_list[time] = self.observations[time]
-
-        # Delete these observations
-        for time in update_list:
-            del self.observations[time]
+        for (day, state) in self._days.items():
+            day_time = day * SECONDS_PER_DAY
+            observations = state.observations
+
+            # Gather observations we should update
+            update_list = [
+                time
+                for time in observations
+                if time < batch.release_time and time != day_time
+            ]
+            if not update_list:
+                continue
 
-        # Reinsert gathered observations with day-granularity
-        for (time, observations) in update_list.items():
-            day_time = (time // SECONDS_PER_DAY) * SECONDS_PER_DAY
+            # Merge the encounter records into a single record per EphID,
+            # which are sorted rather than shuffled
+            if self.encounters:
+                stores = [observations.pop(time) for time in update_list]
+                if day_time in observations:
+                    stores.append(observations[day_time])
+                observations[day_time] = EncounterStore.merged(
+                    stores, self.parameters.length_ephid
+                )
+                continue
 
-            if day_time not in self.observations:
-                self.observations[day_time] = []
+            # Reinsert gathered observations with day-granularity
+            if day_time not in observations:
+                observations[day_time] = []
 
-            self.observations[day_time].extend(observations)
+            for time in update_list:
+                observations[day_time].extend(observations.pop(time))
 
             # Reshuffle to make sure we do not store ordering data
-            secure_shuffle(self.observations[day_time])
+            secure_shuffle(observations[day_time])
+
+        self._spill_observations()
@@ -19,21 +19,60 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
-import hashlib
 import secrets
 import datetime
-
-from cuckoo.filter import CuckooFilter
-
-from dp3t.config import RETENTION_PERIOD, EPOCH_LENGTH, NUM_EPOCHS_PER_DAY, LENGTH_EPHID
+import functools
+import tempfile
+
+from dp3t.config import DEFAULT_PARAMETERS
+from dp3t.crypto import get_backend
+from dp3t.encounters import EncounterStore
+from dp3t.memory import build_report
+from dp3t.retention import TimeWheel
+from dp3t.risk import DayCandidate, evaluate_risk
+from dp3t.serialization import (
+    UNLINKABLE_BATCH,
+    UNLINKABLE_STATE,
+    read_bytes,
+    read_items,
+    read_magic,
+    read_optional_int,
+    read_parameters,
+    read_uint,
+    write_bytes,
+    write_items,
+    write_magic,
+    write_optional_int,
+    write_parameters,
+    write_uint,
+)
 
 
 #################################
 ### GLOBAL PROTOCOL CONSTANTS ###
 #################################
 
-#: FPR for CuckooFilter
-CUCKOO_FPR = 2 ** -42
+#: Default FPR for CuckooFilter, see :obj:`dp3t.config.ProtocolParameters`
+CUCKOO_FPR = DEFAULT_PARAMETERS.cuckoo_fpr
+
+#: Number of fingerprints per bucket of the CuckooFilter
+CUCKOO_BUCKET_SIZE = 4
+
+#: Length of a hashed observation (SHA-256 output)
+HASHED_OBSERVATION_LENGTH = 32
+
+#: Number of hashed observations that a :obj:`BatchBuilder` reads back from
+#: its spool at a time
+SPOOL_CHUNK_SIZE = 10000
+
+#: Formats in which a contact tracer can store observations:
+#:  * "hashed": the hashed observation
+#:  * "digest": the 16-byte digest that filter lookups depend on,
+#:    see :func:`dp3t.filters.digest`
+#:  * "probe": the 32-byte probe data of the filter lookups, see
+#:    :func:`dp3t.filters.probe`. Probes are as long as hashed observations,
+#:    they only save the hashing when matching.
+OBSERVATION_FORMATS = ("hashed", "digest", "probe")
 
 
 #########################
@@ -41,15 +80,16 @@ CUCKOO_FPR = 2 ** -42
 #########################
 
 
-def epoch_from_time(time):
+def epoch_from_time(time, parameters=DEFAULT_PARAMETERS):
     """Compute the epoch number given a time
 
     Computes the number of epochs since the UNIX Epoch and uses that as a counter.
 
     Args:
         time (:obj:`datetime`): A date-time instance
+        parameters (:obj:`ProtocolParameters`, optional): The epoch length
     """
-    return int(time.timestamp() // (EPOCH_LENGTH * 60))
+    return int(time.timestamp() // parameters.epoch_seconds)
 
 
 #########################################
@@ -62,14 +102,35 @@ def generate_new_seed():
     return secrets.token_bytes(32)
 
 
-def ephid_from_seed(seed):
+def ephid_from_seed(seed, parameters=DEFAULT_PARAMETERS):
     """Compute the EphID given a seed
 
     Args:
         seed (byte array): A 32-byte seed
+        parameters (:obj:`ProtocolParameters`, optional): The length of EphIDs
+    """
+    raw_bytes = get_backend().sha256(seed)
+    return raw_bytes[: parameters.length_ephid]
+
+
+def ephids_from_seeds(seeds, parameters=DEFAULT_PARAMETERS):
+    """Compute the EphIDs for several seeds at once
+
+    See :func:`ephid_from_seed`. This function uses the bulk operations of the
+    crypto backend.
+
+    Args:
+        seeds ([byte array]): 32-byte seeds
+        parameters (:obj:`ProtocolParameters`, optional): The length of EphIDs
     """
-    raw_bytes = hashlib.sha256(seed).digest()
-    return raw_bytes[:LENGTH_EPHID]
+    length_ephid = parameters.length_ephid
+    return [raw_bytes[:length_ephid] for raw_bytes in get_backend().sha256_many(seeds)]
+
+
+def new_day_ephids(parameters=DEFAULT_PARAMETERS):
+    """Return fresh seeds and the corresponding EphIDs for all epochs of a day"""
+    seeds = [generate_new_seed() for _ in range(parameters.num_epochs_per_day)]
+    return seeds, ephids_from_seeds(seeds, parameters)
 
 
 def hashed_observation_from_ephid(ephid, epoch):
@@ -86,11 +147,11 @@ def hashed_observation_from_ephid(ephid, epoch):
         time (:obj:`datetime`): Time of observation
     """
     epoch_bytes = epoch.to_bytes(4, "big")
-    result = hashlib.sha256(ephid + epoch_bytes).digest()
+    result = get_backend().sha256(ephid + epoch_bytes)
     return result
 
 
-def hashed_observation_from_seed(seed, epoch):
+def hashed_observation_from_seed(seed, epoch, parameters=DEFAULT_PARAMETERS):
     """Compute the hashed observation given a seed and epoch
 
     See :func:`hashed_observation_from_ephid`
@@ -98,16 +159,43 @@ def hashed_observation_from_seed(seed, epoch):
     Args:
         ephid (byte array): The observed EphID
         epoch (:obj:`datetime.datetime`): Time epoch of observation
+        parameters (:obj:`ProtocolParameters`, optional): The length of EphIDs
     """
-    ephid = ephid_from_seed(seed)
+    ephid = ephid_from_seed(seed, parameters)
     return hashed_observation_from_ephid(ephid, epoch)
 
 
+def hashed_observations_from_seeds(seeds, epochs, parameters=DEFAULT_PARAMETERS):
+    """Compute the hashed observations for several seeds and epochs at once
+
+    See :func:`hashed_observation_from_seed`. This function uses the bulk
+    operations of the crypto backend.
+
+    Args:
+        seeds ([byte array]): 32-byte seeds
+        epochs ([int]): For each seed, the corresponding epoch
+        parameters (:obj:`ProtocolParameters`, optional): The length of EphIDs
+    """
+    ephids = ephids_from_seeds(seeds, parameters)
+    return get_backend().sha256_many(
+        ephid + epoch.to_bytes(4, "big") for (ephid, epoch) in zip(ephids, epochs)
+    )
+
+
 #############################################################
 ### TYING CRYPTO FUNCTIONS TOGETHER FOR TRACING/RECORDING ###
 #############################################################
 
 
+def _tuned_filter(hashed_observations, nr_items, parameters):
+    """Return a filter of hashed observations sized by :func:`dp3t.sizing.tune`"""
+    from dp3t import sizing
+
+    return sizing.build_filter(
+        hashed_observations, sizing.tune(nr_items, parameters.cuckoo_fpr)
+    )
+
+
 class TracingDataBatch:
     """
     Simple representation of a batch of keys that is downloaded from
@@ -122,27 +210,439 @@ class TracingDataBatch:
     well-specified version of such a cuckoo filter.
     """
 
-    def __init__(self, tracing_seeds, release_time=None):
+    def __init__(
+        self,
+        tracing_seeds,
+        release_time=None,
+        nr_items=None,
+        parameters=DEFAULT_PARAMETERS,
+        tuned=False,
+    ):
         """Create a published batch of tracing keys
 
         Args:
             tracing_seeds ([(reported_epochs, seeds)]): A list of reported epochs/seeds
                 per infected user
             release_time (optional): Release time of this batch
+            nr_items (int, optional): Total number of reported epochs. Must be
+                given when tracing_seeds is an iterator rather than a list
+            parameters (:obj:`ProtocolParameters`, optional): The length of
+                EphIDs and the false positive rate of the filter.
+                Default: :data:`DEFAULT_PARAMETERS`
+            tuned (bool, optional): Whether to size the filter with
+                :func:`dp3t.sizing.tune`, which makes the batch smaller.
+                Default: False
         """
+        self.parameters = parameters
+        self.release_time = release_time
+
+        if tuned:
+            hashed_observations = [
+                hashed_observation
+                for (epochs, seeds) in tracing_seeds
+                for hashed_observation in hashed_observations_from_seeds(
+                    seeds, epochs, parameters
+                )
+            ]
+            self.infected_observations = _tuned_filter(
+                hashed_observations, len(hashed_observations), parameters
+            )
+            return
+
+        # Load the filter library on first use, short-lived processes that
+        # only need the other functionality do not pay for importing it
+        from cuckoo.filter import CuckooFilter
 
         # Compute size of filter and ensure we have enough capacity
-        nr_items = sum([len(epochs) for (epochs, _) in tracing_seeds])
+        if nr_items is None:
+            nr_items = sum([len(epochs) for (epochs, _) in tracing_seeds])
         capacity = int(nr_items * 1.2)
 
-        self.infected_observations = CuckooFilter(capacity, error_rate=CUCKOO_FPR)
+        self.infected_observations = CuckooFilter(
+            capacity, error_rate=parameters.cuckoo_fpr, bucket_size=CUCKOO_BUCKET_SIZE
+        )
         for (epochs, seeds) in tracing_seeds:
-            for (epoch, seed) in zip(epochs, seeds):
-                self.infected_observations.insert(
-                    hashed_observation_from_seed(seed, epoch)
-                )
+            for hashed_observation in hashed_observations_from_seeds(
+                seeds, epochs, parameters
+            ):
+                self.infected_observations.insert(hashed_observation)
+
+    @classmethod
+    def from_hashed_observations(
+        cls,
+        hashed_observations,
+        release_time=None,
+        parameters=DEFAULT_PARAMETERS,
+        nr_items=None,
+        tuned=False,
+    ):
+        """Create a batch from hashed observations rather than from seeds
+
+        Args:
+            hashed_observations ([byte array]): Hashed observations of infected
+                users, see :func:`hashed_observations_from_seeds`
+            release_time (optional): Release time of this batch
+            parameters (:obj:`ProtocolParameters`, optional): The false
+                positive rate of the filter. Default: :data:`DEFAULT_PARAMETERS`
+            nr_items (int, optional): Number of hashed observations. Must be
+                given when hashed_observations is an iterator rather than a list
+            tuned (bool, optional): Whether to size the filter with
+                :func:`dp3t.sizing.tune`. The hashed observations must then
+                be iterable more than once. Default: False
+        """
+        from cuckoo.filter import CuckooFilter
+
+        batch = cls.__new__(cls)
+        batch.parameters = parameters
+        batch.release_time = release_time
+
+        if nr_items is None:
+            nr_items = len(hashed_observations)
+
+        if tuned:
+            batch.infected_observations = _tuned_filter(
+                hashed_observations, nr_items, parameters
+            )
+            return batch
+
+        batch.infected_observations = CuckooFilter(
+            int(nr_items * 1.2),
+            error_rate=parameters.cuckoo_fpr,
+            bucket_size=CUCKOO_BUCKET_SIZE,
+        )
+        for hashed_observation in hashed_observations:
+            batch.infected_observations.insert(hashed_observation)
+
+        return batch
+
+    def freeze(self):
+        """Replace the filter by a read-only :obj:`dp3t.filters.FrozenCuckooFilter`
+
+        Frozen filters take less memory and are faster to query, see
+        :mod:`dp3t.filters`.
+        """
+        from dp3t.filters import FrozenCuckooFilter
+
+        if not isinstance(self.infected_observations, FrozenCuckooFilter):
+            self.infected_observations = FrozenCuckooFilter.from_filter(
+                self.infected_observations
+            )
+
+    def write(self, f):
+        """Write the batch to the binary file f
+
+        The filter is stored as a :obj:`dp3t.filters.FrozenCuckooFilter`.
+
+        Raises:
+            ValueError: If the batch holds a :obj:`dp3t.filters.FilterUnion`,
+                see :obj:`BatchBuilder`
+        """
+        from dp3t.filters import FilterUnion, FrozenCuckooFilter
+
+        infected_observations = self.infected_observations
+        if isinstance(infected_observations, FilterUnion):
+            raise ValueError("Cannot write a batch that holds a chain of filters")
+        if not isinstance(infected_observations, FrozenCuckooFilter):
+            infected_observations = FrozenCuckooFilter.from_filter(
+                infected_observations
+            )
+
+        write_magic(f, UNLINKABLE_BATCH)
+        write_optional_int(f, self.release_time)
+        infected_observations.write(f)
+
+    @classmethod
+    def read(cls, f, parameters=DEFAULT_PARAMETERS):
+        """Read a batch written by :func:`write` from the binary file f
+
+        The filter of the returned batch is a read-only
+        :obj:`dp3t.filters.FrozenCuckooFilter`.
+
+        Args:
+            f: A binary file
+            parameters (:obj:`ProtocolParameters`, optional): The parameters
+                of the batch. The filter itself is read from the file.
+
+        Raises:
+            ValueError: If f does not hold a batch of this design
+        """
+        from dp3t.filters import FrozenCuckooFilter
+
+        read_magic(f, UNLINKABLE_BATCH)
+
+        batch = cls.__new__(cls)
+        batch.parameters = parameters
+        batch.release_time = read_optional_int(f)
+        batch.infected_observations = FrozenCuckooFilter.read(f)
+        return batch
+
+    def memory_report(self):
+        """Return the memory that the batch holds
+
+        Returns:
+            :obj:`dp3t.memory.MemoryReport`: The deep size of the
+                `filter_tables` of all filters, and the `overhead`
+        """
+        from dp3t.filters import FilterUnion, FrozenCuckooFilter
+
+        infected_observations = self.infected_observations
+        if isinstance(infected_observations, FilterUnion):
+            filters = infected_observations.filters
+        else:
+            filters = [infected_observations]
+
+        tables = [
+            f.table if isinstance(f, FrozenCuckooFilter) else f.buckets for f in filters
+        ]
+        return build_report(self, [("filter_tables", tables)], shared=[self.parameters])
+
+
+class _Spool:
+    """Hashed observations in a temporary file, which can be iterated repeatedly"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._nr_items = 0
+
+    def append(self, hashed_observation):
+        self._file.write(hashed_observation)
+        self._nr_items += 1
+
+    def __len__(self):
+        return self._nr_items
+
+    def __iter__(self):
+        self._file.seek(0)
+        while True:
+            chunk = self._file.read(SPOOL_CHUNK_SIZE * HASHED_OBSERVATION_LENGTH)
+            if not chunk:
+                return
+            for i in range(0, len(chunk), HASHED_OBSERVATION_LENGTH):
+                yield chunk[i : i + HASHED_OBSERVATION_LENGTH]
+
+    def close(self):
+        self._file.close()
+
+
+class BatchBuilder:
+    """Build a :obj:`TracingDataBatch` from a stream of reports
+
+    :obj:`TracingDataBatch` must know the number of reported epochs before it
+    inserts the first one, to size its filter. The builder consumes reports
+    one at a time instead, e.g., from a generator or while parsing a file.
+
+    By default, the builder spools the hashed observations to a temporary
+    file, and :func:`finish` fills a single filter of the right size: the same
+    filter as that of :obj:`TracingDataBatch` for the same reports. Memory use
+    does not depend on the number of reports.
+
+    With ``consolidate=False``, the builder instead fills a growing chain of
+    filters. Every stage holds ``growth`` times more items than the previous
+    one, with half its false positive rate, so that the false positive rate of
+    the chain stays below that of the parameters. Full stages are frozen, see
+    :func:`TracingDataBatch.freeze`. The batch holds a
+    :obj:`dp3t.filters.FilterUnion` of the stages, which phones can match
+    with, but that cannot be written to a batch file.
+    """
+
+    def __init__(
+        self,
+        release_time=None,
+        consolidate=True,
+        initial_capacity=10000,
+        growth=2,
+        parameters=DEFAULT_PARAMETERS,
+        tuned=False,
+    ):
+        """Create an empty builder
+
+        Args:
+            release_time (optional): Release time of the batch
+            consolidate (bool, optional): Whether to finish with a single
+                filter. Default: True
+            initial_capacity (int, optional): Number of items in the first
+                stage of the chain of filters. Default: 10000
+            growth (int, optional): Growth factor of the capacity of the stages
+                of the chain of filters. Default: 2
+            parameters (:obj:`ProtocolParameters`, optional): The length of
+                EphIDs and the false positive rate of the batch.
+                Default: :data:`DEFAULT_PARAMETERS`
+            tuned (bool, optional): Whether to size the single filter with
+                :func:`dp3t.sizing.tune`. Only applies with consolidation.
+                Default: False
+
+        Raises:
+            ValueError: If initial_capacity is not positive, or growth is
+                smaller than 1
+        """
+        if initial_capacity <= 0:
+            raise ValueError("Initial capacity must be positive")
+        if growth < 1:
+            raise ValueError("Growth must be at least 1")
 
         self.release_time = release_time
+        self.consolidate = consolidate
+        self.initial_capacity = initial_capacity
+        self.growth = growth
+        self.parameters = parameters
+        self.tuned = tuned
+        self.nr_items = 0
+
+        if consolidate:
+            self._spool = _Spool()
+        else:
+            # Frozen full stages, and the stage being filled with its capacity
+            self._stages = []
+            self._stage = None
+            self._stage_capacity = 0
+
+    def _new_stage(self):
+        from cuckoo.filter import CuckooFilter
+        from dp3t.filters import FrozenCuckooFilter
+
+        if self._stage is not None:
+            self._stages.append(FrozenCuckooFilter.from_filter(self._stage))
+
+        nr_stages = len(self._stages)
+        self._stage_capacity = self.initial_capacity * self.growth ** nr_stages
+        self._stage = CuckooFilter(
+            int(self._stage_capacity * 1.2),
+            error_rate=self.parameters.cuckoo_fpr / 2 ** (nr_stages + 1),
+            bucket_size=CUCKOO_BUCKET_SIZE,
+        )
+
+    def _insert(self, hashed_observation):
+        from cuckoo.exception import CapacityException
+
+        if self._stage is None or self._stage.size >= self._stage_capacity:
+            self._new_stage()
+
+        try:
+            self._stage.insert(hashed_observation)
+        except CapacityException:
+            # The filter restores its contents when an insertion fails
+            self._new_stage()
+            self._stage.insert(hashed_observation)
+
+    def add(self, epochs, seeds):
+        """Add the report of an infected user
+
+        Args:
+            epochs ([int]): The reported epochs
+            seeds ([byte array]): For each epoch, the corresponding seed
+        """
+        hashed_observations = hashed_observations_from_seeds(
+            seeds, epochs, self.parameters
+        )
+        for hashed_observation in hashed_observations:
+            if self.consolidate:
+                self._spool.append(hashed_observation)
+            else:
+                self._insert(hashed_observation)
+            self.nr_items += 1
+
+    def add_reports(self, tracing_seeds):
+        """Add several reports
+
+        Args:
+            tracing_seeds: An iterable of (reported_epochs, seeds) pairs, see
+                :obj:`TracingDataBatch`
+        """
+        for (epochs, seeds) in tracing_seeds:
+            self.add(epochs, seeds)
+
+    def finish(self):
+        """Return the batch of all added reports
+
+        The builder cannot be used anymore afterwards.
+
+        Returns:
+            :obj:`TracingDataBatch`: The batch. Without consolidation, its
+                filter is a :obj:`dp3t.filters.FilterUnion` if the reports
+                did not fit in a single stage.
+        """
+        from dp3t.filters import FilterUnion, FrozenCuckooFilter
+
+        if self.consolidate:
+            try:
+                return TracingDataBatch.from_hashed_observations(
+                    self._spool,
+                    self.release_time,
+                    self.parameters,
+                    tuned=self.tuned,
+                )
+            finally:
+                self._spool.close()
+
+        if self._stage is None:
+            self._new_stage()
+        stages = self._stages + [FrozenCuckooFilter.from_filter(self._stage)]
+        self._stages = self._stage = None
+
+        batch = TracingDataBatch.__new__(TracingDataBatch)
+        batch.infected_observations = (
+            stages[0] if len(stages) == 1 else FilterUnion(stages)
+        )
+        batch.parameters = self.parameters
+        batch.release_time = self.release_time
+        return batch
+
+
+class _DayState:
+    """The seeds, EphIDs and hashed observations of a single day"""
+
+    __slots__ = ("first_epoch", "seeds", "ephids", "observations")
+
+    def __init__(self, encounter_length=None):
+        # Seeds and EphIDs for consecutive epochs, starting at first_epoch
+        self.first_epoch = None
+        self.seeds = []
+        self.ephids = []
+
+        # A list of observed hashed EphIDs, or the records of the encounters
+        # with keys of encounter_length
+        if encounter_length is None:
+            self.observations = []
+        else:
+            self.observations = EncounterStore(encounter_length)
+
+
+def matching_observations(
+    infected_observations,
+    observations,
+    observation_format="hashed",
+    parameters=DEFAULT_PARAMETERS,
+):
+    """Yield the observations that are (probably) in the filter
+
+    Args:
+        infected_observations: The filter of a :obj:`TracingDataBatch`
+        observations ([bytes]): Observations in the given format
+        observation_format (str, optional): One of :data:`OBSERVATION_FORMATS`.
+            Default: "hashed"
+        parameters (:obj:`ProtocolParameters`, optional): The false positive
+            rate that probes were computed for. Default: :data:`DEFAULT_PARAMETERS`
+    """
+    if observation_format == "hashed":
+        for hashed_observation in observations:
+            if hashed_observation in infected_observations:
+                yield hashed_observation
+        return
+
+    from dp3t import filters
+
+    if observation_format == "digest":
+        for item_digest in observations:
+            if filters.contains_digest(infected_observations, item_digest):
+                yield item_digest
+        return
+
+    fingerprint_size = filters.fingerprint_size(
+        parameters.cuckoo_fpr, CUCKOO_BUCKET_SIZE
+    )
+    yield from filters.matching_probes(
+        infected_observations, observations, fingerprint_size
+    )
 
 
 class ContactTracer:
@@ -159,7 +659,10 @@ class ContactTracer:
 
     Actual implementations will probably take into account extra information
     from the Bluetooth backend to do better distance measurements, and
-    subsequently use this information to do a better risk computation.
+    subsequently use this information to do a better risk computation. With
+    `encounters=True`, the tracer records the number, time span and
+    attenuation of the sightings of every hashed observation, see
+    :mod:`dp3t.encounters`, and weighs matches by them.
 
     A note on internal data representation:
      * All internal times are epoch counters, starting from the start of UNIX
@@ -168,48 +671,275 @@ class ContactTracer:
     All external facing interfaces use datetime.datetime objects.
     """
 
-    def __init__(self, start_time=None):
+    def __init__(
+        self,
+        start_time=None,
+        observation_store=None,
+        observation_format="hashed",
+        pregeneration_pool=None,
+        parameters=DEFAULT_PARAMETERS,
+        encounters=False,
+    ):
         """Create an new App object and initialize
 
         Args:
             start_time (:obj:`datetime.datetime`, optional): Start of the first day
                 The default value is the start of the current day.
-        """
-
-        # Store seeds and EphIDs per epoch
-        self.seeds_per_epoch = {}
-        self.ephids_per_epoch = {}
+            observation_store (:obj:`dp3t.storage.ObservationStore`, optional):
+                Moves observations of past days to disk once they exceed its
+                memory limit. Default: keep all observations in memory
+            observation_format (str, optional): How to store observations, one
+                of :data:`OBSERVATION_FORMATS`. Matching gives the same results
+                for all formats. "digest" halves the size of observations.
+                "probe" keeps their size, but computes the filter hashes once
+                when observing rather than for every batch. Default: "hashed"
+            pregeneration_pool (:obj:`concurrent.futures.Executor`, optional):
+                Prepares the seeds and EphIDs of the next day in the
+                background, so that :func:`next_day` only swaps them in.
+                Default: generate them in :func:`next_day`
+            parameters (:obj:`ProtocolParameters`, optional): The epoch length,
+                retention period, EphID length and filter false positive rate
+                of the tracer. Default: :data:`DEFAULT_PARAMETERS`
+            encounters (bool, optional): Whether to aggregate the sightings of
+                every hashed observation into a record of a
+                :obj:`dp3t.encounters.EncounterStore`. Default: False
 
-        # For each day, a list of observed hashed EphIDs
-        self.observations_per_day = {}
+        Raises:
+            ValueError: If the observation format is unknown, or if encounters
+                are combined with an observation store
+        """
+        if observation_format not in OBSERVATION_FORMATS:
+            raise ValueError("Unknown observation format {}".format(observation_format))
+        if encounters and observation_store is not None:
+            raise ValueError(
+                "Encounter records cannot be moved to an observation store"
+            )
 
         if start_time is None:
             start_time = datetime.datetime.now()
             start_time = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
 
         self.start_of_today = start_time
-
+        self.parameters = parameters
+        self._store = observation_store
+        self.observation_format = observation_format
+        self.encounters = encounters
+
+        # For each retained day, the seeds, EphIDs and hashed observations
+        self._days = TimeWheel(
+            self.today.toordinal(), parameters.retention_period, self._day_factory()
+        )
+
+        self._pool = pregeneration_pool
+        self._next_day = None
         self._create_new_day_ephids()
 
+    def write(self, f):
+        """Save the state of the tracer to the binary file f
+
+        *Warning:* The state contains the seeds and the observations of the
+        user. Store it with the same care as the tracer itself.
+        """
+        write_magic(f, UNLINKABLE_STATE)
+        write_parameters(f, self.parameters)
+        write_bytes(f, self.start_of_today.isoformat().encode("ascii"), 1)
+        write_uint(f, OBSERVATION_FORMATS.index(self.observation_format), 1)
+        write_uint(f, self.encounters, 1)
+
+        days = list(self._days.items())
+        write_uint(f, len(days), 2)
+        for (day, state) in days:
+            write_uint(f, day)
+            write_optional_int(f, state.first_epoch)
+            write_items(f, state.seeds, 32, 2)
+            write_items(f, state.ephids, self.parameters.length_ephid, 2)
+            if self.encounters:
+                state.observations.write(f)
+            else:
+                write_items(f, state.observations, self.observation_length)
+
+    @classmethod
+    def read(cls, f, observation_store=None, pregeneration_pool=None):
+        """Load a tracer saved by :func:`write` from the binary file f
+
+        The observation store and the pregeneration pool are not part of the
+        state. Pass them again to attach them to the loaded tracer, which
+        then moves past days to the store right away.
+
+        Args:
+            f: A binary file
+            observation_store (:obj:`dp3t.storage.ObservationStore`, optional):
+                As for :obj:`ContactTracer`
+            pregeneration_pool (:obj:`concurrent.futures.Executor`, optional):
+                As for :obj:`ContactTracer`
+
+        Raises:
+            ValueError: If f does not hold a tracer state of this design, or
+                if it holds encounters and an observation store is given
+        """
+        read_magic(f, UNLINKABLE_STATE)
+
+        tracer = cls.__new__(cls)
+        tracer._store = None
+        tracer._pool = None
+        tracer._next_day = None
+        tracer.parameters = parameters = read_parameters(f)
+        start_of_today = read_bytes(f, 1).decode("ascii")
+        tracer.start_of_today = datetime.datetime.fromisoformat(start_of_today)
+        tracer.observation_format = OBSERVATION_FORMATS[read_uint(f, 1)]
+        tracer.encounters = bool(read_uint(f, 1))
+        tracer._days = TimeWheel(
+            tracer.today.toordinal(),
+            parameters.retention_period,
+            tracer._day_factory(),
+        )
+
+        for _ in range(read_uint(f, 2)):
+            day = read_uint(f)
+            state = _DayState()
+            state.first_epoch = read_optional_int(f)
+            state.seeds = read_items(f, 32, 2)
+            state.ephids = read_items(f, parameters.length_ephid, 2)
+            if tracer.encounters:
+                state.observations = EncounterStore.read(f, tracer.observation_length)
+            else:
+                state.observations = read_items(f, tracer.observation_length)
+            tracer._days[day] = state
+
+        if tracer.encounters and observation_store is not None:
+            raise ValueError(
+                "Encounter records cannot be moved to an observation store"
+            )
+        tracer._store = observation_store
+        tracer._pool = pregeneration_pool
+        if pregeneration_pool is not None:
+            tracer._next_day = pregeneration_pool.submit(new_day_ephids, parameters)
+        tracer._spill_observations()
+        return tracer
+
+    @property
+    def observation_store(self):
+        """The :obj:`dp3t.storage.ObservationStore` of the tracer, or None"""
+        return self._store
+
+    @property
+    def pregeneration_pool(self):
+        """The executor that prepares the next day in the background, or None"""
+        return self._pool
+
+    def _day_factory(self):
+        """Return a function that creates the state of a new day"""
+        if self.encounters:
+            return functools.partial(_DayState, self.observation_length)
+        return _DayState
+
     @property
     def today(self):
         """The current day (datetime.date)"""
         return self.start_of_today.date()
 
-    def _create_new_day_ephids(self):
-        """Compute a new set of seeds and ephids for a new day"""
+    @property
+    def observation_length(self):
+        """Length in bytes of the stored hashed observations"""
+        if self.observation_format == "hashed":
+            return HASHED_OBSERVATION_LENGTH
+
+        from dp3t import filters
+
+        if self.observation_format == "digest":
+            return filters.DIGEST_LENGTH
+        return filters.PROBE_LENGTH
 
-        # Generate fresh seeds and store them
-        seeds = [generate_new_seed() for _ in range(NUM_EPOCHS_PER_DAY)]
-        ephids = [ephid_from_seed(seed) for seed in seeds]
+    @property
+    def seeds_per_epoch(self):
+        """For each retained epoch, the corresponding seed"""
+        return {
+            state.first_epoch + relative_epoch: seed
+            for (_, state) in self._days.items()
+            for (relative_epoch, seed) in enumerate(state.seeds)
+        }
+
+    @property
+    def ephids_per_epoch(self):
+        """For each retained epoch, the corresponding EphID"""
+        return {
+            state.first_epoch + relative_epoch: ephid
+            for (_, state) in self._days.items()
+            for (relative_epoch, ephid) in enumerate(state.ephids)
+        }
+
+    @property
+    def observations_per_day(self):
+        """For each retained day, a list of observed hashed EphIDs
+
+        Days moved to disk by the observation store hold a
+        :obj:`dp3t.storage.SortedSegment` instead of a list, and tracers that
+        record encounters hold a :obj:`dp3t.encounters.EncounterStore` of
+        the distinct observations. Observations are stored in the observation
+        format of the tracer.
+        """
+        return {
+            datetime.date.fromordinal(day): state.observations
+            for (day, state) in self._days.items()
+        }
 
-        # Convert to epoch numbers
-        first_epoch = epoch_from_time(self.start_of_today)
+    def memory_report(self):
+        """Return the memory that the tracer holds, by component and by day
 
-        # Store seeds and compute EphIDs
-        for relative_epoch in range(0, NUM_EPOCHS_PER_DAY):
-            self.seeds_per_epoch[first_epoch + relative_epoch] = seeds[relative_epoch]
-            self.ephids_per_epoch[first_epoch + relative_epoch] = ephids[relative_epoch]
+        The components are the `observations`, the `seeds_per_epoch`, the
+        `ephids_per_epoch` and the `overhead`. The state of a day holds its
+        seeds, EphIDs and observations.
+
+        Returns:
+            :obj:`dp3t.memory.MemoryReport`: The report
+        """
+        days = list(self._days.items())
+        components = [
+            ("observations", [state.observations for (_, state) in days]),
+            ("seeds_per_epoch", [state.seeds for (_, state) in days]),
+            ("ephids_per_epoch", [state.ephids for (_, state) in days]),
+        ]
+        return build_report(
+            self,
+            components,
+            [(datetime.date.fromordinal(day), state) for (day, state) in days],
+            shared=[self.parameters, self._store, self._pool],
+        )
+
+    def _create_new_day_ephids(self):
+        """Compute a new set of seeds and ephids for a new day"""
+
+        # Generate fresh seeds, or swap in the ones prepared in the background
+        if self._next_day is not None:
+            seeds, ephids = self._next_day.result()
+        else:
+            seeds, ephids = new_day_ephids(self.parameters)
+
+        if self._pool is not None:
+            self._next_day = self._pool.submit(new_day_ephids, self.parameters)
+
+        # Store seeds and EphIDs, starting at the first epoch of the day
+        state = self._days.current
+        state.first_epoch = epoch_from_time(self.start_of_today, self.parameters)
+        state.seeds = seeds
+        state.ephids = ephids
+
+    def _day_state_for_epoch(self, epoch):
+        """Return the state of the retained day that covers epoch, or None"""
+        current = self._days.current
+        num_epochs_per_day = self.parameters.num_epochs_per_day
+        days_back = -((epoch - current.first_epoch) // num_epochs_per_day)
+
+        # Days do not always align with num_epochs_per_day epochs (e.g., when
+        # switching to daylight saving time), so also check neighbouring days.
+        for day in (days_back, days_back - 1, days_back + 1):
+            state = self._days.get(self._days.current_day - day)
+            if state is None or state.first_epoch is None:
+                continue
+            if state.first_epoch <= epoch < state.first_epoch + len(state.seeds):
+                return state
+
+        return None
 
     def next_day(self):
         """Setup seeds and EphIDs for the next day, and do housekeeping"""
@@ -217,26 +947,62 @@ class ContactTracer:
         # Update current day
         self.start_of_today = self.start_of_today + datetime.timedelta(days=1)
 
+        # The encounters of past days no longer change
+        if self.encounters:
+            self._days.current.observations.freeze()
+
+        # Moving to the next day drops the seeds, EphIDs and observations of
+        # the oldest retained day
+        dropped = self._days.advance()
+        if dropped is not None and self._store is not None:
+            self._store.release(dropped.observations)
+
         # Generate new EphIDs for new day
         self._create_new_day_ephids()
 
-        # Remove old observations
-        last_retained_day = self.today - datetime.timedelta(days=RETENTION_PERIOD)
-        old_days = [day for day in self.observations_per_day if day < last_retained_day]
-        for day in old_days:
-            del self.observations_per_day[day]
+        self._spill_observations()
 
-        # Remove old seeds and ephids
-        days_back = datetime.timedelta(days=RETENTION_PERIOD)
-        last_valid_time = self.start_of_today - days_back
-        last_retained_epoch = epoch_from_time(last_valid_time)
+    def _spill_observations(self):
+        """Move past days to the observation store until within its memory limit
 
-        old_epochs = [
-            epoch for epoch in self.seeds_per_epoch if epoch < last_retained_epoch
-        ]
-        for epoch in old_epochs:
-            del self.seeds_per_epoch[epoch]
-            del self.ephids_per_epoch[epoch]
+        Observations of past days no longer change. The oldest days are moved
+        first.
+        """
+        if self._store is None:
+            return
+
+        observation_length = self.observation_length
+        days = list(self._days.items())
+        memory = sum(
+            len(state.observations) * observation_length
+            for (_, state) in days
+            if not self._store.is_spilled(state.observations)
+        )
+
+        for (day, state) in reversed(days):
+            if memory <= self._store.memory_limit:
+                break
+
+            if day == self._days.current_day or not state.observations:
+                continue
+            if self._store.is_spilled(state.observations):
+                continue
+
+            memory -= len(state.observations) * observation_length
+            state.observations = self._store.spill(
+                state.observations, observation_length
+            )
+
+    def release_observations(self):
+        """Delete the files of the observations moved to the observation store
+
+        Call this before dropping a tracer with an observation store. The
+        tracer cannot be used afterwards.
+        """
+        if self._store is None:
+            return
+        for (_, state) in self._days.items():
+            self._store.release(state.observations)
 
     def get_ephid_for_time(self, time):
         """Return the EphID corresponding to the requested time
@@ -248,33 +1014,56 @@ class ContactTracer:
             ValueError: If the requested ephid is unavailable
         """
         # Convert to epoch number
-        epoch = epoch_from_time(time)
+        epoch = epoch_from_time(time, self.parameters)
 
-        if epoch not in self.ephids_per_epoch:
+        state = self._day_state_for_epoch(epoch)
+        if state is None:
             raise ValueError("EphID not available, did you call next_day()?")
 
-        return self.ephids_per_epoch[epoch]
+        return state.ephids[epoch - state.first_epoch]
 
-    def add_observation(self, ephid, time):
+    def add_observation(self, ephid, time, attenuation=None):
         """Add ephID to list of observations. Time must correspond to the current day
 
         Args:
             ephID (byte array): the observed ephID
             time (:obj:`datatime.datetime`): time of observation
+            attenuation (int, optional): Attenuation of the signal in dB. Only
+                tracers that record encounters keep it. Default: unknown
 
         Raises:
-            ValueError: If time does not correspond to the current day
+            ValueError: If time does not correspond to the current day, or if
+                an attenuation is given to a tracer without encounter records
         """
 
-        if self.today not in self.observations_per_day:
-            self.observations_per_day[self.today] = []
-
         if not time.date() == self.today:
             raise ValueError("Observation must correspond to current day")
+        if attenuation is not None and not self.encounters:
+            raise ValueError("Attenuations are only kept with encounter records")
 
-        epoch = epoch_from_time(time)
+        epoch = epoch_from_time(time, self.parameters)
         hashed_observation = hashed_observation_from_ephid(ephid, epoch)
-        self.observations_per_day[self.today].append(hashed_observation)
+        if self.observation_format != "hashed":
+            hashed_observation = self._encode_observation(hashed_observation)
+
+        observations = self._days.current.observations
+        if self.encounters:
+            observations.add(hashed_observation, int(time.timestamp()), attenuation)
+        else:
+            observations.append(hashed_observation)
+
+    def _encode_observation(self, hashed_observation):
+        """Convert a hashed observation to the observation format of the tracer"""
+        from dp3t import filters
+
+        item_digest = filters.digest(hashed_observation)
+        if self.observation_format == "digest":
+            return item_digest
+
+        fingerprint_size = filters.fingerprint_size(
+            self.parameters.cuckoo_fpr, CUCKOO_BUCKET_SIZE
+        )
+        return filters.probe(item_digest, fingerprint_size)
 
     def get_tracing_seeds_for_epochs(self, reported_epochs):
         """Return the seeds corresponding to the requested epochs
@@ -286,10 +1075,11 @@ class ContactTracer:
             ValueError: If a requested epoch is unavailable
         """
         seeds = []
-        try:
-            seeds = [self.seeds_per_epoch[epoch] for epoch in reported_epochs]
-        except KeyError:
-            raise ValueError("A requested epoch is not available")
+        for epoch in reported_epochs:
+            state = self._day_state_for_epoch(epoch)
+            if state is None:
+                raise ValueError("A requested epoch is not available")
+            seeds.append(state.seeds[epoch - state.first_epoch])
 
         return seeds
 
@@ -325,28 +1115,99 @@ class ContactTracer:
                 "Last_contagious_time should be after first_contagious_time"
             )
 
-        start_epoch = epoch_from_time(first_contagious_time)
-        end_epoch = epoch_from_time(last_contagious_time)
+        start_epoch = epoch_from_time(first_contagious_time, self.parameters)
+        end_epoch = epoch_from_time(last_contagious_time, self.parameters)
         reported_epochs = range(start_epoch, end_epoch + 1)
 
         return reported_epochs, self.get_tracing_seeds_for_epochs(reported_epochs)
 
-    def matches_with_batch(self, batch):
+    def matches_with_batch(self, batch, pool=None, weight=None):
         """Check for contact with infected person given a published filter
 
+        Tracers that record encounters count every encounter once, however
+        often it was sighted, unless a weight is given.
+
         Args:
             infected_observations: A (compact) representation of hashed
                 observations belonging to infected persons
+            pool (:obj:`concurrent.futures.ProcessPoolExecutor`, optional):
+                Match ranges of the observations in these worker processes,
+                see :func:`dp3t.parallel.parallel_matches`. Default: match in
+                this process
+            weight (callable, optional): Turns the
+                :obj:`dp3t.encounters.Encounter` of every match into an
+                exposure, e.g., :func:`dp3t.encounters.proximity_weight`.
+                Requires encounter records. Default: count every match once
 
         Returns:
-            int: How many EphIDs of infected persons we saw
+            int: How many EphIDs of infected persons we saw, or the sum of
+                the weights of the matching encounters
+
+        Raises:
+            ValueError: If a weight is given to a tracer without encounter
+                records, or together with a pool
         """
+        if weight is not None and not self.encounters:
+            raise ValueError("Weighted exposure requires encounter records")
+
+        if pool is not None:
+            if weight is not None:
+                raise ValueError("Weighted exposure cannot be matched in a pool")
+
+            from dp3t.parallel import parallel_matches
+
+            return parallel_matches(self, batch, pool)
 
         seen_infected_ephids = 0
 
-        for (_, hashed_observations) in self.observations_per_day.items():
-            for hashed_observation in hashed_observations:
-                if hashed_observation in batch.infected_observations:
+        for (_, state) in self._days.items():
+            for observation in self._matches_on_day(batch, state.observations):
+                if weight is None:
                     seen_infected_ephids += 1
+                else:
+                    seen_infected_ephids += weight(
+                        state.observations.encounter(observation)
+                    )
 
         return seen_infected_ephids
+
+    def _matches_on_day(self, batch, hashed_observations):
+        """Yield once for every infected hashed observation in hashed_observations"""
+        return matching_observations(
+            batch.infected_observations,
+            hashed_observations,
+            self.observation_format,
+            self.parameters,
+        )
+
+    def _day_candidates(self, batch):
+        """Return a :obj:`dp3t.risk.DayCandidate` for every retained day"""
+        return [
+            DayCandidate(
+                datetime.date.fromordinal(day),
+                len(state.observations),
+                functools.partial(self._matches_on_day, batch, state.observations),
+            )
+            for (day, state) in self._days.items()
+        ]
+
+    def evaluate_risk(self, batch, threshold=1, stop_early=True):
+        """Determine whether we had enough contacts with infected persons in batch
+
+        Contrary to :func:`matches_with_batch`, this function evaluates the
+        most recent days first and stops as soon as the number of infected
+        EphIDs seen on a single day reaches `threshold`.
+
+        Args:
+            batch (`obj`:TracingDataBatch): A published filter of hashed
+                observations belonging to infected persons
+            threshold (int, optional): Number of infected EphIDs seen on a single
+                day for the user to be at risk. Default: 1
+            stop_early (bool, optional): Whether to stop as soon as the threshold
+                is reached. Default: True
+
+        Returns:
+            :obj:`dp3t.risk.RiskEvaluation`: The per-day exposures, where days
+                are :obj:`datetime.date` objects
+        """
+        return evaluate_risk(self._day_candidates(batch), threshold, stop_early)
@@ -0,0 +1,387 @@
+"""
+Incremental publication of batches of the unlinkable design.
+
+Rather than publishing a new batch of all reports on every release, the
+server of a delta chain publishes a small filter that holds only the reports
+since its previous release: a delta. Phones keep the chain of filters that
+they downloaded, and match their observations with all of them at once.
+
+Every chain element covers a range of consecutive release numbers. To keep
+the number of filters small, the server compacts the deltas of each past day
+into a single consolidated element. Elements whose last release is older
+than the retention period are dropped by the server and phones alike, as
+phones no longer hold observations that could match them.
+
+A :obj:`ServerChain` lists its current elements in a manifest. A
+:obj:`ClientChain` compares the manifest with the elements it holds, and
+fetches only the elements it misses. A client chain can be passed to
+:func:`ContactTracer.matches_with_batch` and
+:func:`ContactTracer.evaluate_risk` in place of a batch.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from dp3t.config import DEFAULT_PARAMETERS, SECONDS_PER_DAY
+from dp3t.filters import FilterUnion
+from dp3t.protocols.unlinkable import TracingDataBatch, hashed_observations_from_seeds
+from dp3t.serialization import (
+    UNLINKABLE_CHAIN,
+    UNLINKABLE_DELTA,
+    read_magic,
+    read_parameters,
+    read_uint,
+    write_magic,
+    write_parameters,
+    write_uint,
+)
+
+
+class ChainElement:
+    """A filter holding the reports of consecutive releases
+
+    Attributes:
+        first (int): Number of the first release that the element covers
+        last (int): Number of the last release that the element covers
+        release_time (int): Release time of the last release, in seconds
+            since UNIX Epoch
+        batch (:obj:`TracingDataBatch`): The reports, in a frozen filter
+    """
+
+    def __init__(self, first, last, release_time, batch):
+        self.first = first
+        self.last = last
+        self.release_time = release_time
+        self.batch = batch
+
+    @property
+    def key(self):
+        """The (first, last) release numbers, as listed in manifests"""
+        return (self.first, self.last)
+
+    def write(self, f):
+        """Write the element to the binary file f"""
+        write_magic(f, UNLINKABLE_DELTA)
+        write_uint(f, self.first, 8)
+        write_uint(f, self.last, 8)
+        write_uint(f, self.release_time, 8)
+        self.batch.write(f)
+
+    @classmethod
+    def read(cls, f, parameters=DEFAULT_PARAMETERS):
+        """Read an element written by :func:`write` from the binary file f
+
+        Raises:
+            ValueError: If f does not hold a chain element
+        """
+        read_magic(f, UNLINKABLE_DELTA)
+        first = read_uint(f, 8)
+        last = read_uint(f, 8)
+        release_time = read_uint(f, 8)
+        return cls(first, last, release_time, TracingDataBatch.read(f, parameters))
+
+    def __repr__(self):
+        return "<ChainElement releases {}-{}>".format(self.first, self.last)
+
+
+def _is_expired(element, now, parameters):
+    return element.release_time < now - parameters.retention_period * SECONDS_PER_DAY
+
+
+class ServerChain:
+    """The chain of published filters on the server
+
+    The server keeps the hashed observations of every element, to rebuild
+    filters when compacting.
+    """
+
+    def __init__(self, parameters=DEFAULT_PARAMETERS):
+        """Create an empty chain
+
+        Args:
+            parameters (:obj:`ProtocolParameters`, optional): The parameters of
+                the design. Default: :data:`DEFAULT_PARAMETERS`
+        """
+        self.parameters = parameters
+        self.last_release = 0
+
+        # Elements by increasing release numbers, and their hashed observations
+        self._elements = []
+        self._observations = {}
+
+    @property
+    def elements(self):
+        """The current elements, by increasing release numbers"""
+        return list(self._elements)
+
+    def _create_element(self, first, last, release_time, hashed_observations):
+        batch = TracingDataBatch.from_hashed_observations(
+            hashed_observations, release_time, self.parameters
+        )
+        batch.freeze()
+
+        element = ChainElement(first, last, release_time, batch)
+        self._observations[element.key] = hashed_observations
+        return element
+
+    def publish(self, tracing_seeds, release_time):
+        """Publish a delta holding the given reports
+
+        Args:
+            tracing_seeds ([(reported_epochs, seeds)]): The new reports, see
+                :obj:`TracingDataBatch`
+            release_time (int): Release time in seconds since UNIX Epoch. Must
+                not be before the previous release.
+
+        Returns:
+            :obj:`ChainElement`: The delta, or None if there are no reports
+
+        Raises:
+            ValueError: If release_time is before the previous release
+        """
+        if self._elements and release_time < self._elements[-1].release_time:
+            raise ValueError("Releases must be published in order")
+
+        hashed_observations = []
+        for (epochs, seeds) in tracing_seeds:
+            hashed_observations.extend(
+                hashed_observations_from_seeds(seeds, epochs, self.parameters)
+            )
+        if not hashed_observations:
+            return None
+
+        self.last_release += 1
+        element = self._create_element(
+            self.last_release, self.last_release, release_time, hashed_observations
+        )
+        self._elements.append(element)
+        return element
+
+    def compact(self, now):
+        """Merge the elements of each day before the day of now into one
+
+        Args:
+            now (int): The current time in seconds since UNIX Epoch
+
+        Returns:
+            [:obj:`ChainElement`]: The new consolidated elements
+        """
+        today = now // SECONDS_PER_DAY
+
+        # Elements are ordered by release time, so the elements of a day are
+        # consecutive
+        groups = []
+        for element in self._elements:
+            day = element.release_time // SECONDS_PER_DAY
+            if groups and groups[-1][0] == day:
+                groups[-1][1].append(element)
+            else:
+                groups.append((day, [element]))
+
+        compacted = []
+        elements = []
+        for (day, group) in groups:
+            if day >= today or len(group) == 1:
+                elements.extend(group)
+                continue
+
+            hashed_observations = []
+            for element in group:
+                hashed_observations.extend(self._observations.pop(element.key))
+
+            element = self._create_element(
+                group[0].first,
+                group[-1].last,
+                group[-1].release_time,
+                hashed_observations,
+            )
+            elements.append(element)
+            compacted.append(element)
+
+        self._elements = elements
+        return compacted
+
+    def expire(self, now):
+        """Drop the elements released before the retention period
+
+        Args:
+            now (int): The current time in seconds since UNIX Epoch
+
+        Returns:
+            [:obj:`ChainElement`]: The dropped elements
+        """
+        expired = [e for e in self._elements if _is_expired(e, now, self.parameters)]
+        for element in expired:
+            del self._observations[element.key]
+
+        self._elements = self._elements[len(expired) :]
+        return expired
+
+    def manifest(self):
+        """Return the (first, last) release numbers of the current elements"""
+        return [element.key for element in self._elements]
+
+    def element(self, first, last):
+        """Return the current element covering releases first to last
+
+        Raises:
+            KeyError: If there is no such element, e.g., because it was
+                compacted or expired
+        """
+        for element in self._elements:
+            if element.key == (first, last):
+                return element
+        raise KeyError("No chain element for releases {}-{}".format(first, last))
+
+
+def _tiles(key, keys):
+    """Return whether the ranges in keys exactly cover the range key"""
+    keys = sorted(keys)
+    if not keys or keys[0][0] != key[0] or keys[-1][1] != key[1]:
+        return False
+    return all(keys[i][1] + 1 == keys[i + 1][0] for i in range(len(keys) - 1))
+
+
+class ClientChain:
+    """The chain of filters that a phone downloaded
+
+    Pass the chain to :func:`ContactTracer.matches_with_batch` or
+    :func:`ContactTracer.evaluate_risk` to match with all its filters.
+    """
+
+    def __init__(self, parameters=DEFAULT_PARAMETERS, adopt_compacted=True):
+        """Create an empty chain
+
+        Args:
+            parameters (:obj:`ProtocolParameters`, optional): The parameters of
+                the design. Default: :data:`DEFAULT_PARAMETERS`
+            adopt_compacted (bool, optional): Whether to replace held deltas by
+                the consolidated element that the server compacted them into.
+                This costs a download, but later matches probe fewer
+                filters. Default: True
+        """
+        self.parameters = parameters
+        self.adopt_compacted = adopt_compacted
+
+        # Held elements, by (first, last) release numbers
+        self._elements = {}
+
+    @property
+    def elements(self):
+        """The held elements, by increasing release numbers"""
+        return [self._elements[key] for key in sorted(self._elements)]
+
+    @property
+    def last_release(self):
+        """Number of the last release held, 0 if the chain is empty"""
+        return max((last for (_, last) in self._elements), default=0)
+
+    @property
+    def release_time(self):
+        """Release time of the last release held, or None"""
+        return max(
+            (element.release_time for element in self._elements.values()),
+            default=None,
+        )
+
+    @property
+    def infected_observations(self):
+        """A :obj:`dp3t.filters.FilterUnion` of the filters of the chain"""
+        return FilterUnion(
+            element.batch.infected_observations for element in self.elements
+        )
+
+    def sync(self, manifest, fetch):
+        """Bring the chain up to date with the manifest of the server
+
+        Elements that are no longer in the manifest are dropped, and elements
+        that are not yet held are fetched.
+
+        Args:
+            manifest ([(int, int)]): The manifest, see :func:`ServerChain.manifest`
+            fetch (callable): Called with the first and last release numbers of
+                every missing element, returns the :obj:`ChainElement`
+
+        Returns:
+            [:obj:`ChainElement`]: The fetched elements
+
+        Raises:
+            ValueError: If fetch returns a different element than requested
+        """
+        elements = {}
+        fetched = []
+
+        for key in map(tuple, manifest):
+            if key in self._elements:
+                elements[key] = self._elements[key]
+                continue
+
+            covered = [k for k in self._elements if key[0] <= k[0] and k[1] <= key[1]]
+            if not self.adopt_compacted and _tiles(key, covered):
+                for k in covered:
+                    elements[k] = self._elements[k]
+                continue
+
+            element = fetch(*key)
+            if element.key != key:
+                raise ValueError(
+                    "Fetched releases {}-{}, expected {}-{}".format(*element.key, *key)
+                )
+            elements[key] = element
+            fetched.append(element)
+
+        self._elements = elements
+        return fetched
+
+    def expire(self, now):
+        """Drop the elements released before the retention period
+
+        Phones that do not sync for a while can use this to drop old elements.
+
+        Args:
+            now (int): The current time in seconds since UNIX Epoch
+        """
+        for (key, element) in list(self._elements.items()):
+            if _is_expired(element, now, self.parameters):
+                del self._elements[key]
+
+    def write(self, f):
+        """Save the chain to the binary file f"""
+        write_magic(f, UNLINKABLE_CHAIN)
+        write_parameters(f, self.parameters)
+        write_uint(f, self.adopt_compacted, 1)
+
+        elements = self.elements
+        write_uint(f, len(elements))
+        for element in elements:
+            element.write(f)
+
+    @classmethod
+    def read(cls, f):
+        """Load a chain saved by :func:`write` from the binary file f
+
+        Raises:
+            ValueError: If f does not hold a client chain
+        """
+        read_magic(f, UNLINKABLE_CHAIN)
+        chain = cls(read_parameters(f), bool(read_uint(f, 1)))
+
+        for _ in range(read_uint(f)):
+            element = ChainElement.read(f, chain.parameters)
+            chain._elements[element.key] = element
+
+        return chain
@@ -0,0 +1,120 @@
+"""
+Retention-bounded storage of per-day state shared by all DP3T designs.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from dp3t.config import RETENTION_PERIOD
+
+
+class TimeWheel:
+    """Fixed-size ring of per-day slots
+
+    The wheel holds the state of the current day and of the `retention_period`
+    days before it. Days are identified by an integer day number (e.g., the
+    number of days since the UNIX Epoch). Each retained day maps onto a fixed
+    slot, so advancing to the next day overwrites the slot of the day that
+    just dropped out of the retention window. This takes constant time, and
+    the wheel never holds more than `retention_period + 1` slots.
+
+    Slots of days before the wheel was created, or that have been cleared, are
+    empty and are skipped when iterating.
+    """
+
+    def __init__(self, current_day, retention_period=RETENTION_PERIOD, factory=dict):
+        """Create a new time wheel
+
+        Args:
+            current_day (int): Day number of the current day
+            retention_period (int, optional): Number of past days to retain.
+                Default: RETENTION_PERIOD
+            factory (callable, optional): Creates the state of a new day.
+                Default: dict
+        """
+        self.retention_period = retention_period
+        self.current_day = current_day
+        self._factory = factory
+
+        self._slots = [None] * (retention_period + 1)
+        self._slots[self._index(current_day)] = factory()
+
+    def _index(self, day):
+        return day % len(self._slots)
+
+    def _is_retained(self, day):
+        return self.current_day - self.retention_period <= day <= self.current_day
+
+    def advance(self):
+        """Move to the next day, dropping the oldest day
+
+        Returns:
+            The state of the day that dropped out of the window, or None
+        """
+        self.current_day += 1
+
+        index = self._index(self.current_day)
+        dropped = self._slots[index]
+        self._slots[index] = self._factory()
+
+        return dropped
+
+    def clear(self):
+        """Drop the state of all past days, and reset the current day"""
+        self._slots = [None] * len(self._slots)
+        self._slots[self._index(self.current_day)] = self._factory()
+
+    @property
+    def current(self):
+        """The state of the current day"""
+        return self._slots[self._index(self.current_day)]
+
+    def get(self, day, default=None):
+        """Return the state of a day, or default if it is not retained"""
+        if not self._is_retained(day):
+            return default
+
+        state = self._slots[self._index(day)]
+        return default if state is None else state
+
+    def __getitem__(self, day):
+        state = self.get(day)
+        if state is None:
+            raise KeyError(day)
+        return state
+
+    def __setitem__(self, day, state):
+        if not self._is_retained(day):
+            raise KeyError(day)
+        self._slots[self._index(day)] = state
+
+    def __contains__(self, day):
+        return self.get(day) is not None
+
+    def days(self):
+        """Return the retained days that hold state, most recent first"""
+        return [day for (day, _) in self.items()]
+
+    def items(self):
+        """Iterate over (day, state) for retained days, most recent first"""
+        for day in range(self.current_day, self.current_day - len(self._slots), -1):
+            state = self._slots[self._index(day)]
+            if state is not None:
+                yield day, state
+
+    def __len__(self):
+        return sum(1 for state in self._slots if state is not None)
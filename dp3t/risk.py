@@ -0,0 +1,130 @@
+"""
+Threshold-based risk evaluation shared by all DP3T designs.
+
+Counting every match with :func:`ContactTracer.matches_with_batch` requires
+probing every stored observation against every published key. Many callers
+only need to know whether a user is at risk, i.e., whether the number of
+matches on a single day reaches a threshold. The functions in this module
+evaluate the most recent days, which are the most likely to match, first,
+and stop as soon as the threshold is reached.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import collections
+
+#: Exposure on a single day: the day (in the protocol's representation), the
+#: number of stored observations, and the number of matches found
+DayExposure = collections.namedtuple(
+    "DayExposure", ["day", "nr_observations", "nr_matches"]
+)
+
+#: A day that can be evaluated: the day, the number of stored observations,
+#: and a function that returns an iterator yielding once for every match
+DayCandidate = collections.namedtuple(
+    "DayCandidate", ["day", "nr_observations", "matches"]
+)
+
+
+class RiskEvaluation:
+    """Result of evaluating the risk of a contact tracer against a batch
+
+    Attributes:
+        threshold (int): Number of matches on a single day to be at risk
+        at_risk (bool): Whether the threshold was reached on some day
+        exposures ([DayExposure]): The evaluated days, in evaluation order.
+            When stopping early, the last day has exactly `threshold` matches.
+        complete (bool): Whether all days have been evaluated completely
+    """
+
+    def __init__(self, threshold, exposures, at_risk, complete):
+        self.threshold = threshold
+        self.exposures = exposures
+        self.at_risk = at_risk
+        self.complete = complete
+
+    @property
+    def nr_matches(self):
+        """Number of matches found in the evaluated days"""
+        return sum(exposure.nr_matches for exposure in self.exposures)
+
+    def __repr__(self):
+        return (
+            "<RiskEvaluation: at_risk={}, threshold={}, days={}, complete={}>".format(
+                self.at_risk, self.threshold, len(self.exposures), self.complete
+            )
+        )
+
+
+def order_by_likelihood(candidates):
+    """Order days such that the likeliest days to match come first
+
+    Days without observations cannot match and are dropped. The remaining days
+    are ordered by recency, most recent first, as infected users report their
+    most recent days. The number of observations does not affect the order.
+
+    Args:
+        candidates ([DayCandidate]): The days that can be evaluated
+
+    Returns:
+        [DayCandidate]: The days to evaluate, likeliest first
+    """
+    candidates = [c for c in candidates if c.nr_observations > 0]
+    return sorted(candidates, key=lambda c: c.day, reverse=True)
+
+
+def evaluate_risk(candidates, threshold=1, stop_early=True):
+    """Evaluate days until the number of matches on a day reaches threshold
+
+    Args:
+        candidates ([DayCandidate]): The days that can be evaluated
+        threshold (int, optional): Number of matches on a single day for a
+            user to be at risk. Default: 1
+        stop_early (bool, optional): Whether to stop as soon as the threshold
+            is reached. If False, all days are evaluated to obtain complete
+            per-day exposures. Default: True
+
+    Returns:
+        :obj:`RiskEvaluation`: The result of the evaluation
+
+    Raises:
+        ValueError: If the threshold is smaller than 1
+    """
+    if threshold < 1:
+        raise ValueError("Threshold must be at least 1")
+
+    exposures = []
+    at_risk = False
+
+    for candidate in order_by_likelihood(candidates):
+        nr_matches = 0
+        for _ in candidate.matches():
+            nr_matches += 1
+            if stop_early and nr_matches >= threshold:
+                break
+
+        exposures.append(
+            DayExposure(candidate.day, candidate.nr_observations, nr_matches)
+        )
+
+        if nr_matches >= threshold:
+            at_risk = True
+            if stop_early:
+                return RiskEvaluation(threshold, exposures, at_risk, complete=False)
+
+    return RiskEvaluation(threshold, exposures, at_risk, complete=True)
@@ -0,0 +1,146 @@
+"""
+Helpers for the binary file formats of batches and tracer states.
+
+All files start with an 8-byte magic string that identifies the kind of file
+and its version. Integers are stored in big-endian order.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import struct
+
+from dp3t.config import ProtocolParameters
+
+#: Magic strings of the supported file kinds
+LOWCOST_BATCH = b"DP3TLCB\x01"
+LOWCOST_STATE = b"DP3TLCS\x03"
+UNLINKABLE_BATCH = b"DP3TULB\x01"
+UNLINKABLE_STATE = b"DP3TULS\x03"
+LOWCOST_VECTORS = b"DP3TLCV\x01"
+UNLINKABLE_VECTORS = b"DP3TULV\x01"
+UNLINKABLE_DELTA = b"DP3TULD\x01"
+UNLINKABLE_CHAIN = b"DP3TULC\x01"
+BATCH_LEDGER = b"DP3TBLG\x01"
+BATCH_FEED = b"DP3TBFD\x01"
+
+_UINT = {1: struct.Struct(">B"), 2: struct.Struct(">H"), 4: struct.Struct(">I")}
+_UINT[8] = struct.Struct(">Q")
+_INT64 = struct.Struct(">q")
+_DOUBLE = struct.Struct(">d")
+
+
+def write_magic(f, magic):
+    f.write(magic)
+
+
+def read_magic(f, magic):
+    """Read the magic string, and check that it is the expected one
+
+    Raises:
+        ValueError: If the file is not of the expected kind or version
+    """
+    found = f.read(len(magic))
+    if found != magic:
+        raise ValueError(
+            "Unexpected file kind: expected {!r}, found {!r}".format(magic, found)
+        )
+
+
+def read_exactly(f, length):
+    """Read exactly length bytes
+
+    Raises:
+        ValueError: If the file ends before
+    """
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("Unexpected end of file")
+    return data
+
+
+def write_uint(f, value, size=4):
+    f.write(_UINT[size].pack(value))
+
+
+def read_uint(f, size=4):
+    return _UINT[size].unpack(read_exactly(f, size))[0]
+
+
+def write_optional_int(f, value):
+    """Write an optional signed 64-bit integer"""
+    write_uint(f, value is not None, 1)
+    f.write(_INT64.pack(value or 0))
+
+
+def read_optional_int(f):
+    present = read_uint(f, 1)
+    value = _INT64.unpack(read_exactly(f, _INT64.size))[0]
+    return value if present else None
+
+
+def write_bytes(f, data, size=4):
+    """Write data, preceded by its length"""
+    write_uint(f, len(data), size)
+    f.write(data)
+
+
+def read_bytes(f, size=4):
+    return read_exactly(f, read_uint(f, size))
+
+
+def write_items(f, items, item_length, size=4):
+    """Write a list of byte strings of length item_length, preceded by their number
+
+    Raises:
+        ValueError: If an item does not have length item_length
+    """
+    if any(len(item) != item_length for item in items):
+        raise ValueError("All items must be {} bytes long".format(item_length))
+    write_uint(f, len(items), size)
+    f.write(b"".join(items))
+
+
+def read_items(f, item_length, size=4):
+    nr_items = read_uint(f, size)
+    data = read_exactly(f, nr_items * item_length)
+    return [data[i : i + item_length] for i in range(0, len(data), item_length)]
+
+
+def write_parameters(f, parameters):
+    """Write a :obj:`dp3t.config.ProtocolParameters`"""
+    write_uint(f, parameters.epoch_length, 2)
+    write_uint(f, parameters.retention_period, 2)
+    write_uint(f, parameters.length_ephid, 1)
+    write_uint(f, parameters.seconds_per_batch)
+    f.write(_DOUBLE.pack(parameters.cuckoo_fpr))
+
+
+def read_parameters(f):
+    """Read parameters written by :func:`write_parameters`
+
+    Raises:
+        ValueError: If the parameters are invalid
+    """
+    epoch_length = read_uint(f, 2)
+    retention_period = read_uint(f, 2)
+    length_ephid = read_uint(f, 1)
+    seconds_per_batch = read_uint(f)
+    cuckoo_fpr = _DOUBLE.unpack(read_exactly(f, _DOUBLE.size))[0]
+    return ProtocolParameters(
+        epoch_length, retention_period, length_ephid, seconds_per_batch, cuckoo_fpr
+    )
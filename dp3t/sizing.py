@@ -0,0 +1,211 @@
+"""
+Sizing of the cuckoo filters of published batches.
+
+:obj:`dp3t.protocols.unlinkable.TracingDataBatch` gives its filter 1.2 buckets
+of 4 slots per item, so it is about 20% full. Every slot costs a fingerprint
+in the published batch, padded to whole bytes, so most of the download is
+empty slots. :func:`tune` instead picks the bucket size and number of buckets
+that minimize the serialized size of a filter for a given number of items and
+false positive rate, while staying below a load factor at which insertions
+reliably succeed. Batches use it when created with ``tuned=True``.
+
+The number of buckets of a tuned filter is a power of two. The filter library
+computes the alternative bucket of a fingerprint as ``(index ^ hash) %
+capacity``. Unless the capacity is a power of two, moving a fingerprint back
+and forth between its buckets does not return it to where it came from, so
+fingerprints that get kicked out during insertion can end up in a bucket where
+lookups do not find them. Nearly empty filters rarely kick fingerprints, but
+full ones do.
+
+Fingerprints are as long as the filter library makes them for the target
+false positive rate, which is a bound for a full filter. :func:`build_filter`
+guarantees that all items are inserted: if an insertion fails anyway, it
+doubles the number of buckets and starts over.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from collections import namedtuple
+
+from dp3t.filters import fingerprint_size as library_fingerprint_size
+
+#: Highest load factor at which insertions into a filter with the given bucket
+#: size reliably succeed. Cuckoo filters reach about 84%, 95% and 98% with 2,
+#: 4 and 8 slots per bucket, these values leave some margin.
+MAX_LOAD_FACTORS = {2: 0.8, 4: 0.9, 8: 0.95}
+
+#: Bucket sizes that :func:`tune` considers
+BUCKET_SIZES = tuple(sorted(MAX_LOAD_FACTORS))
+
+#: Bucket size of the filters of :obj:`TracingDataBatch`. Phones compute the
+#: probe data of their observations for fingerprints of the matching length.
+DEFAULT_BUCKET_SIZE = 4
+
+#: Length of the header of a serialized :obj:`dp3t.filters.FrozenCuckooFilter`
+FILTER_HEADER_LENGTH = 18
+
+
+class FilterSizing(
+    namedtuple("FilterSizing", ["capacity", "bucket_size", "fingerprint_size"])
+):
+    """Dimensions of a cuckoo filter
+
+    Attributes:
+        capacity (int): Number of buckets
+        bucket_size (int): Number of fingerprints per bucket
+        fingerprint_size (int): Length of fingerprints in bits
+    """
+
+    __slots__ = ()
+
+    @property
+    def slots(self):
+        """Number of fingerprints that the filter can hold"""
+        return self.capacity * self.bucket_size
+
+    @property
+    def serialized_bytes(self):
+        """Size of the filter when written as a :obj:`FrozenCuckooFilter`"""
+        fingerprint_length = (self.fingerprint_size + 7) // 8
+        return FILTER_HEADER_LENGTH + self.slots * fingerprint_length
+
+    @property
+    def error_rate(self):
+        """The error rate for which the filter library picks this fingerprint size"""
+        return library_error_rate(self.fingerprint_size, self.bucket_size)
+
+    def load_factor(self, nr_items):
+        """Fraction of the slots that nr_items items fill"""
+        return nr_items / self.slots
+
+    def false_positive_rate(self, nr_items):
+        """Expected false positive rate of the filter holding nr_items items
+
+        A lookup compares the fingerprint of the item with the occupied slots
+        of two buckets.
+        """
+        occupied = 2 * self.bucket_size * self.load_factor(nr_items)
+        return 1 - (1 - 2.0 ** -self.fingerprint_size) ** occupied
+
+
+def library_error_rate(fingerprint_size, bucket_size):
+    """Return an error rate for which the filter library uses fingerprint_size bits
+
+    See :func:`dp3t.filters.fingerprint_size`.
+    """
+    error_rate = 2.0 * bucket_size / 2 ** fingerprint_size
+    # Guard against rounding up in the library's logarithms
+    while library_fingerprint_size(error_rate, bucket_size) > fingerprint_size:
+        error_rate *= 1 + 2 ** -20
+    return error_rate
+
+
+def default_sizing(nr_items, error_rate):
+    """Return the sizing that :obj:`TracingDataBatch` uses for nr_items items"""
+    return FilterSizing(
+        int(nr_items * 1.2),
+        DEFAULT_BUCKET_SIZE,
+        library_fingerprint_size(error_rate, DEFAULT_BUCKET_SIZE),
+    )
+
+
+def tune(nr_items, error_rate, bucket_sizes=BUCKET_SIZES):
+    """Return the sizing of the smallest filter for nr_items items
+
+    Among filters of equal size, prefer the one whose fingerprints have the
+    length that phones expect, see :data:`DEFAULT_BUCKET_SIZE`, and then the
+    one with the smallest buckets, which are the fastest to query.
+
+    Args:
+        nr_items (int): Number of items to insert
+        error_rate (float): Bound on the false positive rate
+        bucket_sizes ([int], optional): Bucket sizes to consider, see
+            :data:`MAX_LOAD_FACTORS`. Default: :data:`BUCKET_SIZES`
+
+    Returns:
+        :obj:`FilterSizing`: The sizing
+
+    Raises:
+        ValueError: If nr_items is negative, error_rate is not strictly
+            between 0 and 1, or a bucket size is not supported
+    """
+    if nr_items < 0:
+        raise ValueError("Number of items must not be negative")
+    if not 0 < error_rate < 1:
+        raise ValueError("Error rate must be between 0 and 1")
+    unsupported = sorted(set(bucket_sizes) - set(MAX_LOAD_FACTORS))
+    if unsupported or not bucket_sizes:
+        raise ValueError("Unsupported bucket sizes: {}".format(unsupported))
+
+    candidates = []
+    for bucket_size in bucket_sizes:
+        max_items = MAX_LOAD_FACTORS[bucket_size] * bucket_size
+        capacity = 1
+        while capacity * max_items < nr_items:
+            capacity *= 2
+
+        candidates.append(
+            FilterSizing(
+                capacity, bucket_size, library_fingerprint_size(error_rate, bucket_size)
+            )
+        )
+
+    expected_size = library_fingerprint_size(error_rate, DEFAULT_BUCKET_SIZE)
+    return min(
+        candidates,
+        key=lambda sizing: (
+            sizing.serialized_bytes,
+            sizing.fingerprint_size != expected_size,
+            sizing.bucket_size,
+        ),
+    )
+
+
+def new_filter(sizing):
+    """Return an empty :obj:`cuckoo.filter.CuckooFilter` with the given sizing"""
+    from cuckoo.filter import CuckooFilter
+
+    return CuckooFilter(
+        sizing.capacity, error_rate=sizing.error_rate, bucket_size=sizing.bucket_size
+    )
+
+
+def build_filter(items, sizing):
+    """Insert items into a new filter with the given sizing
+
+    If an insertion fails, the number of buckets is doubled and all items are
+    inserted again, so the returned filter can be larger than sizing.
+
+    Args:
+        items ([bytes]): The items. Must be iterable more than once, e.g., a
+            list rather than an iterator
+        sizing (:obj:`FilterSizing`): The sizing to start from
+
+    Returns:
+        :obj:`cuckoo.filter.CuckooFilter`: A filter holding all items
+    """
+    from cuckoo.exception import CapacityException
+
+    while True:
+        cuckoo_filter = new_filter(sizing)
+        try:
+            for item in items:
+                cuckoo_filter.insert(item)
+            return cuckoo_filter
+        except CapacityException:
+            sizing = sizing._replace(capacity=2 * sizing.capacity)
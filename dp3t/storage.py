@@ -0,0 +1,164 @@
+"""
+Storage of observations that is bounded in memory.
+
+A contact tracer keeps the observations of `RETENTION_PERIOD` days. The
+observations of past days no longer change, so an :obj:`ObservationStore`
+can move them out of memory: it writes them, sorted, to a segment file that
+is read back through mmap. A :obj:`SortedSegment` supports iteration and fast
+membership tests without loading the file, so matching streams over it.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import bisect
+import itertools
+import mmap
+import os
+import shutil
+import tempfile
+
+
+class SortedSegment:
+    """Sorted, fixed-length records in a file that is read through mmap
+
+    Segments behave like read-only sequences of byte strings.
+    """
+
+    def __init__(self, path, record_length):
+        """Open an existing segment file
+
+        Args:
+            path (str): The segment file
+            record_length (int): Length of each record in bytes
+        """
+        self.path = path
+        self.record_length = record_length
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size % record_length != 0:
+                raise ValueError("Segment file does not hold whole records")
+            # Empty files cannot be mapped
+            if size:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = b""
+
+        self._nr_records = size // record_length
+
+    @classmethod
+    def create(cls, path, records, record_length):
+        """Sort records, write them to a new segment file, and open it
+
+        Raises:
+            ValueError: If a record does not have length record_length
+        """
+        records = sorted(records)
+        if any(len(record) != record_length for record in records):
+            raise ValueError("All records must be {} bytes long".format(record_length))
+
+        with open(path, "wb") as f:
+            f.write(b"".join(records))
+
+        return cls(path, record_length)
+
+    def __len__(self):
+        return self._nr_records
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < self._nr_records:
+            raise IndexError("Segment index out of range")
+        offset = idx * self.record_length
+        return self._data[offset : offset + self.record_length]
+
+    def __iter__(self):
+        record_length = self.record_length
+        for offset in range(0, self._nr_records * record_length, record_length):
+            yield self._data[offset : offset + record_length]
+
+    def __contains__(self, record):
+        idx = bisect.bisect_left(self, record)
+        return idx < self._nr_records and self[idx] == record
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def remove(self):
+        """Close the segment and delete its file"""
+        self.close()
+        os.remove(self.path)
+
+
+class ObservationStore:
+    """Moves observations of past days to disk to bound their memory use
+
+    Contact tracers that are given a store check the memory limit when moving
+    to the next day and after processing a batch. The observations of the
+    current day always stay in memory, so they can exceed the limit.
+    """
+
+    def __init__(self, memory_limit, directory=None):
+        """Create a new store
+
+        Args:
+            memory_limit (int): Number of bytes of observations of past days
+                to keep in memory. Use 0 to move all past days to disk.
+            directory (str, optional): Directory for the segment files.
+                Default: a new temporary directory, removed by :func:`close`
+        """
+        self.memory_limit = memory_limit
+
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="dp3t-observations-")
+        self.directory = directory
+
+        self._segment_ids = itertools.count()
+
+    @staticmethod
+    def is_spilled(records):
+        """Return whether records are stored on disk"""
+        return isinstance(records, SortedSegment)
+
+    def spill(self, records, record_length):
+        """Write records to a new segment file
+
+        Returns:
+            :obj:`SortedSegment`: The records, in sorted order
+        """
+        path = os.path.join(
+            self.directory, "segment-{}.bin".format(next(self._segment_ids))
+        )
+        return SortedSegment.create(path, records, record_length)
+
+    def release(self, records):
+        """Delete the segment file of records that are no longer needed"""
+        if self.is_spilled(records):
+            records.remove()
+
+    def close(self):
+        """Remove the segment directory, if the store created it"""
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,103 @@
+"""
+Test vectors of the DP3T designs.
+
+Other implementations can use these vectors to check that they compute the
+same keys, EphIDs and hashed observations as this reference implementation.
+"""
+
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import sys
+from datetime import datetime, timezone
+
+#: Initial day key of the low-cost design
+KEY0 = bytes.fromhex("0000000000000000000000000000000000000000000000000000000000000000")
+
+#: Seeds of the unlinkable design
+SEED0 = bytes.fromhex(
+    "0000000000000000000000000000000000000000000000000000000000000000"
+)
+SEED1 = bytes.fromhex(
+    "eaa2054637009757b9988b28998209d253eede69345f835bb91b3b333108d229"
+)
+
+#: Observation times of the unlinkable design
+TIME0 = datetime(2020, 4, 10, hour=7, minute=15, tzinfo=timezone.utc)
+TIME1 = datetime(2020, 4, 15, hour=14, minute=32, tzinfo=timezone.utc)
+TIME2 = datetime(2020, 4, 16, hour=14, minute=32, tzinfo=timezone.utc)
+
+
+def print_lowcost_vectors(file=None):
+    """Print test vectors of keys and generated EphIDs of the low-cost design"""
+    from dp3t.protocols.lowcost import next_day_key, generate_ephids_for_day
+
+    file = file or sys.stdout
+
+    print("## Test vectors of keys and generated EphIDs ##", file=file)
+    print("   WARNING: shuffling is disabled to obtain stable test vectors", file=file)
+    print(
+        "            implementations should broadcast the EphIDS in random order.\n",
+        file=file,
+    )
+    key = KEY0
+    for i in range(3):
+        print("  * Key: SK_[t + {}] = {}".format(i, key.hex()), file=file)
+        ephids = generate_ephids_for_day(key, shuffle=False)
+        for j in [0, 1, 2, 95]:
+            print("    - ephid[{}] = {}".format(j, ephids[j].hex()), file=file)
+        key = next_day_key(key)
+
+
+def print_unlinkable_vectors(file=None):
+    """Print test vectors of EphIDs, epochs and hashed observations of the
+    unlinkable design"""
+    from dp3t.protocols.unlinkable import (
+        ephid_from_seed,
+        epoch_from_time,
+        hashed_observation_from_ephid,
+    )
+
+    file = file or sys.stdout
+
+    print("## Test vectors computing EphID given a seed ##", file=file)
+    for seed in [SEED0, SEED1]:
+        ephid = ephid_from_seed(seed)
+
+        print(" - Seed:", seed.hex(), file=file)
+        print(" - EphID:", ephid.hex(), file=file)
+        print(file=file)
+
+    print("\n## Test vectors computing epoch number ##", file=file)
+    for time in [TIME0, TIME1, TIME2]:
+        print(" - Time:", time.isoformat(" "), file=file)
+        print(" - Epoch Number:", epoch_from_time(time), file=file)
+        print(file=file)
+
+    print("\n## Test vector hashed observed EphIDs ##", file=file)
+    ephid = ephid_from_seed(SEED1)
+    for time in [TIME0, TIME1, TIME2]:
+        epoch = epoch_from_time(time)
+        print(" - EphID:", ephid.hex(), file=file)
+        print(" - Time:", time.isoformat(" "), file=file)
+        print(" - Epoch:", epoch, file=file)
+        print(
+            " - Hashed observation:",
+            hashed_observation_from_ephid(ephid, epoch).hex(),
+            file=file,
+        )
+        print(file=file)
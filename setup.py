@@ -11,7 +11,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/dp-3t/dp3t-python-reference",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Programming Language :: Python :: 3",
@@ -20,5 +20,10 @@ setuptools.setup(
     ],
     python_requires=">=3.6",
     install_requires=["pycryptodomex", "scalable-cuckoo-filter"],
-    extras_require={"dev": ["black", "flake8", "pre-commit"], "test": ["pytest"]},
+    extras_require={
+        "dev": ["black", "flake8", "pre-commit"],
+        "test": ["pytest"],
+        "openssl": ["cryptography"],
+    },
+    entry_points={"console_scripts": ["dp3t=dp3t.cli:main"]},
 )
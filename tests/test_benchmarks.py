@@ -0,0 +1,255 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+from pathlib import Path
+import subprocess
+import sys
+import types
+
+import pytest
+
+from dp3t.config import SECONDS_PER_DAY
+from dp3t.protocols import lowcost
+
+from benchmarks import costmodel, harness, replay
+
+ROOT = Path(__file__).parent.parent
+
+
+def run_benchmarks(*args):
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks"] + list(args),
+        cwd=ROOT,
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+
+
+def test_run_and_compare(tmp_path):
+    results_file = str(tmp_path / "results.json")
+    run_benchmarks(
+        "run", "--quick", "--repeat", "1", "*.ephid_from_seed", "-o", results_file
+    )
+
+    with open(results_file) as f:
+        results = json.load(f)
+    assert [r["name"] for r in results["results"]] == ["unlinkable.ephid_from_seed"]
+
+    output = run_benchmarks("compare", results_file, results_file)
+    assert "unlinkable.ephid_from_seed" in output
+    assert "same" in output
+
+
+def test_deferred_grid_values():
+    calls = []
+
+    def values():
+        calls.append(None)
+        return [1, 2]
+
+    bench = harness.Benchmark("deferred", None, {"value": values, "other": [3]})
+    assert calls == []
+    assert bench.cases(quick=True) == [{"other": 3, "value": 1}]
+    assert len(bench.cases()) == 2
+
+
+def test_sweep(tmp_path):
+    results_file = str(tmp_path / "sweep.json")
+    output = run_benchmarks(
+        "sweep",
+        "unlinkable",
+        "--set",
+        "epoch_length=15,30",
+        "--observations-per-day",
+        "10",
+        "--infected",
+        "1",
+        "--repeat",
+        "1",
+        "-o",
+        results_file,
+    )
+    assert "batch_bytes" in output
+
+    with open(results_file) as f:
+        results = json.load(f)
+    assert [case["params"] for case in results["cases"]] == [
+        {"epoch_length": 15},
+        {"epoch_length": 30},
+    ]
+
+    # Longer epochs mean fewer reported epochs, and a smaller batch
+    (short, long) = [case["metrics"] for case in results["cases"]]
+    assert long["batch_bytes"] < short["batch_bytes"]
+
+
+def test_sizing(tmp_path):
+    results_file = str(tmp_path / "sizing.json")
+    output = run_benchmarks(
+        "sizing",
+        "--items",
+        "500",
+        "--fpr",
+        "0.01",
+        "--queries",
+        "1000",
+        "--repeat",
+        "1",
+        "-o",
+        results_file,
+    )
+    assert "observed_fpr" in output
+
+    with open(results_file) as f:
+        results = json.load(f)
+    (default, tuned) = results["cases"]
+    assert (default["strategy"], tuned["strategy"]) == ("default", "tuned")
+    assert tuned["metrics"]["false_negatives"] == 0
+    assert tuned["metrics"]["serialized_bytes"] < default["metrics"]["serialized_bytes"]
+
+
+@pytest.mark.parametrize("csv", [False, True])
+def test_replay(tmp_path, csv):
+    trace_file = str(tmp_path / "trace")
+    results_file = str(tmp_path / "replay.json")
+    options = ["--csv"] if csv else []
+    run_benchmarks(
+        "trace",
+        trace_file,
+        "--receivers",
+        "3",
+        "--observations-per-day",
+        "100",
+        "--days",
+        "2",
+        *options
+    )
+
+    with open(trace_file, "rb") as f:
+        records = list(replay.read_trace(f))
+    assert len(records) == 200
+    assert [timestamp for (_, _, timestamp) in records] == sorted(
+        timestamp for (_, _, timestamp) in records
+    )
+
+    output = run_benchmarks("replay", "unlinkable", trace_file, "-o", results_file)
+    assert "latency_p99" in output
+
+    with open(results_file) as f:
+        metrics = json.load(f)["metrics"]
+    assert metrics["observations"] == 200
+    assert metrics["rejected"] == 0
+    assert metrics["receivers"] == 3
+
+
+def test_replay_rejects_earlier_days():
+    ephid = bytes(16)
+    day = 18377 * SECONDS_PER_DAY
+    records = [(0, ephid, day + 10), (0, ephid, day + SECONDS_PER_DAY), (0, ephid, day)]
+
+    metrics, tracers = replay.replay(records, lowcost)
+    assert (metrics["observations"], metrics["rejected"]) == (2, 1)
+    assert tracers[0].start_of_today == day + SECONDS_PER_DAY
+
+
+def test_latency_histogram():
+    histogram = replay.LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+
+    for i in range(1, 1001):
+        histogram.add(i * 1e-6)
+    assert histogram.total == 1000
+    assert histogram.max == 1e-3
+    assert 500e-6 <= histogram.percentile(0.5) <= 1.02 * 501e-6
+    assert 990e-6 <= histogram.percentile(0.99) <= 1.02 * 991e-6
+    assert histogram.percentile(1.0) == 1e-3
+
+    histogram.add(1e-9)
+    histogram.add(1e3)
+    assert histogram.percentile(0.0) == histogram.smallest
+    assert histogram.max == 1e3
+
+
+class NoopTracer:
+    def __init__(self, start_time):
+        pass
+
+    def next_day(self):
+        pass
+
+    def add_observation(self, ephid, time):
+        pass
+
+
+def test_replay_memory_does_not_grow_with_the_trace():
+    protocol = types.SimpleNamespace(ContactTracer=NoopTracer)
+    day = 18377 * SECONDS_PER_DAY
+
+    def records(nr_records):
+        ephid = bytes(16)
+        return ((0, ephid, day + i % SECONDS_PER_DAY) for i in range(nr_records))
+
+    (short, _) = replay.replay(records(1000), protocol, trace_memory=True)
+    (long, _) = replay.replay(records(100000), protocol, trace_memory=True)
+    assert long["observations"] == 100000
+    assert long["memory_growth"] < short["memory_growth"] + 10000
+
+
+def test_costmodel(tmp_path):
+    results_file = str(tmp_path / "costmodel.json")
+    output = run_benchmarks(
+        "costmodel",
+        "--infected",
+        "1,2",
+        "--observations-per-day",
+        "10,20",
+        "--contagious-days",
+        "1",
+        "--repeat",
+        "1",
+        "-o",
+        results_file,
+    )
+    assert "## Projection" in output
+
+    with open(results_file) as f:
+        results = json.load(f)
+    assert len(results["cases"]) == 8
+    assert sorted(results["model"]) == ["lowcost", "unlinkable"]
+
+    # Every infected user adds a key to low-cost batches
+    batch_bytes = results["model"]["lowcost"]["batch_bytes"]
+    assert batch_bytes["infected"] == pytest.approx(40)
+
+
+def test_fit_linear():
+    points = [
+        ({"infected": n, "observations_per_day": d}, 3 + 2 * n + 0.5 * d)
+        for n in (1, 2, 5)
+        for d in (10, 30)
+    ]
+    coefficients = costmodel.fit_linear(points)
+    assert coefficients["fixed"] == pytest.approx(3)
+    assert coefficients["infected"] == pytest.approx(2)
+    assert coefficients["observations_per_day"] == pytest.approx(0.5)
+
+    # A variable with a single value is part of the fixed cost
+    coefficients = costmodel.fit_linear([p for p in points if p[0]["infected"] == 1])
+    assert coefficients["infected"] == 0
+    assert coefficients["fixed"] == pytest.approx(5)
@@ -0,0 +1,192 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import json
+
+import pytest
+
+from dp3t.config import ProtocolParameters
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+from dp3t.cli import main
+
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+RELEASE_TIME = int(START_TIME.timestamp()) + 86400
+
+
+def contact(protocol):
+    """Return tracers of Alice, who saw Bob once, and of Bob, after one day"""
+    alice = protocol.ContactTracer(start_time=START_TIME)
+    bob = protocol.ContactTracer(start_time=START_TIME)
+
+    interaction_time = START_TIME + timedelta(hours=1)
+    alice.add_observation(bob.get_ephid_for_time(interaction_time), interaction_time)
+    alice.next_day()
+    bob.next_day()
+
+    return alice, bob
+
+
+def write_state(path, tracer):
+    with open(path, "wb") as f:
+        tracer.write(f)
+
+
+def test_lowcost_build_batch_and_match(tmp_path, capsys):
+    alice, bob = contact(lowcost)
+    start_time, key = bob.get_tracing_information(START_TIME)
+
+    reports = tmp_path / "reports.jsonl"
+    with open(reports, "w") as f:
+        for report_key in [key, bytes(32)]:
+            report = {"start_time": start_time, "key": report_key.hex()}
+            f.write(json.dumps(report) + "\n")
+
+    batch = str(tmp_path / "batch.bin")
+    args = ["build-batch", str(reports), "-o", batch]
+    assert main(["lowcost"] + args + ["--release-time", str(RELEASE_TIME)]) == 0
+
+    with open(batch, "rb") as f:
+        assert len(lowcost.TracingDataBatch.read(f).time_key_pairs) == 2
+
+    state = str(tmp_path / "alice.bin")
+    write_state(state, alice)
+    capsys.readouterr()
+    assert main(["lowcost", "match", state, batch]) == 0
+    assert capsys.readouterr().out.strip() == "1"
+
+
+def test_lowcost_batch_length(tmp_path, capsys):
+    parameters = ProtocolParameters(seconds_per_batch=3600)
+    alice = lowcost.ContactTracer(start_time=START_TIME, parameters=parameters)
+    bob = lowcost.ContactTracer(start_time=START_TIME, parameters=parameters)
+    interaction_time = START_TIME + timedelta(hours=1)
+    alice.add_observation(bob.get_ephid_for_time(interaction_time), interaction_time)
+    alice.next_day()
+    bob.next_day()
+
+    start_time, key = bob.get_tracing_information(START_TIME)
+    reports = tmp_path / "reports.jsonl"
+    with open(reports, "w") as f:
+        f.write(json.dumps({"start_time": start_time, "key": key.hex()}) + "\n")
+
+    # Batches of one hour are released at odd hours
+    release_time = str(RELEASE_TIME + 3600)
+    batch = str(tmp_path / "batch.bin")
+    args = ["lowcost", "build-batch", str(reports), "-o", batch]
+    args += ["--release-time", release_time]
+    assert main(args) == 1
+    assert "batch-aligned" in capsys.readouterr().err
+    assert main(args + ["--seconds-per-batch", "3600"]) == 0
+
+    state = str(tmp_path / "alice.bin")
+    write_state(state, alice)
+    capsys.readouterr()
+    assert main(["lowcost", "match", state, batch]) == 0
+    assert capsys.readouterr().out.strip() == "1"
+
+
+@pytest.mark.parametrize("options", [[], ["--tuned"]])
+def test_unlinkable_build_batch_from_stdin_and_match(
+    options, tmp_path, capsys, monkeypatch
+):
+    alice, bob = contact(unlinkable)
+    epochs, seeds = bob.get_tracing_information(START_TIME)
+
+    report = {"first_epoch": epochs[0], "seeds": [seed.hex() for seed in seeds]}
+    reports = tmp_path / "reports.jsonl"
+    reports.write_text(json.dumps(report) + "\n")
+
+    batch = str(tmp_path / "batch.bin")
+    with open(reports) as stdin:
+        monkeypatch.setattr("sys.stdin", stdin)
+        assert main(["unlinkable", "build-batch", "-", "-o", batch] + options) == 0
+
+    state = str(tmp_path / "alice.bin")
+    write_state(state, alice)
+    capsys.readouterr()
+    assert main(["unlinkable", "match", state, batch]) == 0
+    assert capsys.readouterr().out.strip() == "1"
+
+
+def test_unlinkable_match_uses_tracer_parameters(tmp_path, capsys, monkeypatch):
+    parameters = ProtocolParameters(epoch_length=5, cuckoo_fpr=0.001)
+    alice = unlinkable.ContactTracer(start_time=START_TIME, parameters=parameters)
+    bob = unlinkable.ContactTracer(start_time=START_TIME, parameters=parameters)
+    interaction_time = START_TIME + timedelta(hours=1)
+    alice.add_observation(bob.get_ephid_for_time(interaction_time), interaction_time)
+    alice.next_day()
+    bob.next_day()
+
+    builder = unlinkable.BatchBuilder(parameters=parameters)
+    builder.add_reports([bob.get_tracing_information(START_TIME)])
+    batch = str(tmp_path / "batch.bin")
+    with open(batch, "wb") as f:
+        builder.finish().write(f)
+
+    read_batches = []
+    read = unlinkable.TracingDataBatch.read
+
+    def recording_read(f, *args):
+        read_batches.append(read(f, *args))
+        return read_batches[-1]
+
+    monkeypatch.setattr(unlinkable.TracingDataBatch, "read", recording_read)
+    state = str(tmp_path / "alice.bin")
+    write_state(state, alice)
+    capsys.readouterr()
+    assert main(["unlinkable", "match", state, batch]) == 0
+    assert capsys.readouterr().out.strip() == "1"
+    assert [batch.parameters for batch in read_batches] == [parameters]
+
+
+@pytest.mark.parametrize("protocol", ["lowcost", "unlinkable"])
+def test_vectors(protocol, capsys):
+    assert main([protocol, "vectors"]) == 0
+    assert "Test vectors" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("protocol", ["lowcost", "unlinkable"])
+def test_generate_and_verify_vectors(protocol, tmp_path, capsys):
+    vectors = str(tmp_path / "vectors.jsonl")
+    args = ["-n", "12", "-o", vectors, "--format", "jsonl", "--workers", "1"]
+    assert main([protocol, "generate-vectors"] + args) == 0
+
+    assert main([protocol, "verify-vectors", vectors]) == 0
+    assert "12 of 12 vectors match" in capsys.readouterr().out
+
+    other = "unlinkable" if protocol == "lowcost" else "lowcost"
+    assert main([other, "verify-vectors", vectors]) == 1
+
+
+def test_invalid_report(tmp_path, capsys):
+    reports = tmp_path / "reports.jsonl"
+    reports.write_text('{"start_time": 0}\n')
+
+    batch = str(tmp_path / "batch.bin")
+    assert main(["lowcost", "build-batch", str(reports), "-o", batch]) == 1
+    assert "error" in capsys.readouterr().err
+
+
+def test_wrong_file_kind(tmp_path, capsys):
+    state = str(tmp_path / "alice.bin")
+    write_state(state, contact(unlinkable)[0])
+
+    assert main(["lowcost", "match", state, state]) == 1
+    assert "Unexpected file kind" in capsys.readouterr().err
@@ -0,0 +1,111 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import io
+import json
+
+import pytest
+
+from dp3t import conformance
+from dp3t.config import DEFAULT_PARAMETERS, ProtocolParameters
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+
+SEED = bytes(32)
+
+
+def generate(design, nr_vectors, **kwargs):
+    f = io.BytesIO()
+    conformance.generate(f, design, nr_vectors, seed=SEED, **kwargs)
+    f.seek(0)
+    return f
+
+
+@pytest.mark.parametrize("design", conformance.DESIGNS)
+@pytest.mark.parametrize("vector_format", conformance.VECTOR_FORMATS)
+def test_generated_vectors_verify(design, vector_format):
+    f = generate(design, 25, vector_format=vector_format, workers=1, chunk_size=10)
+    result = conformance.verify(f, chunk_size=7)
+
+    assert result.ok
+    assert result.design == design
+    assert result.nr_vectors == 25
+
+
+@pytest.mark.parametrize("design", conformance.DESIGNS)
+def test_workers_generate_the_same_vectors(design):
+    serial = generate(design, 30, workers=1, chunk_size=4)
+    parallel = generate(design, 30, workers=2, chunk_size=4)
+    assert serial.getvalue() == parallel.getvalue()
+
+
+def test_binary_records_have_fixed_length():
+    f = generate("unlinkable", 10, workers=1)
+    header_length = len(conformance.UNLINKABLE_VECTORS) + 17
+    length = conformance.record_length("unlinkable", DEFAULT_PARAMETERS)
+    assert len(f.getvalue()) == header_length + 10 * length
+
+
+def test_vectors_agree_with_protocols():
+    f = generate("lowcost", 2, vector_format="jsonl", workers=1)
+    _, _, vectors = conformance.read_vectors(f)
+    for (key, next_key, ephids) in vectors:
+        assert next_key == lowcost.next_day_key(key)
+        assert ephids == lowcost.generate_ephids_for_day(key, shuffle=False)
+
+    f = generate("unlinkable", 5, vector_format="jsonl", workers=1)
+    _, _, vectors = conformance.read_vectors(f)
+    for (seed, epoch, ephid, hashed_observation) in vectors:
+        assert ephid == unlinkable.ephid_from_seed(seed)
+        assert hashed_observation == unlinkable.hashed_observation_from_ephid(
+            ephid, epoch
+        )
+
+
+def test_verify_reports_mismatches():
+    lines = generate("unlinkable", 20, vector_format="jsonl", workers=1)
+    lines = lines.getvalue().decode("ascii").splitlines()
+
+    for index in (3, 11):
+        vector = json.loads(lines[index + 1])
+        vector["hashed_observation"] = "00" * 32
+        lines[index + 1] = json.dumps(vector)
+
+    f = io.BytesIO("\n".join(lines).encode("ascii"))
+    result = conformance.verify(f, max_mismatches=1, chunk_size=8)
+
+    assert not result.ok
+    assert result.nr_mismatches == 2
+    assert result.mismatches == [(3, "hashed_observation")]
+
+
+def test_vectors_keep_parameters():
+    parameters = ProtocolParameters(epoch_length=30, length_ephid=20)
+    f = generate("lowcost", 3, parameters=parameters, workers=1)
+
+    design, read_parameters, vectors = conformance.read_vectors(f)
+    assert read_parameters == parameters
+    assert all(len(ephids) == 48 for (_, _, ephids) in vectors)
+
+
+def test_verify_rejects_other_files():
+    with pytest.raises(ValueError):
+        conformance.verify(io.BytesIO(b"not a vector file\n"))
+
+    truncated = generate("lowcost", 2, workers=1).getvalue()[:-1]
+    with pytest.raises(ValueError):
+        conformance.verify(io.BytesIO(truncated))
@@ -0,0 +1,129 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import pytest
+
+from dp3t.crypto import (
+    CryptoBackend,
+    available_backends,
+    get_backend,
+    load_backend,
+    select_fastest_backend,
+    set_backend,
+    use_backend,
+)
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    with use_backend(request.param) as backend:
+        yield backend
+
+
+# Test vectors, see tests/test_lowcost.py and tests/test_unlinkable.py
+KEY0 = bytes.fromhex("0000000000000000000000000000000000000000000000000000000000000000")
+KEY1 = bytes.fromhex("66687aadf862bd776c8fc18b8e9f8e20089714856ee233b3902a591d0d5f2925")
+KEY2 = bytes.fromhex("2b32db6c2c0a6235fb1397e8225ea85e0f0e6e8c7b126d0016ccbde0e667151e")
+
+EPHIDS_KEY1 = [
+    bytes.fromhex("04cab76af57ca373de1d52689fae06c1"),
+    bytes.fromhex("ab7747084efb743a6aa1b19bab2f0ca3"),
+    bytes.fromhex("f417c16279d7f718465f958e17466550"),
+]
+
+SEED1 = bytes.fromhex(
+    "eaa2054637009757b9988b28998209d253eede69345f835bb91b3b333108d229"
+)
+EPHID1 = bytes.fromhex("b7b1d06cd81686669aeea51e9f4723b5")
+EPOCH0 = 1762781
+EPOCH1 = 1763290
+HASHED_OBSERVATION_EPHID1_TIME0 = bytes.fromhex(
+    "93e8cffb4f828baf9e36b658ab8988b9afd39bec9f95b24930768157148adcc9"
+)
+HASHED_OBSERVATION_EPHID1_TIME1 = bytes.fromhex(
+    "bc2667e5bc9d3ea33c0193f19884aefcb4879968f65250145c3c9bcb703ccb10"
+)
+
+
+##########################
+### TEST BACKEND SETUP ###
+##########################
+
+
+def test_default_backend_available():
+    assert "pycryptodome" in available_backends()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend("rot13")
+
+
+def test_backends_must_implement_the_prg():
+    class SingleKeyBackend(CryptoBackend):
+        def prg(self, key, length):
+            return bytes(length)
+
+    with pytest.raises(TypeError):
+        SingleKeyBackend()
+
+
+def test_select_fastest_backend():
+    previous = set_backend(None)
+    try:
+        name, timings = select_fastest_backend()
+        assert name in available_backends()
+        assert get_backend().name == name
+        assert set(timings) == set(available_backends())
+    finally:
+        set_backend(previous)
+
+
+######################################
+### TEST VECTORS FOR EVERY BACKEND ###
+######################################
+
+
+def test_prg_bulk(backend):
+    keys = [KEY0, KEY1, KEY2]
+    assert backend.prg_many(keys, 100) == [backend.prg(key, 100) for key in keys]
+
+
+def test_lowcost_vectors(backend):
+    assert lowcost.next_day_key(KEY0) == KEY1
+    assert lowcost.next_day_key(KEY1) == KEY2
+
+    ephids = lowcost.generate_ephids_for_day(KEY1, shuffle=False)
+    assert ephids[: len(EPHIDS_KEY1)] == EPHIDS_KEY1
+
+    bulk_ephids = lowcost.generate_ephids_for_days([KEY0, KEY1], shuffle=False)
+    assert bulk_ephids[1] == ephids
+
+
+def test_unlinkable_vectors(backend):
+    assert unlinkable.ephid_from_seed(SEED1) == EPHID1
+    assert unlinkable.ephids_from_seeds([SEED1, SEED1]) == [EPHID1, EPHID1]
+
+    hashed_observations = unlinkable.hashed_observations_from_seeds(
+        [SEED1, SEED1], [EPOCH0, EPOCH1]
+    )
+    assert hashed_observations == [
+        HASHED_OBSERVATION_EPHID1_TIME0,
+        HASHED_OBSERVATION_EPHID1_TIME1,
+    ]
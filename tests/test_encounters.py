@@ -0,0 +1,213 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import functools
+import io
+import secrets
+
+import pytest
+
+from dp3t.encounters import (
+    Encounter,
+    EncounterStore,
+    proximity_weight,
+    sighting_count,
+)
+from dp3t.protocols import lowcost, unlinkable
+from dp3t.storage import ObservationStore
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+OBSERVATION_TIME = START_TIME + timedelta(hours=10)
+
+
+def test_store_aggregates_sightings():
+    store = EncounterStore(16)
+    (near, far) = (b"a" * 16, b"b" * 16)
+    store.add(far, 1000)
+    for (time, attenuation) in [(100, 50), (130, 70), (160, None)]:
+        store.add(near, time, attenuation)
+
+    assert len(store) == 2
+    assert store.nr_sightings == 4
+    assert list(store) == [far, near]
+    assert store.encounter(near) == Encounter(near, 3, 100, 160, 50, 60.0)
+    assert store.encounter(far) == Encounter(far, 1, 1000, 1000, None, None)
+    with pytest.raises(KeyError):
+        store.encounter(b"c" * 16)
+
+    with pytest.raises(ValueError):
+        store.add(near, 200, 255)
+    with pytest.raises(ValueError):
+        store.add(b"short", 200)
+
+
+def test_frozen_store():
+    keys = [secrets.token_bytes(16) for _ in range(100)]
+    store = EncounterStore(16)
+    for (i, key) in enumerate(keys):
+        store.add(key, i, i)
+    store.freeze()
+
+    assert store.frozen
+    assert list(store) == sorted(keys)
+    assert all(key in store for key in keys)
+    assert secrets.token_bytes(16) not in store
+    assert store.encounter(keys[7]) == Encounter(keys[7], 1, 7, 7, 7, 7.0)
+    with pytest.raises(ValueError):
+        store.add(keys[0], 200)
+
+    f = io.BytesIO()
+    store.write(f)
+    f.seek(0)
+    loaded = EncounterStore.read(f, 16)
+    assert list(loaded.encounters()) == list(store.encounters())
+
+
+def test_merged_stores():
+    (first, second) = (EncounterStore(1), EncounterStore(1))
+    first.add(b"a", 10, 40)
+    first.add(b"b", 20)
+    second.add(b"a", 30, 60)
+
+    merged = EncounterStore.merged([first, second], 1)
+    assert merged.frozen
+    assert merged.encounter(b"a") == Encounter(b"a", 2, 10, 30, 40, 50.0)
+    assert merged.encounter(b"b") == Encounter(b"b", 1, 20, 20, None, None)
+
+
+def test_weights():
+    assert sighting_count(Encounter(b"a", 4, 0, 0, 70, 70.0)) == 4
+    assert proximity_weight(Encounter(b"a", 4, 0, 0, None, None)) == 4
+    assert proximity_weight(Encounter(b"a", 4, 0, 0, 50, 50.0)) == 4
+    assert proximity_weight(Encounter(b"a", 4, 0, 0, 58, 60.0)) == 2
+    assert proximity_weight(Encounter(b"a", 4, 0, 0, 70, 70.0)) == 0
+
+
+def exposed_tracer(protocol, sightings, **kwargs):
+    """Return a tracer that saw an infected EphID repeatedly, and the batch"""
+    infected = protocol.ContactTracer(start_time=START_TIME)
+    tracer = protocol.ContactTracer(start_time=START_TIME, encounters=True, **kwargs)
+
+    ephid = infected.get_ephid_for_time(OBSERVATION_TIME)
+    for (i, attenuation) in enumerate(sightings):
+        tracer.add_observation(
+            ephid, OBSERVATION_TIME + timedelta(seconds=10 * i), attenuation
+        )
+    tracer.add_observation(secrets.token_bytes(16), OBSERVATION_TIME, 40)
+
+    tracer.next_day()
+    infected.next_day()
+    if protocol is lowcost:
+        batch = lowcost.TracingDataBatch(
+            [infected.get_tracing_information(START_TIME)],
+            int((START_TIME + timedelta(days=1)).timestamp()),
+        )
+    else:
+        batch = unlinkable.TracingDataBatch(
+            [infected.get_tracing_information(START_TIME)]
+        )
+    return tracer, batch
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_weighted_exposure(protocol):
+    (tracer, batch) = exposed_tracer(protocol, [50, 50, 70, 70, None])
+
+    assert tracer.matches_with_batch(batch) == 1
+    assert tracer.matches_with_batch(batch, weight=sighting_count) == 5
+    assert tracer.matches_with_batch(batch, weight=proximity_weight) == 2.5
+    near = functools.partial(proximity_weight, near=45, far=50)
+    assert tracer.matches_with_batch(batch, weight=near) == 0
+
+    # Only distinct encounters are stored
+    if protocol is lowcost:
+        stores = tracer.observations.values()
+    else:
+        stores = tracer.observations_per_day.values()
+    assert sum(len(store) for store in stores) == 2
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_encounters_survive_saving(protocol):
+    (tracer, batch) = exposed_tracer(protocol, [50] * 10)
+
+    f = io.BytesIO()
+    tracer.write(f)
+    f.seek(0)
+    loaded = protocol.ContactTracer.read(f)
+
+    assert loaded.encounters
+    assert loaded.matches_with_batch(batch, weight=sighting_count) == 10
+
+
+def test_saved_store_accepts_sightings():
+    store = EncounterStore(1)
+    store.add(b"b", 10)
+    store.add(b"a", 20)
+
+    f = io.BytesIO()
+    store.write(f)
+    f.seek(0)
+    loaded = EncounterStore.read(f, 1)
+
+    assert not loaded.frozen
+    loaded.add(b"b", 30)
+    assert list(loaded) == [b"b", b"a"]
+    assert loaded.encounter(b"b") == Encounter(b"b", 2, 10, 30, None, None)
+
+
+def test_lowcost_housekeeping_merges_encounters():
+    (tracer, batch) = exposed_tracer(lowcost, [50] * 3)
+    tracer.housekeeping_after_batch(batch)
+
+    observations = tracer.observations
+    assert list(observations) == [int(START_TIME.timestamp())]
+    assert len(observations[int(START_TIME.timestamp())]) == 2
+    assert tracer.matches_with_batch(batch, weight=sighting_count) == 3
+
+
+def test_unlinkable_encounters():
+    (tracer, batch) = exposed_tracer(unlinkable, [50] * 20, observation_format="digest")
+    assert tracer.matches_with_batch(batch, weight=sighting_count) == 20
+
+    with ThreadPoolExecutor(2) as pool:
+        assert tracer.matches_with_batch(batch, pool=pool) == 1
+        with pytest.raises(ValueError):
+            tracer.matches_with_batch(batch, pool=pool, weight=sighting_count)
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_encounters_are_opt_in(protocol, tmp_path):
+    tracer = protocol.ContactTracer(start_time=START_TIME)
+    with pytest.raises(ValueError):
+        tracer.add_observation(secrets.token_bytes(16), OBSERVATION_TIME, 50)
+
+    batch_tracer = protocol.ContactTracer(start_time=START_TIME)
+    if protocol is lowcost:
+        batch = lowcost.TracingDataBatch([], release_time=0)
+    else:
+        batch = unlinkable.TracingDataBatch([])
+    with pytest.raises(ValueError):
+        batch_tracer.matches_with_batch(batch, weight=sighting_count)
+
+    with ObservationStore(0, directory=str(tmp_path)) as store:
+        with pytest.raises(ValueError):
+            protocol.ContactTracer(
+                start_time=START_TIME, observation_store=store, encounters=True
+            )
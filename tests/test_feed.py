@@ -0,0 +1,142 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import io
+
+import pytest
+
+from dp3t.config import RETENTION_PERIOD, SECONDS_PER_DAY
+from dp3t.feed import (
+    FEED_PATH,
+    BatchFeed,
+    FeedClient,
+    HTTPTransport,
+    LocalTransport,
+    read_feed,
+    serve,
+    write_feed,
+)
+from dp3t.ledger import PROCESSED, BatchLedger
+from dp3t.protocols import lowcost
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+DAY0 = int(START_TIME.timestamp())
+
+
+def release_time(batch_nr):
+    return DAY0 + SECONDS_PER_DAY + batch_nr * 7200
+
+
+def feed_with_batches(nr_batches, keys=()):
+    feed = BatchFeed()
+    for batch_nr in range(nr_batches):
+        feed.publish(lowcost.TracingDataBatch(list(keys), release_time(batch_nr)))
+    return feed
+
+
+def test_poll_advances_cursor():
+    feed = feed_with_batches(3)
+    client = FeedClient(LocalTransport(feed))
+
+    assert [e.release_time for e in client.poll()] == [
+        release_time(i) for i in range(3)
+    ]
+    assert client.cursor == release_time(2)
+
+    feed.publish(lowcost.TracingDataBatch([], release_time(3)))
+    assert [e.release_time for e in client.poll()] == [release_time(3)]
+
+
+def test_unchanged_feed_is_not_sent_again():
+    feed = feed_with_batches(2)
+    client = FeedClient(LocalTransport(feed))
+    assert len(list(client.poll())) == 2
+
+    assert list(client.poll()) == []
+    assert list(client.poll()) == []
+    assert client.not_modified == 2
+
+    feed.publish(lowcost.TracingDataBatch([], release_time(2)))
+    assert len(list(client.poll())) == 1
+
+
+def test_interrupted_poll_resumes():
+    feed = feed_with_batches(3)
+    client = FeedClient(LocalTransport(feed), cursor=release_time(0))
+
+    entries = client.poll()
+    assert next(entries).release_time == release_time(1)
+    entries.close()
+
+    assert [e.release_time for e in client.poll()] == [release_time(2)]
+    assert client.not_modified == 0
+
+
+def test_publish_in_order():
+    feed = feed_with_batches(2)
+    with pytest.raises(ValueError):
+        feed.publish(lowcost.TracingDataBatch([], release_time(1)))
+    with pytest.raises(ValueError):
+        feed.publish(b"batch")
+
+
+def test_expire():
+    feed = feed_with_batches(3)
+    now = release_time(1) + RETENTION_PERIOD * SECONDS_PER_DAY
+    assert feed.expire(now) == 1
+    assert [e.release_time for e in feed.since()] == [release_time(1), release_time(2)]
+
+
+def test_feed_format():
+    feed = feed_with_batches(2)
+    f = io.BytesIO()
+    assert write_feed(f, feed.since()) == 2
+    f.seek(0)
+    assert list(read_feed(f)) == feed.since()
+
+    corrupted = bytearray(f.getvalue())
+    corrupted[-1] ^= 1
+    with pytest.raises(ValueError):
+        list(read_feed(io.BytesIO(bytes(corrupted))))
+
+
+def test_served_feed_into_ledger():
+    alice = lowcost.ContactTracer(start_time=START_TIME)
+    bob = lowcost.ContactTracer(start_time=START_TIME)
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    feed = feed_with_batches(2, [bob.get_tracing_information(START_TIME)])
+    server = serve(feed, 0)
+    try:
+        url = "http://127.0.0.1:{}{}".format(server.server_address[1], FEED_PATH)
+        client = FeedClient(HTTPTransport(url))
+        ledger = BatchLedger(alice)
+
+        submissions = [ledger.submit(entry.data) for entry in client.poll()]
+        assert [s.status for s in submissions] == [PROCESSED, PROCESSED]
+        assert [s.processed[0].result for s in submissions] == [1, 1]
+        assert client.cursor == release_time(1)
+
+        assert list(client.poll()) == []
+        assert client.not_modified == 1
+    finally:
+        server.shutdown()
+        server.server_close()
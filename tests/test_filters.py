@@ -0,0 +1,152 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import io
+import secrets
+
+import pytest
+from cuckoo.filter import CuckooFilter
+
+from dp3t import filters
+from dp3t.filters import (
+    FilterUnion,
+    FrozenCuckooFilter,
+    contains_digest,
+    contains_probe,
+    digest,
+    fingerprint_size,
+    matching_probes,
+    probe,
+)
+from dp3t.protocols.unlinkable import CUCKOO_BUCKET_SIZE, CUCKOO_FPR
+
+
+@pytest.fixture(scope="module")
+def items():
+    return [secrets.token_bytes(32) for _ in range(1000)]
+
+
+@pytest.fixture(scope="module")
+def cuckoo_filter(items):
+    cuckoo_filter = CuckooFilter(int(len(items) * 1.2), error_rate=CUCKOO_FPR)
+    for item in items:
+        cuckoo_filter.insert(item)
+    return cuckoo_filter
+
+
+def test_frozen_filter_contains_items(cuckoo_filter, items):
+    frozen = FrozenCuckooFilter.from_filter(cuckoo_filter)
+    assert frozen.size == len(items)
+    assert all(item in frozen for item in items)
+
+
+def test_frozen_filter_agrees_with_filter(cuckoo_filter):
+    frozen = FrozenCuckooFilter.from_filter(cuckoo_filter)
+    for _ in range(1000):
+        item = secrets.token_bytes(32)
+        assert (item in frozen) == cuckoo_filter.contains(item)
+
+
+def test_frozen_filter_write_read(cuckoo_filter, items):
+    frozen = FrozenCuckooFilter.from_filter(cuckoo_filter)
+
+    f = io.BytesIO()
+    frozen.write(f)
+    f.seek(0)
+    restored = FrozenCuckooFilter.read(f)
+
+    assert restored.table == frozen.table
+    assert restored.fingerprint_size == cuckoo_filter.fingerprint_size
+    assert all(item in restored for item in items)
+
+
+def test_frozen_filter_truncated_file(cuckoo_filter):
+    f = io.BytesIO()
+    FrozenCuckooFilter.from_filter(cuckoo_filter).write(f)
+
+    with pytest.raises(ValueError):
+        FrozenCuckooFilter.read(io.BytesIO(f.getvalue()[:-1]))
+
+
+def test_contains_digest_agrees_with_contains(cuckoo_filter, items):
+    frozen = FrozenCuckooFilter.from_filter(cuckoo_filter)
+    others = [secrets.token_bytes(32) for _ in range(1000)]
+
+    for item in items[:100] + others:
+        expected = cuckoo_filter.contains(item)
+        assert contains_digest(cuckoo_filter, digest(item)) == expected
+        assert contains_digest(frozen, digest(item)) == expected
+
+
+def test_fingerprint_size(cuckoo_filter):
+    assert fingerprint_size(CUCKOO_FPR, CUCKOO_BUCKET_SIZE) == 45
+    assert cuckoo_filter.fingerprint_size == 45
+
+
+def test_contains_probe_agrees_with_contains(cuckoo_filter, items):
+    frozen = FrozenCuckooFilter.from_filter(cuckoo_filter)
+    others = [secrets.token_bytes(32) for _ in range(1000)]
+
+    for item in items[:100] + others:
+        expected = cuckoo_filter.contains(item)
+        for size in (45, 44):
+            item_probe = probe(digest(item), size)
+            assert contains_probe(cuckoo_filter, item_probe, size) == expected
+            assert contains_probe(frozen, item_probe, size) == expected
+
+
+def build_filter(items):
+    cuckoo_filter = CuckooFilter(int(len(items) * 1.2), error_rate=CUCKOO_FPR)
+    for item in items:
+        cuckoo_filter.insert(item)
+    return cuckoo_filter
+
+
+def test_filter_union():
+    items = [bytes([i]) * 32 for i in range(20)]
+    first = FrozenCuckooFilter.from_filter(build_filter(items[:10]))
+    second = build_filter(items[5:15])
+    union = FilterUnion([first, second])
+
+    assert all(item in union for item in items[:15])
+    assert union.size == 20
+
+    size = fingerprint_size(CUCKOO_FPR, CUCKOO_BUCKET_SIZE)
+    probes = [probe(digest(item), size) for item in items]
+    assert list(matching_probes(union, probes, size)) == probes[:15]
+    assert contains_digest(union, digest(items[0]))
+    assert contains_probe(union, probes[14], size)
+
+
+def test_filter_union_streams_probes(monkeypatch):
+    items = [bytes([i]) * 32 for i in range(20)]
+    union = FilterUnion([build_filter(items[:10]), build_filter(items[10:15])])
+    size = fingerprint_size(CUCKOO_FPR, CUCKOO_BUCKET_SIZE)
+    probes = [probe(digest(item), size) for item in reversed(items)]
+
+    monkeypatch.setattr(filters, "UNION_CHUNK_SIZE", 3)
+    consumed = []
+
+    def stream():
+        for item_probe in probes:
+            consumed.append(item_probe)
+            yield item_probe
+
+    matches = matching_probes(union, stream(), size)
+    assert next(matches) == probes[5]
+    assert len(consumed) == 6
+    assert [probes[5]] + list(matches) == probes[5:]
@@ -0,0 +1,143 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+
+from dp3t.config import RETENTION_PERIOD, SECONDS_PER_DAY
+from dp3t.ingestion import IngestionStats, LowcostIngestion, UnlinkableIngestion
+from dp3t.protocols import lowcost, unlinkable
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+DAY0 = int(START_TIME.timestamp())
+NOW = DAY0 + RETENTION_PERIOD * SECONDS_PER_DAY + 3600
+
+KEY1 = bytes.fromhex("66687aadf862bd776c8fc18b8e9f8e20089714856ee233b3902a591d0d5f2925")
+KEY2 = bytes.fromhex("2b32db6c2c0a6235fb1397e8225ea85e0f0e6e8c7b126d0016ccbde0e667151e")
+
+
+def test_lowcost_ingestion():
+    ingestion = LowcostIngestion(now=NOW)
+    ingestion.add_reports(
+        [
+            (DAY0 + SECONDS_PER_DAY, KEY2),
+            (DAY0, KEY1),
+            (DAY0 + SECONDS_PER_DAY, KEY2),  # duplicate
+            (DAY0 - SECONDS_PER_DAY, KEY2),  # rolled forward to DAY0
+            (DAY0 - (RETENTION_PERIOD + 1) * SECONDS_PER_DAY, KEY1),  # too old
+            (DAY0 + 3600, KEY1),  # not at the start of a day
+            (NOW + SECONDS_PER_DAY, KEY1),  # in the future
+            (DAY0, KEY1[:16]),  # short key
+        ]
+    )
+    ingestion.add(DAY0, KEY1)
+
+    rolled = lowcost.next_day_key(KEY2)
+    assert ingestion.reports() == sorted(
+        [(DAY0, KEY1), (DAY0, rolled), (DAY0 + SECONDS_PER_DAY, KEY2)]
+    )
+    assert ingestion.stats == IngestionStats(
+        received=9, accepted=3, duplicates=2, expired=1, invalid=3
+    )
+    assert len(ingestion) == 3
+
+
+def test_lowcost_ingestion_feeds_batch():
+    alice = lowcost.ContactTracer(start_time=START_TIME)
+    bob = lowcost.ContactTracer(start_time=START_TIME)
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    report = bob.get_tracing_information(START_TIME)
+    ingestion = LowcostIngestion(now=DAY0 + SECONDS_PER_DAY)
+    ingestion.add_reports([report, report])
+
+    batch = lowcost.TracingDataBatch(ingestion.reports(), DAY0 + SECONDS_PER_DAY)
+    assert alice.matches_with_batch(batch) == 1
+
+
+def test_lowcost_report_before_retention_period_matches():
+    alice = lowcost.ContactTracer(start_time=START_TIME)
+    bob = lowcost.ContactTracer(start_time=START_TIME - timedelta(days=1))
+    bob.next_day()
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    # Bob reports from the day before the first day that Alice retains
+    report = bob.get_tracing_information(START_TIME - timedelta(days=1))
+    now = DAY0 + RETENTION_PERIOD * SECONDS_PER_DAY
+    ingestion = LowcostIngestion(now=now)
+    assert ingestion.first_retained_time == DAY0
+    ingestion.add_reports([report])
+    assert ingestion.stats.expired == 0
+    assert ingestion.reports()[0][0] == DAY0
+
+    batch = lowcost.TracingDataBatch(ingestion.reports(), DAY0 + SECONDS_PER_DAY)
+    assert alice.matches_with_batch(batch) == 1
+
+
+def test_unlinkable_ingestion():
+    first_epoch = DAY0 // 900
+    seeds = [bytes([i]) * 32 for i in range(4)]
+
+    ingestion = UnlinkableIngestion(now=NOW)
+    assert ingestion.first_epoch == first_epoch
+    assert ingestion.last_epoch == NOW // 900
+
+    ingestion.add(range(first_epoch, first_epoch + 4), seeds)
+    ingestion.add_reports(
+        [
+            # Upload retried, with one epoch that is too old
+            ([first_epoch - 1, first_epoch + 1, first_epoch], seeds[:3]),
+            # Epoch in the future, and short seed
+            ([ingestion.last_epoch + 1, first_epoch + 5], [seeds[0], b"short"]),
+            # Mismatched epochs and seeds
+            ([first_epoch, first_epoch + 1], seeds[:1]),
+        ]
+    )
+
+    assert ingestion.stats == IngestionStats(
+        received=11, accepted=5, duplicates=1, expired=1, invalid=4
+    )
+
+    # Entries are (epoch, seed) pairs, so (first_epoch, seeds[2]) is new
+    reports = list(ingestion.reports(chunk_size=3))
+    assert [len(epochs) for (epochs, _) in reports] == [3, 2]
+    epochs = [epoch for (chunk, _) in reports for epoch in chunk]
+    assert epochs == sorted(epochs)
+
+
+def test_unlinkable_ingestion_feeds_builder():
+    alice = unlinkable.ContactTracer(start_time=START_TIME)
+    bob = unlinkable.ContactTracer(start_time=START_TIME)
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    report = bob.get_tracing_information(START_TIME)
+    ingestion = UnlinkableIngestion(now=DAY0 + SECONDS_PER_DAY)
+    ingestion.add_reports([report, report])
+    assert ingestion.stats.duplicates == len(report[0])
+
+    builder = unlinkable.BatchBuilder()
+    builder.add_reports(ingestion.reports())
+    assert builder.nr_items == len(report[0])
+    assert alice.matches_with_batch(builder.finish()) == 1
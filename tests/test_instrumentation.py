@@ -0,0 +1,125 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import urllib.request
+
+import pytest
+
+from dp3t import instrumentation
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+
+
+START_TIME = datetime(2020, 4, 25, 15, 17, tzinfo=timezone.utc)
+EPHID = bytes.fromhex("66687aadf862bd776c8fc18b8e9f8e20")
+
+
+@pytest.fixture
+def stats():
+    instrumentation.reset()
+    with instrumentation.instrumented():
+        yield
+    instrumentation.reset()
+
+
+def test_disabled_by_default():
+    assert not instrumentation.is_enabled()
+    assert lowcost.generate_ephids_for_day.__module__ == "dp3t.protocols.lowcost"
+    assert "wrapper" not in repr(lowcost.generate_ephids_for_day)
+
+
+def test_disable_restores_functions():
+    original = lowcost.next_day_key
+    with instrumentation.instrumented():
+        assert lowcost.next_day_key is not original
+    assert lowcost.next_day_key is original
+
+
+def test_nested_instrumentation():
+    original = lowcost.next_day_key
+    with instrumentation.instrumented():
+        wrapper = lowcost.next_day_key
+        with instrumentation.instrumented():
+            assert lowcost.next_day_key is wrapper
+        assert instrumentation.is_enabled()
+        assert lowcost.next_day_key is wrapper
+    assert not instrumentation.is_enabled()
+    assert lowcost.next_day_key is original
+
+
+def test_concurrent_instrumentation():
+    original = lowcost.next_day_key
+
+    def measure(_):
+        with instrumentation.instrumented():
+            for _ in range(100):
+                lowcost.next_day_key(bytes(32))
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(measure, range(8)))
+    assert lowcost.next_day_key is original
+
+
+def test_counts_lowcost_calls(stats):
+    tracer = lowcost.ContactTracer(start_time=START_TIME)
+    tracer.add_observation(EPHID, START_TIME)
+    tracer.next_day()
+
+    counters = instrumentation.snapshot()
+    assert counters["lowcost.generate_ephids"]["calls"] == 2
+    assert counters["lowcost.next_day_key"]["calls"] == 1
+    assert counters["lowcost.secure_shuffle"]["calls"] >= 1
+    assert counters["lowcost.generate_ephids"]["seconds"] > 0
+
+
+def test_counts_filter_calls(stats):
+    tracer = unlinkable.ContactTracer(start_time=START_TIME)
+    tracer.add_observation(EPHID, START_TIME + timedelta(minutes=20))
+    tracing_info = tracer.get_tracing_information(START_TIME)
+    batch = unlinkable.TracingDataBatch([tracing_info])
+    tracer.matches_with_batch(batch)
+
+    counters = instrumentation.snapshot()
+    assert counters["filter.insert"]["calls"] == 1
+    assert counters["filter.lookup"]["calls"] == 1
+    assert counters["unlinkable.hashed_observation"]["calls"] == 1
+    assert counters["unlinkable.hashed_observations_bulk"]["calls"] == 1
+
+
+def test_exposition(stats):
+    lowcost.next_day_key(bytes(32))
+
+    text = instrumentation.exposition()
+    assert "# TYPE dp3t_calls_total counter" in text
+    assert 'dp3t_calls_total{function="lowcost.next_day_key"} 1\n' in text
+
+
+def test_serve(stats):
+    lowcost.next_day_key(bytes(32))
+
+    server = instrumentation.serve(0)
+    try:
+        url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'dp3t_calls_total{function="lowcost.next_day_key"} 1' in text
@@ -0,0 +1,67 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import subprocess
+import sys
+
+import pytest
+
+import dp3t
+
+
+def modules_loaded_by(statement):
+    """Return the modules loaded by running statement in a fresh interpreter"""
+    script = "import sys\n{}\nprint(' '.join(sys.modules))".format(statement)
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return set(output.split())
+
+
+def test_import_dp3t_is_lightweight():
+    modules = modules_loaded_by("import dp3t")
+    assert "dp3t.protocols.lowcost" not in modules
+    assert "dp3t.protocols.unlinkable" not in modules
+
+
+def test_protocols_do_not_load_libraries_on_import():
+    modules = modules_loaded_by(
+        "import dp3t.protocols.lowcost, dp3t.protocols.unlinkable"
+    )
+    assert "Cryptodome" not in modules
+    assert "cuckoo" not in modules
+
+
+def test_epoch_math_does_not_load_libraries():
+    modules = modules_loaded_by("import dp3t; dp3t.epoch_from_time")
+    assert "dp3t.protocols.unlinkable" in modules
+    assert "Cryptodome" not in modules
+    assert "cuckoo" not in modules
+
+
+def test_lazy_attributes():
+    from dp3t.protocols import lowcost
+
+    assert dp3t.lowcost is lowcost
+    assert dp3t.day_start_from_time is lowcost.day_start_from_time
+    assert "unlinkable" in dir(dp3t)
+
+    with pytest.raises(AttributeError):
+        dp3t.does_not_exist
@@ -0,0 +1,253 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import io
+
+import pytest
+
+from dp3t.config import RETENTION_PERIOD, SECONDS_PER_DAY
+from dp3t.ledger import DUPLICATE, LATE, PROCESSED, QUEUED, BatchLedger
+from dp3t.protocols import lowcost, unlinkable
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+BATCH = lowcost.SECONDS_PER_BATCH
+
+
+def release(batches):
+    """Release time of the given number of batches after the day of START_TIME"""
+    return int(START_TIME.timestamp()) + SECONDS_PER_DAY + batches * BATCH
+
+
+def serialized(batch):
+    f = io.BytesIO()
+    batch.write(f)
+    return f.getvalue()
+
+
+def lowcost_batches(nr_batches):
+    """Alice, who saw bob, and nr_batches batches that all hold bob's report"""
+    alice = lowcost.ContactTracer(start_time=START_TIME)
+    bob = lowcost.ContactTracer(start_time=START_TIME)
+
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    report = bob.get_tracing_information(START_TIME)
+    batches = [
+        serialized(lowcost.TracingDataBatch([report], release_time=release(i)))
+        for i in range(nr_batches)
+    ]
+    return alice, batches
+
+
+def test_duplicates_are_skipped():
+    alice, [data] = lowcost_batches(1)
+    ledger = BatchLedger(alice)
+
+    submission = ledger.submit(data, now=release(0))
+    assert submission.status == PROCESSED
+    assert [processed.result for processed in submission.processed] == [1]
+    assert submission.key[0] == release(0)
+
+    retry = ledger.submit(data, now=release(0))
+    assert retry.status == DUPLICATE
+    assert retry.key == submission.key
+    assert retry.processed == []
+    assert data in ledger
+
+
+def test_out_of_order_batches_are_queued():
+    alice, batches = lowcost_batches(4)
+    released = []
+
+    def handler(batch):
+        released.append(batch.release_time)
+
+    ledger = BatchLedger(alice, handler)
+    ledger.submit(batches[0], now=release(3))
+
+    assert ledger.submit(batches[3], now=release(3)).status == QUEUED
+    assert ledger.submit(batches[2], now=release(3)).status == QUEUED
+    assert [key[0] for key in ledger.keys(pending=True)] == [release(2), release(3)]
+
+    submission = ledger.submit(batches[1], now=release(3))
+    assert submission.status == PROCESSED
+    assert [processed.key[0] for processed in submission.processed] == [
+        release(1),
+        release(2),
+        release(3),
+    ]
+    assert released == [release(i) for i in range(4)]
+    assert ledger.keys(pending=True) == []
+    assert ledger.last_release == release(3)
+
+    assert ledger.submit(batches[0], now=release(3)).status == DUPLICATE
+
+
+def test_failed_batches_can_be_resubmitted():
+    alice, batches = lowcost_batches(3)
+    failures = [True]
+
+    def handler(batch):
+        if batch.release_time == release(1) and failures:
+            failures.pop()
+            raise OSError("No space left on device")
+        return alice.matches_with_batch(batch)
+
+    ledger = BatchLedger(alice, handler)
+    ledger.submit(batches[0], now=release(2))
+    with pytest.raises(OSError):
+        ledger.submit(batches[1], now=release(2))
+    assert batches[1] not in ledger
+    assert ledger.last_release == release(0)
+
+    submission = ledger.submit(batches[1], now=release(2))
+    assert submission.status == PROCESSED
+    assert ledger.last_release == release(1)
+    assert ledger.submit(batches[2], now=release(2)).status == PROCESSED
+
+
+def test_failed_queued_batches_stay_queued():
+    alice, batches = lowcost_batches(3)
+    failures = [True]
+
+    def handler(batch):
+        if batch.release_time == release(2) and failures:
+            failures.pop()
+            raise OSError("No space left on device")
+
+    ledger = BatchLedger(alice, handler)
+    ledger.submit(batches[0], now=release(2))
+    assert ledger.submit(batches[2], now=release(2)).status == QUEUED
+    with pytest.raises(OSError):
+        ledger.submit(batches[1], now=release(2))
+    assert ledger.last_release == release(1)
+    assert [key[0] for key in ledger.keys(pending=True)] == [release(2)]
+
+    assert [processed.key[0] for processed in ledger.flush()] == [release(2)]
+    assert ledger.last_release == release(2)
+
+
+def test_late_batches_are_not_processed():
+    alice, batches = lowcost_batches(3)
+    ledger = BatchLedger(alice)
+
+    ledger.submit(batches[0], now=release(2))
+    ledger.submit(batches[2], now=release(2))
+    assert ledger.flush() != []
+
+    assert ledger.submit(batches[1], now=release(2)).status == LATE
+    assert batches[1] not in ledger
+
+
+def test_flush_gives_up_on_missing_batches():
+    alice, batches = lowcost_batches(5)
+    ledger = BatchLedger(alice)
+
+    ledger.submit(batches[0], now=release(4))
+    ledger.submit(batches[2], now=release(4))
+    ledger.submit(batches[4], now=release(4))
+
+    processed = ledger.flush(until=release(2))
+    assert [p.key[0] for p in processed] == [release(2)]
+    assert [key[0] for key in ledger.keys(pending=True)] == [release(4)]
+
+    # The next batch fills the gap
+    submission = ledger.submit(batches[3], now=release(4))
+    assert [p.key[0] for p in submission.processed] == [release(3), release(4)]
+
+
+def test_expiry_after_retention_period():
+    alice, batches = lowcost_batches(3)
+    ledger = BatchLedger(alice)
+
+    ledger.submit(batches[0], now=release(2))
+    ledger.submit(batches[2], now=release(2))
+    assert len(ledger) == 2
+
+    now = release(2) + RETENTION_PERIOD * SECONDS_PER_DAY
+    expired = ledger.expire(now)
+    assert [key[0] for key in expired] == [release(0)]
+    assert [key[0] for key in ledger.keys()] == [release(2)]
+
+    expired = ledger.expire(now + BATCH)
+    assert [key[0] for key in expired] == [release(2)]
+    assert len(ledger) == 0
+    assert ledger.cache_bytes == 0
+
+
+def test_cache_bound_evicts_oldest_batches():
+    alice, batches = lowcost_batches(3)
+    ledger = BatchLedger(alice, max_cache_bytes=2 * len(batches[0]))
+
+    keys = [ledger.submit(data, now=release(2)).key for data in batches]
+
+    assert ledger.cache_bytes == 2 * len(batches[0])
+    with pytest.raises(KeyError):
+        ledger.batch(keys[0])
+    assert ledger.batch(keys[2]).release_time == release(2)
+
+    # Evicted batches are still known
+    assert ledger.submit(batches[0], now=release(2)).status == DUPLICATE
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_write_read(tmp_path, on_disk):
+    directory = str(tmp_path) if on_disk else None
+    alice, batches = lowcost_batches(3)
+    ledger = BatchLedger(alice, directory=directory)
+    ledger.submit(batches[0], now=release(2))
+    ledger.submit(batches[2], now=release(2))
+
+    state_file = io.BytesIO()
+    ledger.write(state_file)
+    state_file.seek(0)
+    restored = BatchLedger.read(state_file, alice, directory=directory)
+
+    assert restored.last_release == release(0)
+    assert restored.keys() == ledger.keys()
+    assert restored.keys(pending=True) == ledger.keys(pending=True)
+
+    submission = restored.submit(batches[1], now=release(2))
+    assert [p.key[0] for p in submission.processed] == [release(1), release(2)]
+
+
+def test_unlinkable_batches_are_not_ordered():
+    alice = unlinkable.ContactTracer(start_time=START_TIME)
+    bob = unlinkable.ContactTracer(start_time=START_TIME)
+
+    time = START_TIME + timedelta(hours=10)
+    alice.add_observation(bob.get_ephid_for_time(time), time)
+    alice.next_day()
+    bob.next_day()
+
+    report = bob.get_tracing_information(START_TIME)
+    late = serialized(unlinkable.TracingDataBatch([report], release_time=release(2)))
+    early = serialized(unlinkable.TracingDataBatch([report], release_time=release(0)))
+
+    ledger = BatchLedger(alice)
+    assert ledger.submit(late, now=release(2)).processed[0].result == 1
+    assert ledger.submit(early, now=release(2)).processed[0].result == 1
+    assert ledger.submit(late, now=release(2)).status == DUPLICATE
+
+
+def test_unknown_tracer():
+    with pytest.raises(TypeError):
+        BatchLedger(object())
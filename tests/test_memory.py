@@ -0,0 +1,124 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import date, datetime, timedelta, timezone
+import secrets
+import sys
+
+import pytest
+
+from dp3t.memory import MemoryReport, aggregate, deep_sizeof
+from dp3t.pool import TracerPool
+from dp3t.protocols import lowcost, unlinkable
+from dp3t.storage import ObservationStore
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+
+
+def tracer_with_observations(protocol, nr_observations, days=3, **kwargs):
+    tracer = protocol.ContactTracer(start_time=START_TIME, **kwargs)
+    for day in range(days):
+        observation_time = START_TIME + timedelta(days=day, hours=10)
+        for _ in range(nr_observations):
+            tracer.add_observation(secrets.token_bytes(16), observation_time)
+        tracer.next_day()
+    return tracer
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    item = secrets.token_bytes(1000)
+    items = [item, item]
+    assert deep_sizeof(items) == sys.getsizeof(items) + sys.getsizeof(item)
+
+    seen = set()
+    assert deep_sizeof(item, seen) == sys.getsizeof(item)
+    assert deep_sizeof([item], seen) == sys.getsizeof([item])
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_tracer_memory_report(protocol):
+    empty = tracer_with_observations(protocol, 0).memory_report()
+    report = tracer_with_observations(protocol, 100).memory_report()
+
+    assert report.total == sum(report.components.values())
+    assert "overhead" in report.components
+    if protocol is lowcost:
+        assert report.components["past_keys"] > 3 * 32
+    else:
+        assert report.components["seeds_per_epoch"] > 4 * 96 * 32
+
+    # Observations are 16-byte EphIDs or 32-byte hashed observations
+    growth = report.components["observations"] - empty.components["observations"]
+    assert growth > 300 * 16
+
+    assert sorted(report.days) == [
+        date(2020, 4, 25) + timedelta(days=d) for d in range(4)
+    ]
+    assert report.days[date(2020, 4, 28)] < report.days[date(2020, 4, 25)]
+
+
+def test_spilled_observations_are_not_counted(tmp_path):
+    in_memory = tracer_with_observations(unlinkable, 1000).memory_report()
+    with ObservationStore(memory_limit=0, directory=str(tmp_path)) as store:
+        spilled = tracer_with_observations(
+            unlinkable, 1000, observation_store=store
+        ).memory_report()
+
+    assert (
+        spilled.components["observations"] < in_memory.components["observations"] / 10
+    )
+
+
+def test_batch_memory_report():
+    tracer = unlinkable.ContactTracer(start_time=START_TIME)
+    batch = unlinkable.TracingDataBatch(
+        [tracer.get_tracing_information(START_TIME)], release_time=0
+    )
+    report = batch.memory_report()
+    assert report.total == sum(report.components.values())
+    assert report.days == {}
+
+    batch.freeze()
+    frozen = batch.memory_report()
+    assert frozen.components["filter_tables"] >= len(batch.infected_observations.table)
+    assert frozen.total < report.total
+
+    pairs = [(0, secrets.token_bytes(32)) for _ in range(10)]
+    report = lowcost.TracingDataBatch(pairs, release_time=0).memory_report()
+    assert report.components["time_key_pairs"] > 10 * 32
+
+
+def test_aggregate():
+    day = date(2020, 4, 25)
+    reports = [
+        MemoryReport(10, {"observations": 6, "overhead": 4}, {day: 6}),
+        MemoryReport(5, {"observations": 1, "overhead": 4}, {}),
+    ]
+    assert aggregate(reports) == MemoryReport(
+        15, {"observations": 7, "overhead": 8}, {day: 6}
+    )
+    assert aggregate([]) == MemoryReport(0, {}, {})
+
+
+def test_pool_memory_report(tmp_path):
+    with TracerPool(unlinkable.ContactTracer, 2, directory=str(tmp_path)) as pool:
+        for tenant in range(3):
+            pool.create(tenant, start_time=START_TIME)
+        report = pool.memory_report()
+        resident = [pool.get(tenant).memory_report() for tenant in (1, 2)]
+
+    assert report == aggregate(resident)
@@ -0,0 +1,107 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import concurrent.futures
+from datetime import datetime, timedelta, timezone
+import io
+import os
+
+import pytest
+
+from dp3t import parallel
+from dp3t.parallel import parallel_matches
+from dp3t.protocols.unlinkable import (
+    OBSERVATION_FORMATS,
+    BatchBuilder,
+    ContactTracer,
+    TracingDataBatch,
+)
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def tracers_with_contacts(observation_format):
+    """Return a phone that saw three infected phones on two days, and the infected"""
+    phone = ContactTracer(start_time=START_TIME, observation_format=observation_format)
+    infected = [ContactTracer(start_time=START_TIME) for _ in range(3)]
+
+    for day in range(2):
+        for minute in range(0, 24 * 60, 7):
+            time = START_TIME + timedelta(days=day, minutes=minute)
+            phone.add_observation(os.urandom(16), time)
+            if minute % 140 == 0:
+                for tracer in infected[day:]:
+                    phone.add_observation(tracer.get_ephid_for_time(time), time)
+
+        phone.next_day()
+        for tracer in infected:
+            tracer.next_day()
+
+    reports = [tracer.get_tracing_information(START_TIME) for tracer in infected]
+    return phone, reports
+
+
+def frozen(batch):
+    f = io.BytesIO()
+    batch.write(f)
+    f.seek(0)
+    return TracingDataBatch.read(f)
+
+
+@pytest.mark.parametrize("observation_format", OBSERVATION_FORMATS)
+def test_parallel_matches_are_identical(pool, observation_format):
+    (phone, reports) = tracers_with_contacts(observation_format)
+
+    builder = BatchBuilder(consolidate=False, initial_capacity=100)
+    builder.add_reports(reports)
+    batches = [TracingDataBatch(reports), frozen(TracingDataBatch(reports))]
+    batches.append(builder.finish())
+
+    for batch in batches:
+        expected = phone.matches_with_batch(batch)
+        assert expected > 0
+        assert phone.matches_with_batch(batch, pool=pool) == expected
+        assert parallel_matches(phone, batch, pool, nr_tasks=5) == expected
+
+
+def test_parallel_matches_without_observations(pool, tmp_path):
+    (_, reports) = tracers_with_contacts("hashed")
+    phone = ContactTracer(start_time=START_TIME)
+
+    batch = TracingDataBatch(reports)
+    assert parallel_matches(phone, batch, pool, directory=str(tmp_path)) == 0
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_shared_files_are_removed_if_a_worker_fails(tmp_path, monkeypatch):
+    (phone, reports) = tracers_with_contacts("hashed")
+    batch = TracingDataBatch(reports)
+
+    def failing_match_range(shared_filters, observations_path, *args):
+        raise OSError("Cannot map {}".format(observations_path))
+
+    monkeypatch.setattr(parallel, "match_range", failing_match_range)
+    with concurrent.futures.ThreadPoolExecutor(2) as threads:
+        with pytest.raises(OSError):
+            parallel_matches(phone, batch, threads, directory=str(tmp_path))
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,177 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import os
+
+import pytest
+
+from dp3t.encounters import sighting_count
+from dp3t.pool import PoolStats, TracerPool
+from dp3t.protocols import lowcost, unlinkable
+from dp3t.storage import ObservationStore
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+OBSERVATION_TIME = START_TIME + timedelta(hours=10)
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_evicted_tracers_keep_their_state(protocol, tmp_path):
+    infected = protocol.ContactTracer(start_time=START_TIME)
+    ephid = infected.get_ephid_for_time(OBSERVATION_TIME)
+
+    pool = TracerPool(protocol.ContactTracer, 2, directory=str(tmp_path))
+    for tenant in range(3):
+        pool.create(tenant, start_time=START_TIME)
+        pool.add_observation(tenant, ephid, OBSERVATION_TIME)
+    assert not pool.is_resident(0)
+    assert len(os.listdir(str(tmp_path))) == 1
+
+    for tenant in range(3):
+        pool.next_day(tenant)
+    infected.next_day()
+    if protocol is lowcost:
+        batch = lowcost.TracingDataBatch(
+            [infected.get_tracing_information(START_TIME)],
+            int((START_TIME + timedelta(days=1)).timestamp()),
+        )
+    else:
+        batch = unlinkable.TracingDataBatch(
+            [infected.get_tracing_information(START_TIME)]
+        )
+
+    assert [pool.matches_with_batch(tenant, batch) for tenant in range(3)] == [1] * 3
+    assert sorted(pool.tenants()) == [0, 1, 2]
+    assert len(pool) == 3
+    assert pool.stats == PoolStats(hits=3, loads=6, evictions=7)
+
+    pool.close()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_weighted_exposure_through_the_pool(tmp_path):
+    infected = unlinkable.ContactTracer(start_time=START_TIME)
+    ephid = infected.get_ephid_for_time(OBSERVATION_TIME)
+
+    with TracerPool(unlinkable.ContactTracer, 1, directory=str(tmp_path)) as pool:
+        pool.create(0, start_time=START_TIME, encounters=True)
+        for attenuation in (50, 60):
+            pool.add_observation(0, ephid, OBSERVATION_TIME, attenuation=attenuation)
+        pool.next_day(0)
+        infected.next_day()
+
+        batch = unlinkable.TracingDataBatch(
+            [infected.get_tracing_information(START_TIME)]
+        )
+        assert pool.matches_with_batch(0, batch, weight=sighting_count) == 2
+
+
+def test_eviction_deletes_spilled_observations(tmp_path):
+    segments = str(tmp_path / "segments")
+    os.mkdir(segments)
+    store = ObservationStore(memory_limit=0, directory=segments)
+    pool = TracerPool(unlinkable.ContactTracer, 1, directory=str(tmp_path))
+
+    pool.create(0, start_time=START_TIME, observation_store=store)
+    pool.add_observation(0, bytes(16), OBSERVATION_TIME)
+    pool.next_day(0)
+    assert len(os.listdir(segments)) == 1
+
+    pool.create(1, start_time=START_TIME, observation_store=store)
+    assert os.listdir(segments) == []
+
+    # The snapshot holds the observations
+    assert len(pool.get(0).observations_per_day[START_TIME.date()]) == 1
+
+    # Closing the pool deletes the files of the tracers in memory
+    pool.remove(0)
+    pool.create(2, start_time=START_TIME, observation_store=store)
+    pool.add_observation(2, bytes(16), OBSERVATION_TIME)
+    pool.next_day(2)
+    assert len(os.listdir(segments)) == 1
+    pool.close()
+    assert os.listdir(segments) == []
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_reloaded_tracers_keep_store_and_pregeneration(protocol, tmp_path):
+    segments = str(tmp_path / "segments")
+    os.mkdir(segments)
+    store = ObservationStore(memory_limit=0, directory=segments)
+
+    with ThreadPoolExecutor(1) as executor:
+        pool = TracerPool(protocol.ContactTracer, 1, directory=str(tmp_path))
+        pool.create(
+            0,
+            start_time=START_TIME,
+            observation_store=store,
+            pregeneration_pool=executor,
+        )
+        for _ in range(100):
+            pool.add_observation(0, os.urandom(16), OBSERVATION_TIME)
+        pool.next_day(0)
+        if protocol is lowcost:
+            release_time = int((START_TIME + timedelta(days=1)).timestamp())
+            batch = lowcost.TracingDataBatch([], release_time)
+            pool.get(0).housekeeping_after_batch(batch)
+        spilled = pool.get(0).memory_report().components["observations"]
+        assert len(os.listdir(segments)) == 1
+
+        pool.create(1, start_time=START_TIME)
+        tracer = pool.get(0)
+        assert tracer.observation_store is store
+        assert tracer.pregeneration_pool is executor
+        assert tracer._next_day is not None
+        assert len(os.listdir(segments)) == 1
+        assert tracer.memory_report().components["observations"] <= spilled
+
+        pool.next_day(0)
+        pool.close()
+    assert os.listdir(segments) == []
+
+
+def test_pool_holds_tracers_of_both_designs():
+    with TracerPool(lowcost.ContactTracer, 1) as pool:
+        pool.create("alice", start_time=START_TIME)
+        pool.add("bob", unlinkable.ContactTracer(start_time=START_TIME))
+
+        assert isinstance(pool.get("alice"), lowcost.ContactTracer)
+        assert isinstance(pool.get("bob"), unlinkable.ContactTracer)
+        directory = pool.directory
+        assert os.path.isdir(directory)
+    assert not os.path.exists(directory)
+
+
+def test_remove():
+    with TracerPool(lowcost.ContactTracer, 1) as pool:
+        pool.create("alice", start_time=START_TIME)
+        pool.create("bob", start_time=START_TIME)
+        with pytest.raises(KeyError):
+            pool.create("bob", start_time=START_TIME)
+
+        pool.remove("alice")
+        pool.remove("bob")
+        assert len(pool) == 0
+        assert os.listdir(pool.directory) == []
+        with pytest.raises(KeyError):
+            pool.get("alice")
+
+
+def test_pool_needs_room():
+    with pytest.raises(ValueError):
+        TracerPool(lowcost.ContactTracer, 0)
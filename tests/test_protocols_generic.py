@@ -15,7 +15,9 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import io
 import pytest
 
 import dp3t.protocols.lowcost as lowcost
@@ -225,3 +227,179 @@ def test_contact_tracing_no_contact_outside_retention_window(protocol):
     release_time = int(end_of_retention.timestamp())
     batch = protocol.TracingDataBatch([tracing_info_bob], release_time=release_time)
     assert alice.matches_with_batch(batch) == 0
+
+
+##########################
+### TEST SERIALIZATION ###
+##########################
+
+
+def test_serialized_tracer_and_batch_match(protocol):
+    alice = protocol.ContactTracer(start_time=START_TIME)
+    bob = protocol.ContactTracer(start_time=START_TIME)
+
+    interaction_time = START_TIME + timedelta(minutes=20)
+    alice.add_observation(bob.get_ephid_for_time(interaction_time), interaction_time)
+    alice.next_day()
+    bob.next_day()
+
+    release_time = (int(START_TIME.timestamp()) // 86400 + 1) * 86400
+    batch = protocol.TracingDataBatch(
+        [bob.get_tracing_information(START_TIME)], release_time=release_time
+    )
+
+    state_file = io.BytesIO()
+    alice.write(state_file)
+    state_file.seek(0)
+    restored_alice = protocol.ContactTracer.read(state_file)
+
+    batch_file = io.BytesIO()
+    batch.write(batch_file)
+    batch_file.seek(0)
+    restored_batch = protocol.TracingDataBatch.read(batch_file)
+
+    assert restored_batch.release_time == release_time
+    assert restored_alice.matches_with_batch(restored_batch) == 1
+    assert restored_alice.start_of_today == alice.start_of_today
+    assert restored_alice.get_ephid_for_time(
+        START_TIME + timedelta(days=1)
+    ) == alice.get_ephid_for_time(START_TIME + timedelta(days=1))
+
+
+def test_read_rejects_other_design(protocol):
+    other = unlinkable if protocol is lowcost else lowcost
+
+    state_file = io.BytesIO()
+    other.ContactTracer(start_time=START_TIME).write(state_file)
+    state_file.seek(0)
+    with pytest.raises(ValueError):
+        protocol.ContactTracer.read(state_file)
+
+
+###########################
+### TEST PRE-GENERATION ###
+###########################
+
+
+def test_pregenerated_days_trace_contacts(protocol):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        alice = protocol.ContactTracer(start_time=START_TIME)
+        bob = protocol.ContactTracer(start_time=START_TIME, pregeneration_pool=pool)
+
+        for day in range(3):
+            interaction_time = START_TIME + timedelta(days=day, hours=1)
+            ephid_bob = bob.get_ephid_for_time(interaction_time)
+            alice.add_observation(ephid_bob, interaction_time)
+            alice.next_day()
+            bob.next_day()
+
+        release_time = (int(START_TIME.timestamp()) // 86400 + 3) * 86400
+        batch = protocol.TracingDataBatch(
+            [bob.get_tracing_information(START_TIME)], release_time=release_time
+        )
+        assert alice.matches_with_batch(batch) == 3
+
+
+def test_pregenerated_lowcost_day_follows_key():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        alice = lowcost.ContactTracer(start_time=START_TIME, pregeneration_pool=pool)
+        key = alice.current_day_key
+        alice.next_day()
+        assert alice.current_day_key == lowcost.next_day_key(key)
+
+
+def test_key_reset_discards_pregenerated_lowcost_day():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        alice = lowcost.ContactTracer(start_time=START_TIME, pregeneration_pool=pool)
+        alice.next_day()
+
+        _, released_key = alice.get_tracing_information(START_TIME)
+        new_key = alice.current_day_key
+        assert new_key != released_key
+
+        alice.next_day()
+        assert alice.current_day_key == lowcost.next_day_key(new_key)
+        assert alice.current_day_key != lowcost.next_day_key(released_key)
+
+
+################################
+### TEST PROTOCOL PARAMETERS ###
+################################
+
+PARAMETERS = config.ProtocolParameters(
+    epoch_length=5,
+    retention_period=3,
+    length_ephid=20,
+    seconds_per_batch=3600,
+    cuckoo_fpr=1e-6,
+)
+
+
+def test_default_parameters_match_constants():
+    parameters = config.DEFAULT_PARAMETERS
+    assert parameters.epoch_length == config.EPOCH_LENGTH
+    assert parameters.num_epochs_per_day == config.NUM_EPOCHS_PER_DAY
+    assert parameters.retention_period == config.RETENTION_PERIOD
+    assert parameters.length_ephid == config.LENGTH_EPHID
+    assert parameters.seconds_per_batch == lowcost.SECONDS_PER_BATCH
+    assert parameters.cuckoo_fpr == unlinkable.CUCKOO_FPR
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"epoch_length": 7},
+        {"retention_period": 0},
+        {"length_ephid": 33},
+        {"seconds_per_batch": 5000},
+        {"cuckoo_fpr": 1.5},
+    ],
+)
+def test_invalid_parameters_rejected(changes):
+    with pytest.raises(ValueError):
+        config.DEFAULT_PARAMETERS.replace(**changes)
+
+
+def test_contact_tracing_with_parameters(protocol):
+    alice = protocol.ContactTracer(start_time=START_TIME, parameters=PARAMETERS)
+    bob = protocol.ContactTracer(start_time=START_TIME, parameters=PARAMETERS)
+
+    # Five-minute epochs, so EphIDs change within the first 15 minutes
+    ephids = {
+        bob.get_ephid_for_time(START_TIME + timedelta(minutes=minutes))
+        for minutes in (0, 5, 10)
+    }
+    assert len(ephids) == 3
+    assert all(len(ephid) == PARAMETERS.length_ephid for ephid in ephids)
+
+    interaction_time = START_TIME + timedelta(minutes=20)
+    alice.add_observation(bob.get_ephid_for_time(interaction_time), interaction_time)
+    alice.next_day()
+    bob.next_day()
+
+    tracing_info_bob = bob.get_tracing_information(START_TIME)
+    release_time = (int(START_TIME.timestamp()) // 86400 + 1) * 86400
+    batch = protocol.TracingDataBatch(
+        [tracing_info_bob], release_time=release_time, parameters=PARAMETERS
+    )
+    assert alice.matches_with_batch(batch) == 1
+
+    # The saved state keeps the parameters
+    state_file = io.BytesIO()
+    alice.write(state_file)
+    state_file.seek(0)
+    restored_alice = protocol.ContactTracer.read(state_file)
+    assert restored_alice.parameters == PARAMETERS
+    assert restored_alice.matches_with_batch(batch) == 1
+
+    # The observation leaves the shorter retention period
+    for _ in range(PARAMETERS.retention_period):
+        alice.next_day()
+    assert alice.matches_with_batch(batch) == 0
+
+
+def test_lowcost_batches_align_to_batch_length():
+    release_time = int(START_TIME.timestamp()) // 3600 * 3600
+    lowcost.TracingDataBatch([], release_time=release_time, parameters=PARAMETERS)
+    with pytest.raises(ValueError):
+        lowcost.TracingDataBatch([], release_time=release_time)
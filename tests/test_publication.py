@@ -0,0 +1,161 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import io
+
+import pytest
+
+from dp3t.config import RETENTION_PERIOD
+from dp3t.protocols.unlinkable import ContactTracer
+from dp3t.publication import ChainElement, ClientChain, ServerChain
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+DAY = 86400
+
+
+def timestamp(days, hours=0):
+    return int((START_TIME + timedelta(days=days, hours=hours)).timestamp())
+
+
+def infected_users(nr_users):
+    """Alice, who saw each of nr_users users once, and their reports"""
+    alice = ContactTracer(start_time=START_TIME)
+    users = [ContactTracer(start_time=START_TIME) for _ in range(nr_users)]
+
+    for (i, user) in enumerate(users):
+        interaction_time = START_TIME + timedelta(hours=i + 1)
+        alice.add_observation(
+            user.get_ephid_for_time(interaction_time), interaction_time
+        )
+
+    alice.next_day()
+    reports = []
+    for user in users:
+        user.next_day()
+        reports.append(user.get_tracing_information(START_TIME))
+
+    return alice, reports
+
+
+def sync(client, server):
+    return client.sync(server.manifest(), server.element)
+
+
+def test_chain_matches_like_a_batch():
+    alice, reports = infected_users(3)
+    server = ServerChain()
+    client = ClientChain()
+
+    for (hours, report) in enumerate(reports):
+        server.publish([report], timestamp(1, hours))
+        assert len(sync(client, server)) == 1
+
+    assert [e.key for e in client.elements] == [(1, 1), (2, 2), (3, 3)]
+    assert client.release_time == timestamp(1, 2)
+    assert alice.matches_with_batch(client) == 3
+    assert alice.evaluate_risk(client, threshold=3).at_risk
+
+
+def test_empty_publication_has_no_delta():
+    server = ServerChain()
+    assert server.publish([], timestamp(1)) is None
+    assert server.manifest() == []
+
+
+def test_compaction():
+    alice, reports = infected_users(4)
+    server = ServerChain()
+    adopting = ClientChain()
+    keeping = ClientChain(adopt_compacted=False)
+
+    for (hours, report) in enumerate(reports):
+        server.publish([report], timestamp(1, hours))
+        sync(adopting, server)
+        sync(keeping, server)
+
+    # Deltas of the current day are not compacted
+    assert server.compact(timestamp(1, 12)) == []
+
+    [consolidated] = server.compact(timestamp(2))
+    assert server.manifest() == [(1, 4)]
+    nr_epochs = sum(len(epochs) for (epochs, _) in reports)
+    assert consolidated.batch.infected_observations.size == nr_epochs
+
+    assert sync(adopting, server) == [consolidated]
+    assert [e.key for e in adopting.elements] == [(1, 4)]
+    assert sync(keeping, server) == []
+    assert len(keeping.elements) == 4
+
+    assert alice.matches_with_batch(adopting) == 4
+    assert alice.matches_with_batch(keeping) == 4
+
+
+def test_expiry():
+    _, reports = infected_users(2)
+    server = ServerChain()
+    client = ClientChain()
+    server.publish(reports[:1], timestamp(1))
+    server.publish(reports[1:], timestamp(3))
+    sync(client, server)
+
+    now = timestamp(2 + RETENTION_PERIOD)
+    assert [e.key for e in server.expire(now)] == [(1, 1)]
+    assert server.manifest() == [(2, 2)]
+
+    # Offline phones expire elements themselves
+    offline = ClientChain()
+    offline.sync([(1, 1), (2, 2)], lambda *key: client.elements[key[0] - 1])
+    offline.expire(now)
+    assert [e.key for e in offline.elements] == [(2, 2)]
+
+    sync(client, server)
+    assert [e.key for e in client.elements] == [(2, 2)]
+
+
+def test_releases_in_order():
+    _, reports = infected_users(2)
+    server = ServerChain()
+    server.publish(reports[:1], timestamp(2))
+    with pytest.raises(ValueError):
+        server.publish(reports[1:], timestamp(1))
+
+
+def test_serialization():
+    alice, reports = infected_users(2)
+    server = ServerChain()
+    for (hours, report) in enumerate(reports):
+        server.publish([report], timestamp(1, hours))
+
+    client = ClientChain()
+
+    def fetch(first, last):
+        element_file = io.BytesIO()
+        server.element(first, last).write(element_file)
+        element_file.seek(0)
+        return ChainElement.read(element_file)
+
+    client.sync(server.manifest(), fetch)
+
+    chain_file = io.BytesIO()
+    client.write(chain_file)
+    chain_file.seek(0)
+    restored = ClientChain.read(chain_file)
+
+    assert [e.key for e in restored.elements] == [(1, 1), (2, 2)]
+    assert restored.last_release == 2
+    assert alice.matches_with_batch(restored) == 2
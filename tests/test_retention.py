@@ -0,0 +1,117 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import gc
+import tracemalloc
+
+import pytest
+
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+import dp3t.config as config
+from dp3t.retention import TimeWheel
+
+
+@pytest.fixture(params=[lowcost, unlinkable])
+def protocol(request):
+    return request.param
+
+
+START_TIME = datetime(2020, 4, 25, 15, 17, tzinfo=timezone.utc)
+START_DAY = 18377
+
+
+#######################
+### TEST TIME WHEEL ###
+#######################
+
+
+def test_time_wheel_retention():
+    wheel = TimeWheel(START_DAY, retention_period=3, factory=list)
+    wheel.current.append("day0")
+
+    for day in range(1, 6):
+        wheel.advance()
+        wheel.current.append("day{}".format(day))
+
+    # Only the current day and the 3 days before it are retained
+    assert wheel.days() == [START_DAY + 5, START_DAY + 4, START_DAY + 3, START_DAY + 2]
+    assert wheel[START_DAY + 2] == ["day2"]
+    assert START_DAY + 1 not in wheel
+    assert len(wheel) == 4
+
+    with pytest.raises(KeyError):
+        wheel[START_DAY + 1]
+
+
+def test_time_wheel_advance_returns_dropped_day():
+    wheel = TimeWheel(START_DAY, retention_period=1, factory=list)
+    wheel.current.append("day0")
+
+    assert wheel.advance() is None
+    assert wheel.advance() == ["day0"]
+
+
+def test_time_wheel_clear():
+    wheel = TimeWheel(START_DAY, retention_period=3, factory=list)
+    wheel.advance()
+    wheel.advance()
+    wheel.clear()
+
+    assert wheel.days() == [START_DAY + 2]
+    assert wheel.current == []
+
+
+def test_time_wheel_no_future_days():
+    wheel = TimeWheel(START_DAY, retention_period=3)
+
+    assert wheel.get(START_DAY + 1) is None
+    with pytest.raises(KeyError):
+        wheel[START_DAY + 1] = {}
+
+
+#########################################
+### TEST RETENTION IN CONTACT TRACERS ###
+#########################################
+
+
+def test_flat_memory_over_a_year(protocol):
+    ct = protocol.ContactTracer(start_time=START_TIME)
+
+    tracemalloc.start()
+    try:
+        for day in range(365):
+            # Measure once the retention window has been filled
+            if day == 2 * config.RETENTION_PERIOD:
+                gc.collect()
+                filled_window_size, _ = tracemalloc.get_traced_memory()
+
+            for minutes in range(20, 200, 20):
+                time = START_TIME + timedelta(days=day, minutes=minutes)
+                ct.add_observation(bytes(config.LENGTH_EPHID), time)
+            ct.next_day()
+
+        gc.collect()
+        final_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Memory should not grow by as much as a single retained day
+    growth = final_size - filled_window_size
+    assert growth < filled_window_size / (config.RETENTION_PERIOD + 1)
+    assert len(ct._days) == config.RETENTION_PERIOD + 1
@@ -0,0 +1,170 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+from dp3t.risk import DayCandidate, evaluate_risk
+from dp3t.storage import ObservationStore, SortedSegment
+
+
+@pytest.fixture(params=[lowcost, unlinkable])
+def protocol(request):
+    return request.param
+
+
+START_TIME = datetime(2020, 4, 25, 15, 17, tzinfo=timezone.utc)
+
+
+def candidate(day, nr_matches, evaluated=None):
+    def matches():
+        if evaluated is not None:
+            evaluated.append(day)
+        return iter(range(nr_matches))
+
+    return DayCandidate(day, nr_matches + 1, matches)
+
+
+########################
+### TEST RISK ENGINE ###
+########################
+
+
+def test_evaluate_risk_most_recent_first():
+    evaluated = []
+    candidates = [candidate(day, 1, evaluated) for day in [3, 1, 2]]
+
+    result = evaluate_risk(candidates, threshold=1)
+
+    assert result.at_risk
+    assert not result.complete
+    assert evaluated == [3]
+
+
+def test_evaluate_risk_ignores_number_of_observations():
+    evaluated = []
+    candidates = [candidate(1, 5, evaluated), candidate(2, 1, evaluated)]
+
+    assert evaluate_risk(candidates, threshold=1).at_risk
+    assert evaluated == [2]
+
+
+def test_evaluate_risk_threshold_per_day():
+    candidates = [candidate(1, 2), candidate(2, 2)]
+
+    result = evaluate_risk(candidates, threshold=3)
+
+    assert not result.at_risk
+    assert result.complete
+    assert [exposure.nr_matches for exposure in result.exposures] == [2, 2]
+
+
+def test_evaluate_risk_exhaustive():
+    candidates = [candidate(1, 2), candidate(2, 5)]
+
+    result = evaluate_risk(candidates, threshold=3, stop_early=False)
+
+    assert result.at_risk
+    assert result.complete
+    assert result.nr_matches == 7
+
+
+def test_evaluate_risk_invalid_threshold():
+    with pytest.raises(ValueError):
+        evaluate_risk([], threshold=0)
+
+
+####################################
+### TEST RISK IN CONTACT TRACERS ###
+####################################
+
+
+def tracers_with_interactions(protocol, interaction_minutes):
+    alice = protocol.ContactTracer(start_time=START_TIME)
+    bob = protocol.ContactTracer(start_time=START_TIME)
+
+    for mins in interaction_minutes:
+        interaction_time = START_TIME + timedelta(minutes=mins)
+        alice.add_observation(
+            bob.get_ephid_for_time(interaction_time), interaction_time
+        )
+
+    for _ in range(4):
+        alice.next_day()
+        bob.next_day()
+
+    tracing_info_bob = bob.get_tracing_information(START_TIME)
+    release_time = (int(START_TIME.timestamp()) // 86400 + 4) * 86400
+    batch = protocol.TracingDataBatch([tracing_info_bob], release_time=release_time)
+
+    return alice, batch
+
+
+def test_contact_tracer_at_risk(protocol):
+    alice, batch = tracers_with_interactions(protocol, [20, 100, 240])
+
+    result = alice.evaluate_risk(batch, threshold=2)
+
+    assert result.at_risk
+    assert result.exposures[-1].nr_matches == 2
+
+
+def test_contact_tracer_below_threshold(protocol):
+    alice, batch = tracers_with_interactions(protocol, [20, 100, 240])
+
+    result = alice.evaluate_risk(batch, threshold=4)
+
+    assert not result.at_risk
+    assert result.complete
+    assert result.nr_matches == alice.matches_with_batch(batch)
+
+
+def test_lowcost_risk_reads_spilled_observations_lazily(tmp_path, monkeypatch):
+    bob = lowcost.ContactTracer(start_time=START_TIME)
+    with ObservationStore(memory_limit=0, directory=str(tmp_path)) as store:
+        alice = lowcost.ContactTracer(start_time=START_TIME, observation_store=store)
+        for day in range(3):
+            interaction_time = START_TIME + timedelta(days=day)
+            alice.add_observation(
+                bob.get_ephid_for_time(interaction_time), interaction_time
+            )
+            alice.next_day()
+            bob.next_day()
+
+        release_time = (int(START_TIME.timestamp()) // 86400 + 3) * 86400
+        batch = lowcost.TracingDataBatch(
+            [bob.get_tracing_information(START_TIME)], release_time=release_time
+        )
+        # Days with day granularity only are spilled
+        alice.housekeeping_after_batch(batch)
+
+        read = []
+        iterate = SortedSegment.__iter__
+
+        def record_iteration(segment):
+            read.append(segment)
+            return iterate(segment)
+
+        monkeypatch.setattr(SortedSegment, "__iter__", record_iteration)
+        result = alice.evaluate_risk(batch, threshold=1)
+
+    assert result.at_risk
+    assert [exposure.nr_observations for exposure in result.exposures] == [1]
+    assert len(read) == 1
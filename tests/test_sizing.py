@@ -0,0 +1,96 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import hashlib
+import io
+
+import pytest
+
+from dp3t.config import CUCKOO_FPR
+from dp3t.filters import FrozenCuckooFilter, fingerprint_size
+from dp3t.sizing import (
+    MAX_LOAD_FACTORS,
+    FilterSizing,
+    build_filter,
+    default_sizing,
+    library_error_rate,
+    new_filter,
+    tune,
+)
+
+
+def items(n):
+    return [hashlib.sha256(i.to_bytes(4, "big")).digest() for i in range(n)]
+
+
+@pytest.mark.parametrize("bucket_size", [2, 4, 8])
+def test_library_error_rate(bucket_size):
+    for size in range(8, 64):
+        error_rate = library_error_rate(size, bucket_size)
+        assert fingerprint_size(error_rate, bucket_size) == size
+        assert new_filter(FilterSizing(4, bucket_size, size)).fingerprint_size == size
+
+
+@pytest.mark.parametrize("nr_items", [0, 1, 100, 1000, 12345])
+def test_tune(nr_items):
+    sizing = tune(nr_items, CUCKOO_FPR)
+
+    # Power-of-two number of buckets, below the maximum load factor
+    assert sizing.capacity & (sizing.capacity - 1) == 0
+    assert sizing.load_factor(nr_items) <= MAX_LOAD_FACTORS[sizing.bucket_size]
+    assert sizing.fingerprint_size == fingerprint_size(CUCKOO_FPR, sizing.bucket_size)
+    assert sizing.false_positive_rate(nr_items) <= CUCKOO_FPR
+
+    if nr_items >= 100:
+        default = default_sizing(nr_items, CUCKOO_FPR)
+        assert sizing.serialized_bytes < default.serialized_bytes
+
+
+def test_tune_prefers_expected_fingerprints():
+    # All bucket sizes need 6-byte fingerprints and 1024 slots
+    sizing = tune(800, CUCKOO_FPR)
+    assert sizing.bucket_size == 4
+    assert tune(800, CUCKOO_FPR, bucket_sizes=[8]).slots == sizing.slots
+
+
+@pytest.mark.parametrize(
+    "nr_items, error_rate, bucket_sizes",
+    [(-1, CUCKOO_FPR, [4]), (10, 0, [4]), (10, 1, [4]), (10, CUCKOO_FPR, [3])],
+)
+def test_tune_invalid(nr_items, error_rate, bucket_sizes):
+    with pytest.raises(ValueError):
+        tune(nr_items, error_rate, bucket_sizes)
+
+
+def test_build_filter_finds_all_items():
+    sizing = tune(3000, CUCKOO_FPR)
+    frozen = FrozenCuckooFilter.from_filter(build_filter(items(3000), sizing))
+
+    assert frozen.capacity == sizing.capacity
+    assert all(item in frozen for item in items(3000))
+
+    serialized = io.BytesIO()
+    frozen.write(serialized)
+    assert len(serialized.getvalue()) == sizing.serialized_bytes
+
+
+def test_build_filter_grows_when_full():
+    sizing = FilterSizing(4, 2, 16)
+    cuckoo_filter = build_filter(items(100), sizing)
+
+    assert cuckoo_filter.capacity >= 64
+    assert cuckoo_filter.size == 100
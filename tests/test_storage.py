@@ -0,0 +1,160 @@
+__copyright__ = """
+    Copyright 2020 EPFL
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+from datetime import datetime, timedelta, timezone
+import os
+import secrets
+
+import pytest
+
+import dp3t.protocols.lowcost as lowcost
+import dp3t.protocols.unlinkable as unlinkable
+from dp3t.config import RETENTION_PERIOD, SECONDS_PER_DAY
+from dp3t.storage import ObservationStore, SortedSegment
+
+START_TIME = datetime(2020, 4, 25, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ObservationStore(memory_limit=0, directory=str(tmp_path))
+
+
+def test_sorted_segment(tmp_path):
+    records = [secrets.token_bytes(16) for _ in range(100)]
+    records.append(records[0])
+    segment = SortedSegment.create(str(tmp_path / "segment"), records, 16)
+
+    assert len(segment) == len(records)
+    assert list(segment) == sorted(records)
+    assert all(record in segment for record in records)
+    assert secrets.token_bytes(16) not in segment
+
+    segment.remove()
+    assert not os.path.exists(segment.path)
+
+
+def test_empty_sorted_segment(tmp_path):
+    segment = SortedSegment.create(str(tmp_path / "segment"), [], 16)
+    assert len(segment) == 0
+    assert bytes(16) not in segment
+
+
+def test_sorted_segment_rejects_wrong_length(tmp_path):
+    with pytest.raises(ValueError):
+        SortedSegment.create(str(tmp_path / "segment"), [bytes(15)], 16)
+
+
+def test_store_removes_own_directory():
+    with ObservationStore(memory_limit=0) as store:
+        store.spill([bytes(16)], 16)
+        assert os.listdir(store.directory)
+    assert not os.path.exists(store.directory)
+
+
+def random_ephids(nr_ephids):
+    return [secrets.token_bytes(16) for _ in range(nr_ephids)]
+
+
+def observe(tracer, ephids, day):
+    """Spread the observations of ephids evenly over the given day"""
+    interval = SECONDS_PER_DAY // len(ephids)
+    for (i, ephid) in enumerate(ephids):
+        time = START_TIME + timedelta(days=day, seconds=i * interval)
+        tracer.add_observation(ephid, time)
+
+
+def contact_tracers(protocol, store, nr_days=4):
+    """Return alice and bob, where alice saw bob on every day, without and
+    with observation store"""
+    bob = protocol.ContactTracer(start_time=START_TIME)
+    alices = [
+        protocol.ContactTracer(start_time=START_TIME),
+        protocol.ContactTracer(start_time=START_TIME, observation_store=store),
+    ]
+
+    for day in range(nr_days):
+        time = START_TIME + timedelta(days=day, hours=12)
+        ephids = random_ephids(10)
+        for alice in alices:
+            observe(alice, ephids, day)
+            alice.add_observation(bob.get_ephid_for_time(time), time)
+
+        for tracer in alices + [bob]:
+            tracer.next_day()
+
+    return alices, bob
+
+
+@pytest.mark.parametrize("protocol", [lowcost, unlinkable])
+def test_spilled_observations_match(protocol, store):
+    alices, bob = contact_tracers(protocol, store)
+
+    release_time = int(START_TIME.timestamp()) + 4 * 86400
+    batch = protocol.TracingDataBatch(
+        [bob.get_tracing_information(START_TIME)], release_time=release_time
+    )
+    if protocol is lowcost:
+        for alice in alices:
+            alice.housekeeping_after_batch(batch)
+
+    assert os.listdir(store.directory)
+    assert alices[0].matches_with_batch(batch) == 4
+    assert alices[1].matches_with_batch(batch) == 4
+    assert alices[1].evaluate_risk(batch, stop_early=False).nr_matches == 4
+
+
+def test_lowcost_only_spills_days_at_day_granularity(store):
+    alice = lowcost.ContactTracer(start_time=START_TIME, observation_store=store)
+    observe(alice, random_ephids(10), 0)
+    alice.next_day()
+
+    # The observations still have batch granularity
+    assert not os.listdir(store.directory)
+
+    release_time = int(START_TIME.timestamp()) + 86400
+    alice.housekeeping_after_batch(lowcost.TracingDataBatch([], release_time))
+    assert len(os.listdir(store.directory)) == 1
+
+
+def test_unlinkable_memory_limit(tmp_path):
+    store = ObservationStore(memory_limit=2 * 10 * 32, directory=str(tmp_path))
+    alice = unlinkable.ContactTracer(start_time=START_TIME, observation_store=store)
+
+    for day in range(5):
+        observe(alice, random_ephids(10), day)
+        alice.next_day()
+
+    # The two most recent past days stay in memory
+    spilled = [
+        day
+        for (day, observations) in alice.observations_per_day.items()
+        if store.is_spilled(observations)
+    ]
+    assert len(spilled) == 3
+    assert max(spilled) == (START_TIME + timedelta(days=2)).date()
+
+
+def test_segments_removed_after_retention_period(store):
+    alice = unlinkable.ContactTracer(start_time=START_TIME, observation_store=store)
+    observe(alice, random_ephids(10), 0)
+    alice.next_day()
+    assert len(os.listdir(store.directory)) == 1
+
+    for _ in range(RETENTION_PERIOD):
+        alice.next_day()
+    assert not os.listdir(store.directory)
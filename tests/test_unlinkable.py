@@ -15,13 +15,21 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import io
 
+import pytest
+
+from dp3t.filters import FilterUnion, FrozenCuckooFilter
 from dp3t.protocols.unlinkable import (
+    BatchBuilder,
+    ContactTracer,
+    TracingDataBatch,
     ephid_from_seed,
     epoch_from_time,
     hashed_observation_from_ephid,
     hashed_observation_from_seed,
+    hashed_observations_from_seeds,
 )
 
 
@@ -88,3 +96,175 @@ def test_hashed_observation_from_seed():
 
     hashed_observation1 = hashed_observation_from_seed(SEED1, EPOCH1)
     assert hashed_observation1 == HASHED_OBSERVATION_EPHID1_TIME1
+
+
+###########################
+### TEST CONTACT TRACER ###
+###########################
+
+
+def test_unknown_observation_format():
+    with pytest.raises(ValueError):
+        ContactTracer(start_time=TIME0, observation_format="plain")
+
+
+@pytest.mark.parametrize(
+    "observation_format, observation_length", [("digest", 16), ("probe", 32)]
+)
+def test_observation_formats_match_like_hashed_observations(
+    observation_format, observation_length
+):
+    start_time = TIME0.replace(hour=0, minute=0)
+    bob = ContactTracer(start_time=start_time)
+    full = ContactTracer(start_time=start_time)
+    compact = ContactTracer(
+        start_time=start_time, observation_format=observation_format
+    )
+
+    for minutes in range(0, 24 * 60, 10):
+        time = start_time + timedelta(minutes=minutes)
+        for tracer in (full, compact):
+            tracer.add_observation(bob.get_ephid_for_time(time), time)
+            tracer.add_observation(ephid_from_seed(time.isoformat().encode()), time)
+
+    for tracer in (bob, full, compact):
+        tracer.next_day()
+
+    assert compact.observation_length == observation_length
+    assert all(
+        len(observation) == observation_length
+        for observations in compact.observations_per_day.values()
+        for observation in observations
+    )
+
+    batch = TracingDataBatch([bob.get_tracing_information(start_time)])
+    frozen_file = io.BytesIO()
+    batch.write(frozen_file)
+    frozen_file.seek(0)
+    frozen_batch = TracingDataBatch.read(frozen_file)
+
+    for published in (batch, frozen_batch):
+        expected = full.matches_with_batch(published)
+        assert expected > 0
+        assert compact.matches_with_batch(published) == expected
+        evaluation = compact.evaluate_risk(published, stop_early=False)
+        assert evaluation.nr_matches == expected
+
+
+def test_observation_format_write_read():
+    tracer = ContactTracer(start_time=TIME0, observation_format="probe")
+    tracer.add_observation(EPHID1, TIME0)
+
+    state_file = io.BytesIO()
+    tracer.write(state_file)
+    state_file.seek(0)
+    restored = ContactTracer.read(state_file)
+
+    assert restored.observation_format == "probe"
+    assert restored.observations_per_day == tracer.observations_per_day
+
+
+##########################
+### TEST BATCH BUILDER ###
+##########################
+
+
+def reports_and_observer(nr_reports):
+    start_time = TIME0.replace(hour=0, minute=0)
+    infected = [ContactTracer(start_time=start_time) for _ in range(nr_reports)]
+    observer = ContactTracer(start_time=start_time)
+
+    for minutes in range(0, 24 * 60, 60):
+        time = start_time + timedelta(minutes=minutes)
+        for tracer in infected:
+            observer.add_observation(tracer.get_ephid_for_time(time), time)
+
+    for tracer in infected + [observer]:
+        tracer.next_day()
+
+    reports = [tracer.get_tracing_information(start_time) for tracer in infected]
+    return reports, observer
+
+
+def test_batch_builder_consolidates_into_batch_filter():
+    (reports, observer) = reports_and_observer(3)
+
+    builder = BatchBuilder(release_time=42)
+    builder.add_reports(iter(reports))
+    assert builder.nr_items == sum(len(epochs) for (epochs, _) in reports)
+    batch = builder.finish()
+
+    expected = TracingDataBatch(reports, release_time=42)
+    assert batch.release_time == 42
+    assert batch.infected_observations.capacity == (
+        expected.infected_observations.capacity
+    )
+    assert batch.infected_observations.size == expected.infected_observations.size
+    assert observer.matches_with_batch(batch) == observer.matches_with_batch(expected)
+
+    batch_file = io.BytesIO()
+    batch.write(batch_file)
+    batch_file.seek(0)
+    assert observer.matches_with_batch(TracingDataBatch.read(batch_file)) == 72
+
+
+def test_batch_builder_chain_of_filters():
+    (reports, observer) = reports_and_observer(3)
+    nr_items = sum(len(epochs) for (epochs, _) in reports)
+
+    builder = BatchBuilder(consolidate=False, initial_capacity=50)
+    for (epochs, seeds) in reports:
+        builder.add(epochs, seeds)
+    batch = builder.finish()
+
+    # Stages of 50, 100 and 200 items
+    chain = batch.infected_observations
+    assert isinstance(chain, FilterUnion)
+    assert [stage.size for stage in chain.filters] == [50, 100, nr_items - 150]
+    assert all(isinstance(stage, FrozenCuckooFilter) for stage in chain.filters)
+    assert observer.matches_with_batch(batch) == 72
+
+    with pytest.raises(ValueError):
+        batch.write(io.BytesIO())
+
+
+def test_batch_builder_single_stage():
+    builder = BatchBuilder(consolidate=False)
+    batch = builder.finish()
+
+    assert isinstance(batch.infected_observations, FrozenCuckooFilter)
+    assert batch.infected_observations.size == 0
+
+
+def test_tuned_batches_are_smaller():
+    (reports, observer) = reports_and_observer(3)
+    nr_items = sum(len(epochs) for (epochs, _) in reports)
+
+    batch = TracingDataBatch(reports, tuned=True)
+    builder = BatchBuilder(tuned=True)
+    builder.add_reports(reports)
+    built = builder.finish()
+    hashed = TracingDataBatch.from_hashed_observations(
+        [
+            hashed_observation
+            for (epochs, seeds) in reports
+            for hashed_observation in hashed_observations_from_seeds(seeds, epochs)
+        ],
+        tuned=True,
+    )
+
+    default_file = io.BytesIO()
+    TracingDataBatch(reports).write(default_file)
+    for tuned in (batch, built, hashed):
+        assert tuned.infected_observations.size == nr_items
+        assert observer.matches_with_batch(tuned) == 72
+
+        tuned_file = io.BytesIO()
+        tuned.write(tuned_file)
+        assert len(tuned_file.getvalue()) < len(default_file.getvalue()) / 2
+
+
+@pytest.mark.parametrize("initial_capacity, growth", [(0, 2), (10, 0)])
+def test_batch_builder_invalid_growth(initial_capacity, growth):
+    with pytest.raises(ValueError):
+        BatchBuilder(initial_capacity=initial_capacity, growth=growth)
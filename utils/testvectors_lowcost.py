@@ -19,22 +19,11 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
-from dp3t.protocols.lowcost import next_day_key, generate_ephids_for_day
-
-KEY0 = bytes.fromhex("0000000000000000000000000000000000000000000000000000000000000000")
+from dp3t.testvectors import print_lowcost_vectors
 
 
 def main():
-    print("## Test vectors of keys and generated EphIDs ##")
-    print("   WARNING: shuffling is disabled to obtain stable test vectors")
-    print("            implementations should broadcast the EphIDS in random order.\n")
-    key = KEY0
-    for i in range(3):
-        print("  * Key: SK_[t + {}] = {}".format(i, key.hex()))
-        ephids = generate_ephids_for_day(key, shuffle=False)
-        for j in [0, 1, 2, 95]:
-            print("    - ephid[{}] = {}".format(j, ephids[j].hex()))
-        key = next_day_key(key)
+    print_lowcost_vectors()
 
 
 if __name__ == "__main__":